@@ -0,0 +1,14 @@
+#!/bin/bash
+# Local stand-in for Dropbox-Uploader's dropbox_uploader.sh, for testing sync.
+# Supports: upload <local_file> <remote_path>
+# Files land under $FAKE_DROPBOX_DIR (default /tmp/fake_dropbox).
+# Set FAKE_DROPBOX_FAIL=1 to simulate a failed upload.
+set -e
+ROOT="${FAKE_DROPBOX_DIR:-/tmp/fake_dropbox}"
+[ "$1" = "upload" ] || { echo "usage: $0 upload <src> <dst>" >&2; exit 1; }
+[ -z "$FAKE_DROPBOX_FAIL" ] || { echo " > Uploading \"$2\" to \"$3\"... FAILED" >&2; exit 1; }
+DST="$ROOT/${3#/}"
+case "$3" in */) DST="$DST$(basename "$2")" ;; esac
+mkdir -p "$(dirname "$DST")"
+cp "$2" "$DST"
+echo " > Uploading \"$2\" to \"$3\"... DONE"
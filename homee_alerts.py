@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# HOMEe: streaming alerts and trends over incoming readings
+# Each device/metric keeps a time-windowed RollingStats that is updated per
+# reading in O(1) amortized time – nothing rescans the history:
+#   mean / variance  – Welford's update, with the matching downdate on eviction
+#   min / max        – monotonic deques
+#   slope            – least squares over the window from running sums
+# Rules run on those stats as each reading arrives:
+#   Threshold    – raise beyond `raise_at`, clear only back past `clear_at`
+#                  (hysteresis: a value hovering at the edge doesn't flap)
+#   RateOfChange – |slope| above a limit for the window; clears below half of it
+#   Spike        – one reading more than `z` standard deviations (and at least
+#                  `min_delta`) from the mean
+# Transitions (raised / cleared) go into a bounded event list with sequence
+# numbers, for /alerts?since=.
+
+import math, threading, time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import homee_metrics as metrics
+
+WINDOW = 900.0        # s of history behind the rolling stats (15 min)
+MIN_SAMPLES = 5       # stats-based rules wait for this many readings
+MAX_EVENTS = 500      # alert transitions kept for /alerts
+STEADY = {"temp_c": 0.05, "humidity": 0.2}  # |slope| per minute below this is "steady"
+METRICS = ("temp_c", "humidity")
+
+ALERTS = metrics.counter("homee_alerts_total", "Alerts raised", ["rule"])
+ACTIVE = metrics.gauge("homee_alerts_active", "Alerts currently active")
+
+# ── Rolling statistics ─────────────────────────────────────────────────
+class RollingStats:
+    """Statistics of the values seen in the last `window` seconds."""
+
+    def __init__(self, window: float = WINDOW):
+        self.window = window
+        self._win = deque()       # (t, x), oldest first
+        self._min = deque()       # increasing x: front is the minimum
+        self._max = deque()       # decreasing x: front is the maximum
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._t0 = None           # origin for the slope sums (keeps them small)
+        self._st = self._stt = self._stx = 0.0
+
+    def push(self, t: float, x: float):
+        if self._t0 is None or t - self._t0 > 10 * self.window:
+            self._rebase(t)
+        self._win.append((t, x))
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self._m2 += d * (x - self.mean)
+        u = t - self._t0
+        self._st += u
+        self._stt += u * u
+        self._stx += u * x
+        while self._min and self._min[-1][1] >= x:
+            self._min.pop()
+        self._min.append((t, x))
+        while self._max and self._max[-1][1] <= x:
+            self._max.pop()
+        self._max.append((t, x))
+        self._evict(t - self.window)
+
+    def _evict(self, cutoff: float):
+        while self._win and self._win[0][0] <= cutoff:
+            t, x = self._win.popleft()
+            self.n -= 1
+            if self.n:
+                d = x - self.mean
+                self.mean -= d / self.n
+                self._m2 -= d * (x - self.mean)
+            else:
+                self.mean = self._m2 = 0.0
+            u = t - self._t0
+            self._st -= u
+            self._stt -= u * u
+            self._stx -= u * x
+            if self._min[0][0] <= cutoff:
+                self._min.popleft()
+            if self._max[0][0] <= cutoff:
+                self._max.popleft()
+
+    def _rebase(self, t: float):
+        # occasional O(window) pass so u = t - t0 stays small next to the window
+        self._t0 = t
+        self._st = self._stt = self._stx = 0.0
+        for wt, x in self._win:
+            u = wt - t
+            self._st += u
+            self._stt += u * u
+            self._stx += u * x
+
+    @property
+    def variance(self) -> float:
+        return max(self._m2, 0.0) / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def min(self) -> float:
+        return self._min[0][1] if self._min else math.nan
+
+    @property
+    def max(self) -> float:
+        return self._max[0][1] if self._max else math.nan
+
+    @property
+    def newest(self) -> float:
+        """Time of the newest reading in the window (NaN when empty)."""
+        return self._win[-1][0] if self._win else math.nan
+
+    def slope(self) -> float:
+        """Least-squares change per second over the window (0 until 2 readings)."""
+        n = self.n
+        if n < 2:
+            return 0.0
+        sx = self.mean * n
+        den = n * self._stt - self._st * self._st
+        if den <= 1e-9:
+            return 0.0
+        return (n * self._stx - self._st * sx) / den
+
+# ── Rules ──────────────────────────────────────────────────────────────
+class Threshold:
+    prior = False  # checked after the reading is added to the stats
+
+    def __init__(self, name: str, metric: str, raise_at: float, clear_at: float, message: str):
+        self.name, self.metric, self.message = name, metric, message
+        self.raise_at, self.clear_at = raise_at, clear_at
+        self.above = raise_at > clear_at
+
+    def check(self, x: float, stats: RollingStats, active: bool) -> Optional[bool]:
+        """True = raise, False = clear, None = no change."""
+        if self.above:
+            if not active and x >= self.raise_at: return True
+            if active and x < self.clear_at: return False
+        else:
+            if not active and x < self.raise_at: return True
+            if active and x >= self.clear_at: return False
+        return None
+
+class RateOfChange:
+    prior = False
+
+    def __init__(self, name: str, metric: str, per_minute: float, message: str,
+                 min_samples: int = MIN_SAMPLES):
+        self.name, self.metric, self.message = name, metric, message
+        self.per_minute = per_minute
+        self.min_samples = min_samples
+
+    def check(self, x: float, stats: RollingStats, active: bool) -> Optional[bool]:
+        if stats.n < self.min_samples:
+            return None
+        rate = abs(stats.slope() * 60)
+        if not active and rate > self.per_minute: return True
+        if active and rate < self.per_minute / 2: return False
+        return None
+
+class Spike:
+    """Momentary: raised by an outlier, cleared by the next ordinary reading."""
+    prior = True  # judged against the window before this reading joins it
+
+    def __init__(self, name: str, metric: str, z: float, min_delta: float, message: str,
+                 min_samples: int = 2 * MIN_SAMPLES):
+        self.name, self.metric, self.message = name, metric, message
+        self.z = z
+        self.min_delta = min_delta  # a near-flat window makes tiny steps look like spikes
+        self.min_samples = min_samples
+
+    def check(self, x: float, stats: RollingStats, active: bool) -> Optional[bool]:
+        if stats.n < self.min_samples:
+            return False if active else None
+        hit = abs(x - stats.mean) > max(self.z * stats.std, self.min_delta)
+        if hit and not active: return True
+        if active and not hit: return False
+        return None
+
+# Thresholds follow the band table's alarm bands (homee_classify), with a
+# margin to clear; rates are well beyond what a room does on its own.
+DEFAULT_RULES = [
+    Threshold("temp_high", "temp_c", 27.0, 26.0, "Temperature too hot"),
+    Threshold("temp_low", "temp_c", 19.0, 20.0, "Temperature too cold"),
+    Threshold("hum_high", "humidity", 70.0, 67.0, "Humidity too high"),
+    Threshold("hum_low", "humidity", 31.0, 33.0, "Humidity too low"),
+    RateOfChange("temp_rate", "temp_c", 0.5, "Temperature changing fast"),
+    RateOfChange("hum_rate", "humidity", 2.0, "Humidity changing fast"),
+    Spike("temp_spike", "temp_c", 4.0, 1.5, "Temperature spike"),
+    Spike("hum_spike", "humidity", 4.0, 5.0, "Humidity spike"),
+]
+
+# ── Engine ─────────────────────────────────────────────────────────────
+def page(events: Iterable[Dict[str, Any]], newest: int, since: int = 0,
+         device: Optional[str] = None, limit: int = MAX_EVENTS) -> Tuple[List[Dict[str, Any]], int]:
+    """Events (given newest first) with seq > since, at most `limit`, newest first,
+    plus the next cursor. A page cut short by `limit` keeps the events right after
+    `since` and ends at the newest one it returns, so polling on from the cursor
+    continues where it stopped; otherwise the cursor is `newest`."""
+    out = []
+    for ev in events:
+        if ev["seq"] <= since:
+            break
+        if device is None or ev["device_id"] == device:
+            out.append(ev)
+    if len(out) > limit:
+        out = out[-limit:]
+        return out, out[0]["seq"]
+    return out, newest
+
+class _Device:
+    __slots__ = ("stats", "last_ts", "active")
+
+    def __init__(self, window: float):
+        self.stats = {m: RollingStats(window) for m in METRICS}
+        self.last_ts = -math.inf
+        self.active: Dict[str, Dict[str, Any]] = {}  # rule name → alert
+
+class AlertEngine:
+    def __init__(self, rules=None, window: float = WINDOW, max_events: int = MAX_EVENTS):
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self._prior = [r for r in self.rules if r.prior]
+        self._posterior = [r for r in self.rules if not r.prior]
+        self.window = window
+        self._devices: Dict[str, _Device] = {}
+        self._events = deque(maxlen=max_events)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.version = 0  # bumped on every raise/clear
+        ACTIVE.set_function(lambda: sum(len(d.active) for d in self._devices.values()))
+
+    def update(self, row: Dict[str, Any], device: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Feed one reading (of `device`, default row["device_id"]); returns the
+        alert transitions it caused. Readings older than the device's newest are
+        ignored (stats are in time order)."""
+        device = device or row["device_id"]
+        with self._lock:
+            dev = self._devices.get(device)
+            if dev is None:
+                dev = self._devices[device] = _Device(self.window)
+            ts = row["timestamp"]
+            if ts <= dev.last_ts:
+                return []
+            dev.last_ts = ts
+            out = []
+            self._check(device, dev, row, self._prior, out)
+            for m in METRICS:
+                x = row[m]
+                if x == x:
+                    dev.stats[m].push(ts, x)
+            self._check(device, dev, row, self._posterior, out)
+            if out:
+                self.version += 1
+            return out
+
+    def _check(self, device: str, dev: _Device, row: Dict[str, Any], rules,
+               out: List[Dict[str, Any]]):
+        for rule in rules:
+            x = row[rule.metric]
+            if x != x:
+                continue
+            change = rule.check(x, dev.stats[rule.metric], rule.name in dev.active)
+            if change is None:
+                continue
+            self._seq += 1
+            ev = {"seq": self._seq, "device_id": device, "rule": rule.name,
+                  "metric": rule.metric, "state": "raised" if change else "cleared",
+                  "value": x, "timestamp": row["timestamp"], "message": rule.message}
+            if change:
+                dev.active[rule.name] = ev
+                ALERTS.labels(rule.name).inc()
+            else:
+                dev.active.pop(rule.name, None)
+            self._events.append(ev)
+            out.append(ev)
+
+    def active(self, device: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            devs = [self._devices[device]] if device in self._devices else \
+                   ([] if device else list(self._devices.values()))
+            return sorted((a for d in devs for a in d.active.values()), key=lambda a: a["seq"])
+
+    def events(self, since: int = 0, device: Optional[str] = None,
+               limit: int = MAX_EVENTS) -> Tuple[List[Dict[str, Any]], int]:
+        """Transitions with seq > since, newest first, and the next cursor (see page())."""
+        with self._lock:
+            return page(reversed(self._events), self._seq, since, device, limit)
+
+    def trend(self, device: str, now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Rolling stats per metric for /data; empty until the device has readings.
+        "direction" is left out while the window holds fewer than 2 readings or
+        its newest is older than the window: the dashboard then compares the
+        last two rows instead."""
+        now = time.time() if now is None else now
+        with self._lock:
+            dev = self._devices.get(device)
+            if dev is None:
+                return {}
+            out = {}
+            for m, s in dev.stats.items():
+                if not s.n:
+                    continue
+                per_min = s.slope() * 60
+                out[m] = t = {"n": s.n, "window": s.window, "mean": round(s.mean, 2),
+                              "std": round(s.std, 3), "min": s.min, "max": s.max,
+                              "slope_per_min": round(per_min, 3), "newest": s.newest}
+                if s.n >= 2 and now - s.newest <= s.window:
+                    t["direction"] = ("steady" if abs(per_min) < STEADY[m] else
+                                      "up" if per_min > 0 else "down")
+            return out
@@ -1,54 +1,360 @@
 #!/usr/bin/env python3
 # HOMEe Web App (display-only; local time, blinking boxes, banner, trends)
+# create_app() builds the app: configuration (defaults from the environment,
+# overridable per call), the stores, the warm start of the recent buffer, and
+# the dashboard, compiled once. Its stylesheet and script are served from
+# memory as /static/dashboard.<content hash>.css|js with a year-long immutable
+# Cache-Control, so a reload only revalidates the small page. Stores that only
+# some routes need (rollups, day partitions, the ring, the /stream watcher) are
+# imported and opened on first use, to keep watchdog restarts quick.
+# The configuration lives in app.config and the stores in app.extensions["homee"]
+# (a _Homee); routes reach both through current_app, so two apps in one process
+# share nothing.
+# With SHARED_CACHE set (homee_serve's workers) the recent readings, trends
+# and alerts are not kept here but read from the snapshot homee_serve's feeder
+# publishes in shared memory (homee_shared).
  
-from flask import Flask, jsonify, render_template_string, request
-import csv, os
-from typing import List, Dict, Any
- 
-app = Flask(__name__)
- 
-LOG_FILE = "/home/raspberry01/homee/homee_readings.csv"
-MAX_HISTORY = 500  # server-side cap for safety
- 
-def _read_tail(limit:int)->List[Dict[str,Any]]:
-    if not os.path.exists(LOG_FILE):
-        return []
-    rows=[]
-    with open(LOG_FILE,"r",newline="") as f:
-        r=csv.DictReader(f)
-        for row in r:
-            rows.append(row)
-    rows=rows[-min(limit,MAX_HISTORY):]
-    out=[]
-    for row in rows:
-        try:
-            out.append({
-                "timestamp": int(row.get("timestamp", 0) or 0),
-                "datetime_utc": row.get("datetime_utc",""),
-                "temp_c": float(row.get("temperature_C","") or "nan"),
-                "humidity": float(row.get("humidity_pct","") or "nan"),
-                "temp_band": {
-                    "color": row.get("temp_color",""),
-                    "mode":  row.get("temp_mode",""),
-                    "message": row.get("temp_message",""),
-                },
-                "hum_band": {
-                    "color": row.get("hum_color",""),
-                    "mode":  row.get("hum_mode",""),
-                    "message": row.get("hum_message",""),
-                },
-            })
-        except Exception:
-            continue
-    return out
+from flask import Blueprint, Flask, Response, abort, current_app, jsonify, request
+from typing import List, Dict, Any, Optional
+import hashlib, os, queue, sqlite3, threading, time
+import homee_metrics as metrics
+from homee_http import (ENCODINGS, MIN_COMPRESS, Encoded, PayloadCache, compress, dumps,
+                        negotiate, not_modified, static_payload)
+from homee_recent import RecentBuffer, normalize
+ 
+bp = Blueprint("homee", __name__)
+ 
+# ── Configuration ──────────────────────────────────────────────────────
+def default_config(homee_dir:Optional[str]=None)->Dict[str,Any]:
+    """Paths under HOMEE_DIR (same as homee_reader) and the device id, from the environment."""
+    home = homee_dir or os.environ.get("HOMEE_DIR", "/home/raspberry01/homee")
+    return {
+        "HOMEE_DIR": home,
+        "LOG_FILE": os.path.join(home, "homee_readings.csv"),
+        "RING_FILE": os.path.join(home, "homee_readings.ring"),     # written by homee_reader
+        "ROLLUP_FILE": os.path.join(home, "homee_rollups.json"),    # rollup snapshot
+        "PARTITION_DIR": os.path.join(home, "readings"),            # day partitions from homee_reader
+        "READER_METRICS": os.path.join(home, "homee_reader.prom"),  # written by homee_reader
+        "DB_FILE": os.path.join(home, "homee.db"),  # every device's readings (SQLite, WAL)
+        "DEVICE_ID": os.environ.get("HOMEE_DEVICE", "homee"),  # the Pi this app runs on
+        "MAX_HISTORY": 500,  # server-side cap for safety
+        "MAX_RANGE": 5000,   # cap for /data?from=&to= range queries
+        "SHARED_CACHE": None,  # homee_serve's snapshot file: one of several workers
+    }
+ 
+def create_app(config:Optional[Dict[str,Any]]=None)->Flask:
+    """Build the web app. `config` overrides default_config() keys; a different
+    HOMEE_DIR moves every path not given explicitly. The result is app.config;
+    the stores opened from it are app.extensions["homee"]."""
+    t0 = time.perf_counter()
+    config = dict(config or {})
+    cfg = default_config(config.get("HOMEE_DIR"))
+    unknown = set(config) - set(cfg)
+    if unknown:
+        raise ValueError(f"unknown config keys: {', '.join(sorted(unknown))}")
+    cfg.update(config)
+ 
+    app = Flask(__name__, static_folder=None)  # /static/ is served from memory
+    app.config.update(cfg)
+    app.extensions["homee"] = _Homee(app.config)
+    app.register_blueprint(bp)
+    STARTUP.set(time.perf_counter() - t0)
+    return app
+ 
+def _homee()->"_Homee":
+    """The current app's stores."""
+    return current_app.extensions["homee"]
+ 
+# ── Metrics ────────────────────────────────────────────────────────────
+DATA_SECONDS = metrics.histogram("homee_data_seconds",
+                                 "/data time by phase and limit (rounded up to a power of 2)",
+                                 ["phase", "limit"])
+DATA_ROWS = metrics.histogram("homee_data_rows", "Rows returned by /data",
+                              buckets=(0, 10, 50, 100, 250, 500, 1000, 2500, 5000))
+SUBMITTED = metrics.counter("homee_submit_rows_total", "Readings accepted by /submit", ["result"])
+READER_AGE = metrics.gauge("homee_reader_metrics_age_seconds",
+                           "Age of the metrics file written by homee_reader")
+STARTUP = metrics.gauge("homee_app_startup_seconds", "Time create_app() took, warm start included")
+DATA_CACHE = metrics.counter("homee_data_cache_total",
+                             "/data responses by cache result", ["result"])
+ 
+def _limit_class(limit:int)->str:
+    return str(1 << max(0, limit - 1).bit_length())  # bounded label set: 1, 2, 4 … 8192
+ 
+# ── Stores ─────────────────────────────────────────────────────────────
+class _Homee:
+    """One app's stores, opened from its config (app.config)."""
+    def __init__(self, config:Dict[str,Any]):
+        from homee_alerts import AlertEngine
+        from homee_db import ReadingDB
+        from homee_tail import TailReader
+        self.config = config
+        self.device_id = config["DEVICE_ID"]
+        os.makedirs(config["HOMEE_DIR"], exist_ok=True)
+        self.tail = TailReader(config["LOG_FILE"], config["MAX_HISTORY"])  # parses only appended bytes per poll
+        self.ring = None      # RingStore, once homee_reader has created the file
+        self.rollups = None   # RollupStore, from the first /data/aggregate
+        self.parts = None     # PartitionedLog, from the first range query (read-only here)
+        self.recent = RecentBuffer(config["MAX_HISTORY"])  # this device's readings, fed by /submit
+        self.alerts = AlertEngine()  # rolling stats + alert rules, per device, fed by /submit
+        if config["SHARED_CACHE"]:  # homee_serve's feeder set the DB up; /submit writes directly
+            self.db = ReadingDB(config["DB_FILE"], owner=False)
+        else:
+            self.db = ReadingDB(config["DB_FILE"]).start()  # all devices; other devices' /data reads
+        self.shared = None    # SharedRecent: the feeder's snapshot, in place of recent/alerts
+        self.data_cache = PayloadCache()    # /data tail bodies per (limit, encoding), per buffer version
+        self.device_cache = PayloadCache()  # same for other devices, per DB version
+        self.boot = os.urandom(8).hex()     # keeps ETags from before a restart from matching
+        self._lazy_lock = threading.Lock()
+        self._ring_seen = 0   # ring.count when catch_up() last read the ring
+        if config["SHARED_CACHE"]:
+            from homee_shared import SharedRecent
+            self.shared = SharedRecent(config["SHARED_CACHE"])  # the feeder did the warm start
+        else:
+            self.add_local(self.read_log(config["MAX_HISTORY"]))  # warm start from the ring/CSV
+        self.hub = _Hub(self.tail, config["LOG_FILE"])  # /stream fan-out
+        self.started = time.time()  # Last-Modified of the dashboard page and assets
+        self.index_html, self.index_cache, self.assets = _build_dashboard(self.started)
+ 
+    def open_ring(self):
+        if self.ring is None and os.path.exists(self.config["RING_FILE"]):
+            from homee_ring import RingStore
+            try:
+                self.ring = RingStore(self.config["RING_FILE"])
+            except (OSError, ValueError) as e:
+                print(f"[Ring] Cannot open {self.config['RING_FILE']}: {e}")
+        return self.ring
+ 
+    def read_log(self, limit:int)->List[Dict[str,Any]]:
+        limit = min(limit, self.config["MAX_HISTORY"])
+        ring = self.open_ring()
+        if ring is not None and ring.count >= limit:
+            return ring.tail(limit)  # binary slice, no text parsing
+        return self.tail.read(limit)  # CSV fallback while the ring holds fewer rows than asked
+ 
+    def catch_up(self):
+        """Pull in readings that reached the ring but not /submit (e.g. a POST that gave up).
+        Unless the ring's record count moved, only its mmap'd header is read."""
+        ring = self.open_ring()
+        n = ring.count if ring is not None else 0
+        if n == self._ring_seen:
+            return
+        new = n - self._ring_seen if n > self._ring_seen else n  # a new ring starts over
+        self._ring_seen = n
+        newest = self.recent.newest_ts()
+        # >=: a second reading in the newest second is new too; add() skips repeats
+        self.add_local([r for r in ring.tail(min(new, self.config["MAX_HISTORY"]))
+                        if r["timestamp"] >= newest])
+ 
+    def rollup_store(self):
+        with self._lazy_lock:
+            if self.rollups is None:
+                from homee_rollup import RollupStore
+                self.rollups = RollupStore(self.config["LOG_FILE"], self.config["ROLLUP_FILE"])
+            return self.rollups
+ 
+    def partitions(self):
+        with self._lazy_lock:
+            if self.parts is None:
+                from homee_partition import PartitionedLog
+                self.parts = PartitionedLog(self.config["PARTITION_DIR"], [])  # the header comes from each file
+            return self.parts
+ 
+    def add_local(self, rows:List[Dict[str,Any]])->int:
+        """This device's readings: into the recent buffer and the alert engine."""
+        for r in rows:
+            self.alerts.update(r, self.device_id)
+        return self.recent.add(rows)
+ 
+    def db_version(self):
+        """(version, Last-Modified) for payloads read from the DB. Workers don't see
+        each other's writes, so under homee_serve the feeder's generation stands in:
+        it publishes whenever the DB has rows it hasn't seen."""
+        if self.shared is not None:
+            snap = self.shared.snapshot()
+            return (snap.generation, snap.changed), snap.changed
+        return (self.boot, self.db.version, self.db.changed), self.db.changed
+ 
+    def trend(self, device:str)->Dict[str,Any]:
+        if self.shared is not None:
+            # published by the feeder when it last had news: drop directions gone stale since
+            now, out = time.time(), {}
+            for m, t in self.shared.snapshot().doc.get("trend", {}).get(device, {}).items():
+                if "direction" in t and now - t["newest"] > t["window"]:
+                    t = {k: v for k, v in t.items() if k != "direction"}
+                out[m] = t
+            return out
+        return self.alerts.trend(device)
+ 
+    def close(self):
+        for store in (self.db, self.ring, self.rollups, self.parts, self.shared):
+            if store is not None:
+                store.close()
+ 
+# ── Responses: cached, compressed, conditional ─────────────────────────
+def _send(p:Encoded, mimetype:str, cache_control:str)->Response:
+    headers = p.headers(cache_control)
+    if not_modified(request.headers, p.etag, p.last_modified):
+        return Response(status=304, headers=headers)
+    return Response(p.body, mimetype=mimetype, headers=headers)
  
-@app.route("/")
+def _json_body(obj, phase:str, limit:int)->Response:
+    """Uncached JSON (range queries): fast encoder + compression, serialize time recorded."""
+    t0 = time.perf_counter()
+    enc = negotiate(request.headers.get("Accept-Encoding",""))
+    raw = dumps(obj)
+    body = compress(raw, enc) if enc and len(raw) >= MIN_COMPRESS else raw
+    DATA_SECONDS.labels(phase, _limit_class(limit)).observe(time.perf_counter() - t0)
+    resp = Response(body, mimetype="application/json")
+    if body is not raw:
+        resp.headers["Content-Encoding"] = enc
+        resp.headers["Vary"] = "Accept-Encoding"
+    return resp
+ 
+# ── Live stream (Server-Sent Events) ───────────────────────────────────
+STREAM_QUEUE = 100        # per-client backlog before it is dropped
+STREAM_HEARTBEAT = 15.0   # seconds; keeps proxies from closing idle streams
+ 
+class _Hub:
+    """Fans new CSV rows out to every connected /stream client."""
+    def __init__(self, tail, path:str):
+        self.tail = tail
+        self.path = path
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._seq = None
+        self._watcher = None
+ 
+    def subscribe(self)->"queue.Queue":
+        q = queue.Queue(maxsize=STREAM_QUEUE)
+        with self._lock:
+            if self._watcher is None:  # started on first client, so no clients costs nothing
+                from homee_watch import FileWatcher
+                self._seq, _ = self.tail.updates(0)
+                self._watcher = FileWatcher(self.path, self._on_change).start()
+            self._clients.add(q)
+        return q
+ 
+    def unsubscribe(self, q):
+        with self._lock:
+            self._clients.discard(q)
+ 
+    def _on_change(self):
+        with self._lock:
+            self._seq, rows = self.tail.updates(self._seq)
+            if not rows:
+                return
+            for q in list(self._clients):
+                for row in rows:
+                    try:
+                        q.put_nowait(row)
+                    except queue.Full:  # stalled client: end its stream, it resyncs on reconnect
+                        self._clients.discard(q)
+                        with q.mutex:
+                            q.queue.clear()
+                        q.put_nowait(None)
+                        break
+ 
+# ── Dashboard ──────────────────────────────────────────────────────────
+ASSET_CACHE = "public, max-age=31536000, immutable"  # new content gets a new URL
+ 
+def _fingerprint(name:str, body:bytes)->str:
+    stem, ext = name.rsplit(".", 1)
+    return f"{stem}.{hashlib.blake2b(body, digest_size=8).hexdigest()}.{ext}"
+ 
+def _precompress(body:bytes, modified:float)->Dict[str,Encoded]:
+    cache = {}
+    for enc in ("",) + ENCODINGS:
+        static_payload(body, enc, cache, modified)
+    return cache
+ 
+def _build_dashboard(modified:float):
+    """Fingerprint the stylesheet and script, put their URLs in the page and
+    encode all three once per encoding; requests then only look them up.
+    Returns the page, its {encoding: Encoded} and the assets by file name
+    (body, mimetype, {encoding: Encoded})."""
+    assets, urls = {}, {}
+    for key, name, text, mimetype in (("css", "dashboard.css", DASHBOARD_CSS, "text/css"),
+                                      ("js", "dashboard.js", DASHBOARD_JS, "text/javascript")):
+        body = text.encode()
+        fname = _fingerprint(name, body)
+        assets[fname] = (body, mimetype, _precompress(body, modified))
+        urls[key] = "/static/" + fname
+    page = INDEX_HTML.format(**urls).encode()
+    return page, _precompress(page, modified), assets
+ 
+@bp.route("/")
 def index():
-    return render_template_string("""
+    # The page is small and names the current asset URLs: browsers revalidate
+    # it each time (304 via the ETag) and so pick up a new build at once.
+    h = _homee()
+    p = static_payload(h.index_html, negotiate(request.headers.get("Accept-Encoding","")),
+                       h.index_cache, h.started)
+    return _send(p, "text/html", "no-cache")
+ 
+@bp.route("/static/<name>")
+def asset(name):
+    h = _homee()
+    a = h.assets.get(name)
+    if a is None:
+        abort(404)  # not this build's fingerprint
+    body, mimetype, cache = a
+    p = static_payload(body, negotiate(request.headers.get("Accept-Encoding","")), cache, h.started)
+    return _send(p, mimetype, ASSET_CACHE)
+ 
+# The dashboard: a static page, its stylesheet and script. _build_dashboard()
+# fills in the fingerprinted asset URLs once, when the app is created.
+INDEX_HTML = """
 <!doctype html><html lang="en"><head>
 <meta charset="utf-8"><meta name="viewport" content="width=device-width,initial-scale=1">
 <title>HOMEe Dashboard</title>
-<style>
+<link rel="stylesheet" href="{css}">
+</head>
+<body>
+  <div class="hero">
+    <h1>HOMEe Dashboard</h1>
+    <div class="sub">Last update: <span id="lastLocal">—</span></div>
+    <div class="sub" id="alerts"></div>
+  </div>
+ 
+  <div class="wrap">
+    <div class="cards">
+      <div class="card" id="tempBox">
+        <div class="k">Temperature</div>
+        <div class="value">
+          <span id="t">—</span> °C
+          <span id="tArrow" class="arrow">–</span>
+        </div>
+        <div id="tmsg" class="k" style="margin-top:6px;">—</div>
+      </div>
+      <div class="card" id="humBox">
+        <div class="k">Humidity</div>
+        <div class="value">
+          <span id="h">—</span> %
+          <span id="hArrow" class="arrow">–</span>
+        </div>
+        <div id="hmsg" class="k" style="margin-top:6px;">—</div>
+      </div>
+    </div>
+ 
+    <h3 style="margin:22px 0 8px 0;">Recent readings</h3>
+    <label class="k">Show last
+      <select id="limitSel">
+        <option selected>50</option><option>100</option><option>200</option><option>500</option>
+      </select> entries
+    </label>
+ 
+    <table>
+      <thead><tr><th>Local time</th><th>°C</th><th>%</th><th>Temp status</th><th>Hum status</th></tr></thead>
+      <tbody id="recent"></tbody>
+    </table>
+  </div>
+ 
+<script src="{js}"></script>
+</body></html>
+"""
+ 
+DASHBOARD_CSS = """
   :root{
     --bg:#0f172a; --card:#0b1022; --text:#e5e7eb; --muted:#94a3b8;
     --radius:14px; font-family:system-ui,-apple-system,Segoe UI,Roboto,sans-serif;
@@ -89,48 +395,9 @@ def index():
     padding:6px 10px; border-radius:8px; border:1px solid rgba(255,255,255,.18);
     background:#0f172a; color:var(--text)
   }
-</style>
-</head>
-<body>
-  <div class="hero">
-    <h1>HOMEe Dashboard</h1>
-    <div class="sub">Last update: <span id="lastLocal">—</span></div>
-  </div>
+"""
  
-  <div class="wrap">
-    <div class="cards">
-      <div class="card" id="tempBox">
-        <div class="k">Temperature</div>
-        <div class="value">
-          <span id="t">—</span> °C
-          <span id="tArrow" class="arrow">–</span>
-        </div>
-        <div id="tmsg" class="k" style="margin-top:6px;">—</div>
-      </div>
-      <div class="card" id="humBox">
-        <div class="k">Humidity</div>
-        <div class="value">
-          <span id="h">—</span> %
-          <span id="hArrow" class="arrow">–</span>
-        </div>
-        <div id="hmsg" class="k" style="margin-top:6px;">—</div>
-      </div>
-    </div>
- 
-    <h3 style="margin:22px 0 8px 0;">Recent readings</h3>
-    <label class="k">Show last
-      <select id="limitSel">
-        <option selected>50</option><option>100</option><option>200</option><option>500</option>
-      </select> entries
-    </label>
- 
-    <table>
-      <thead><tr><th>Local time</th><th>°C</th><th>%</th><th>Temp status</th><th>Hum status</th></tr></thead>
-      <tbody id="recent"></tbody>
-    </table>
-  </div>
- 
-<script>
+DASHBOARD_JS = """
 function ledColor(c){
   switch(c){
     case "RED":return "#ef4444";
@@ -146,7 +413,10 @@ function localStrFromTS(ts){
   if(!ts) return '';
   return new Date(ts*1000).toLocaleString();
 }
-function trendArrow(curr, prev, eps){
+const ARROWS = {up: "▲", down: "▼", steady: "→"};
+function trendArrow(t, curr, prev, eps){
+  // server-side trend (least squares over the alert window) when we have it
+  if (t && t.direction) return ARROWS[t.direction];
   if(prev == null || isNaN(prev)) return "–";
   const d = curr - prev;
   if (d > eps)  return "▲";
@@ -159,75 +429,397 @@ function applyBlink(el, mode){
   else if(mode === 'flash5') el.classList.add('blink5');
 }
  
-async function load(limit){
+let hist = [];       // newest first
+let cursor = null;   // /data "cursor" (arrival number); sent back as ?since=
+let trend = {};      // /data "trend": rolling stats per metric
+ 
+function renderCurrent(){
+  const cur  = hist[0] || {};
+  const prev = hist.length > 1 ? hist[1] : null;
+ 
+  document.getElementById('lastLocal').textContent = localStrFromTS(cur.timestamp);
+  document.getElementById('t').textContent = (cur.temp_c ?? '—');
+  document.getElementById('h').textContent = (cur.humidity ?? '—');
+ 
+  const tPrev = prev ? prev.temp_c : null;
+  const hPrev = prev ? prev.humidity : null;
+  document.getElementById('tArrow').textContent = trendArrow(trend.temp_c, cur.temp_c, tPrev, 0.1);
+  document.getElementById('hArrow').textContent = trendArrow(trend.humidity, cur.humidity, hPrev, 0.5);
+ 
+  const tb = cur.temp_band || {}, hb = cur.hum_band || {};
+  document.getElementById('tmsg').textContent = tb.message || '';
+  document.getElementById('hmsg').textContent = hb.message || '';
+ 
+  const tBox = document.getElementById('tempBox');
+  const hBox = document.getElementById('humBox');
+  tBox.style.background = ledColor(tb.color);
+  hBox.style.background = ledColor(hb.color);
+  applyBlink(tBox, tb.mode);
+  applyBlink(hBox, hb.mode);
+}
+ 
+function makeRow(r){
+  const tr = document.createElement('tr');
+  [localStrFromTS(r.timestamp), r.temp_c ?? '', r.humidity ?? '',
+   r.temp_band?.message || '', r.hum_band?.message || ''].forEach((v)=>{
+    const td = document.createElement('td');
+    td.textContent = v;
+    tr.appendChild(td);
+  });
+  return tr;
+}
+ 
+// A reading's identity: two readings in the same second are both kept.
+const rowKey = (r)=>r.timestamp + '|' + r.temp_c + '|' + r.humidity;
+ 
+// Full rebuild: first load, limit change, reconnect, a late reading.
+function replaceAll(rows){
+  hist = rows;
+  const body = document.getElementById('recent');
+  const frag = document.createDocumentFragment();
+  hist.forEach((r)=>frag.appendChild(makeRow(r)));
+  body.replaceChildren(frag);
+  renderCurrent();
+}
+ 
+// Delta: prepend the new rows (newest first) and trim the tail to the window.
+// A reading can come twice (/stream, then the poll), so known ones are skipped.
+function addRows(rows){
+  const have = new Set(hist.map(rowKey));
+  rows = rows.filter((r)=>!have.has(rowKey(r)));
+  if (!rows.length) return;
+  if (hist.length && rows.some((r)=>r.timestamp < hist[0].timestamp)){
+    // late reading: put it in its place (stable sort keeps same-second order)
+    return replaceAll(rows.concat(hist).sort((a,b)=>b.timestamp - a.timestamp).slice(0, limit()));
+  }
+  const body = document.getElementById('recent');
+  const frag = document.createDocumentFragment();
+  rows.forEach((r)=>frag.appendChild(makeRow(r)));
+  body.prepend(frag);
+  hist = rows.concat(hist);
+  const n = limit();
+  if (hist.length > n){
+    hist.length = n;
+    while (body.rows.length > n) body.lastElementChild.remove();
+  }
+  renderCurrent();
+}
+ 
+async function load(n){
+  try{
+    const res = await fetch('/data?limit='+n);
+    const obj = await res.json();
+    trend = obj.trend || {};
+    cursor = obj.cursor ?? null;
+    replaceAll(obj.history || []);
+    loadAlerts();
+  }catch(e){ console.error(e); }
+}
+ 
+async function poll(){
+  if (cursor == null) return load(limit());
   try{
-    const res = await fetch('/data?limit='+limit);
+    const res = await fetch('/data?since='+encodeURIComponent(cursor)+'&limit='+limit());
     const obj = await res.json();
-    const hist = obj.history || [];
-    const cur  = obj.current || {};
-    const prev = hist.length > 1 ? hist[1] : null; // newest first
- 
-    document.getElementById('lastLocal').textContent = localStrFromTS(cur.timestamp);
-    document.getElementById('t').textContent = (cur.temp_c ?? '—');
-    document.getElementById('h').textContent = (cur.humidity ?? '—');
- 
-    const tPrev = prev ? prev.temp_c : null;
-    const hPrev = prev ? prev.humidity : null;
-    document.getElementById('tArrow').textContent = trendArrow(cur.temp_c, tPrev, 0.1);
-    document.getElementById('hArrow').textContent = trendArrow(cur.humidity, hPrev, 0.5);
- 
-    const tb = cur.temp_band || {}, hb = cur.hum_band || {};
-    document.getElementById('tmsg').textContent = tb.message || '';
-    document.getElementById('hmsg').textContent = hb.message || '';
- 
-    const tBox = document.getElementById('tempBox');
-    const hBox = document.getElementById('humBox');
-    tBox.style.background = ledColor(tb.color);
-    hBox.style.background = ledColor(hb.color);
-    applyBlink(tBox, tb.mode);
-    applyBlink(hBox, hb.mode);
- 
-    const body = document.getElementById('recent');
-    body.innerHTML = '';
-    hist.forEach((r)=>{
-      const tr = document.createElement('tr');
-      tr.innerHTML = `
-        <td>${localStrFromTS(r.timestamp)}</td>
-        <td>${r.temp_c ?? ''}</td>
-        <td>${r.humidity ?? ''}</td>
-        <td>${(r.temp_band?.message || '')}</td>
-        <td>${(r.hum_band?.message || '')}</td>`;
-      body.appendChild(tr);
-    });
+    const rows = obj.history || [];
+    if (obj.trend) trend = obj.trend;
+    cursor = obj.cursor ?? cursor;
+    // missed more than a window, or the server restarted (the cursor means nothing there)
+    if (obj.reset || rows.length >= limit()) replaceAll(rows);
+    else addRows(rows);
+  }catch(e){ console.error(e); }
+}
  
+async function loadAlerts(){
+  try{
+    const obj = await (await fetch('/alerts')).json();
+    document.getElementById('alerts').textContent =
+      (obj.active || []).map((a)=>'⚠ ' + a.message + (a.device_id ? ' (' + a.device_id + ')' : '')).join('  ·  ');
   }catch(e){ console.error(e); }
 }
  
 const sel = document.getElementById('limitSel');
-sel.addEventListener('change', ()=>load(parseInt(sel.value,10)));
-load(parseInt(sel.value,10));                  // default 50
-setInterval(()=>load(parseInt(sel.value,10)), 5000);
-</script>
-</body></html>
-""")
+const limit = ()=>parseInt(sel.value,10);
+sel.addEventListener('change', ()=>load(limit()));
+ 
+if (window.EventSource){
+  // Push: the server sends each new reading as it is logged; nothing runs while idle.
+  const es = new EventSource('/stream');
+  es.onopen = ()=>(cursor == null ? load(limit()) : poll());  // catch up after (re)connect
+  es.onmessage = (ev)=>{
+    addRows([JSON.parse(ev.data)]);
+    // the reading reaches /submit (trend, alerts) just after the log
+    setTimeout(()=>poll().then(loadAlerts), 1000);
+  };
+} else {
+  load(limit());                                 // default 50
+  setInterval(poll, 5000);                       // only new rows each tick
+}
+"""
  
-@app.route("/data")
+@bp.route("/data")
 def data():
+    h, cfg = _homee(), current_app.config
+    # ?device=<id> selects another Pi's readings (default: this one)
+    device = request.args.get("device") or h.device_id
+    if "from" in request.args or "to" in request.args:
+        # range query: only the day partitions overlapping [from, to) are read
+        try:
+            end = int(request.args.get("to", time.time() + 1))
+            start = int(request.args.get("from", 0))
+            limit = max(0, min(int(request.args.get("limit", cfg["MAX_RANGE"])), cfg["MAX_RANGE"]))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        t0 = time.perf_counter()
+        if device == h.device_id:
+            hist = h.partitions().range(start, end, limit)
+        else:
+            hist = h.db.range(device, start, end, limit)
+        DATA_SECONDS.labels("range", _limit_class(limit)).observe(time.perf_counter() - t0)
+        DATA_ROWS.observe(len(hist))
+        return _json_body({
+            "current": (hist[-1] if hist else {}),
+            "history": hist[::-1]  # newest first
+        }, "serialize", limit)
     try:
         limit = int(request.args.get("limit","50"))  # default 50
     except:
         limit = 50
-    hist = _read_tail(limit)
-    return jsonify({
-        "current": (hist[-1] if hist else {}),
-        "history": hist[::-1]  # newest first
-    })
+    limit = max(0, min(limit, cfg["MAX_HISTORY"]))
+    try:
+        # ?since=<cursor>: only rows that arrived after the last response (delta sync)
+        since = _parse_cursor(request.args["since"]) if "since" in request.args else None
+    except ValueError as e:
+        return jsonify({"error": f"bad since: {e}"}), 400
+    t0 = time.perf_counter()
+    if device == h.device_id and h.shared is not None:
+        snap = h.shared.snapshot()
+        cache, version, changed, key, build = (
+            h.data_cache, (snap.generation, snap.changed), snap.changed, (limit, since),
+            _shared_payload)
+    elif device == h.device_id:
+        h.catch_up()
+        cache, version, changed, key, build = (
+            h.data_cache, (h.boot, h.recent.version, h.recent.newest_ts()), h.recent.changed,
+            (limit, since), _tail_payload)
+    else:
+        version, changed = h.db_version()
+        cache, key, build = h.device_cache, (device, limit, since), _device_payload
+    t1 = time.perf_counter()
+    cls = _limit_class(limit)
+    DATA_SECONDS.labels("read", cls).observe(t1 - t0)
+    # One encoded body per key and encoding until the next reading arrives;
+    # an unchanged buffer is answered with 304 from the ETag/Last-Modified.
+    p, hit = cache.get(version, key, negotiate(request.headers.get("Accept-Encoding","")),
+                       lambda key: build(h, key), changed)
+    if not hit:
+        DATA_SECONDS.labels("serialize", cls).observe(time.perf_counter() - t1)
+    resp = _send(p, "application/json", "no-cache")
+    DATA_CACHE.labels("not_modified" if resp.status_code == 304 else
+                      "hit" if hit else "miss").inc()
+    return resp
+ 
+# Delta cursors are "<epoch>.<arrival number>": the number counts rows as they
+# reach the store (RecentBuffer.seq, the feeder's buffer, the DB's seq column),
+# so a second reading in the same second or a late one is still handed out. The
+# epoch names the counter (this app's boot, the feeder's, "db"); a cursor from
+# another one, or ahead of it, gets the full tail with "reset": true.
+def _parse_cursor(s:str)->tuple:
+    epoch, _, n = s.rpartition(".")
+    return epoch, int(n)
+ 
+def _cursor(epoch:str, seq:int)->str:
+    return f"{epoch}.{seq}"
+ 
+def _delta(since, epoch:str, seq:int)->Optional[int]:
+    """The arrival number to read after, or None for the full tail."""
+    if since is None or since[0] != epoch or since[1] > seq:
+        return None
+    return since[1]
+ 
+def _tail_payload(h:_Homee, key)->Dict[str,Any]:
+    limit, since = key
+    seq = h.recent.seq  # before the rows: one added meanwhile is handed out again
+    after = _delta(since, h.boot, seq)
+    if after is None:
+        hist = h.recent.tail(limit)
+        cur = hist[-1] if hist else {}
+    else:
+        hist = h.recent.since(after, limit)
+        cur = h.recent.newest() or {}  # band state even when nothing is new
+    DATA_ROWS.observe(len(hist))
+    out = {
+        "current": cur,
+        "history": hist[::-1],  # newest first
+        "cursor": _cursor(h.boot, seq),       # pass back as ?since= next time
+        "trend": h.alerts.trend(h.device_id),  # rolling stats over the alert window
+    }
+    if since is not None and after is None:
+        out["reset"] = True
+    return out
+ 
+def _shared_payload(h:_Homee, key)->bytes:
+    """_tail_payload from the shared snapshot: its rows are already JSON, so the
+    body is put together from them rather than serialized again."""
+    limit, since = key
+    snap = h.shared.snapshot()
+    epoch, seq = snap.doc.get("epoch", ""), snap.doc.get("seq", 0)
+    after = _delta(since, epoch, seq)
+    if after is None:
+        hist = snap.tail(limit)
+        cur = hist[-1] if hist else b"{}"
+    else:
+        hist = snap.since(after, limit)
+        cur = snap.rows[-1] if snap.rows else b"{}"
+    DATA_ROWS.observe(len(hist))
+    reset = b',"reset":true' if since is not None and after is None else b""
+    return b"".join((b'{"current":', cur, b',"history":[', b",".join(hist[::-1]),
+                     b'],"cursor":', dumps(_cursor(epoch, seq)), reset,
+                     b',"trend":', dumps(h.trend(h.device_id)), b"}"))
+ 
+def _device_payload(h:_Homee, key)->Dict[str,Any]:
+    device, limit, since = key
+    hist = None
+    if since is not None and since[0] == "db":
+        hist, seq = h.db.since(device, since[1], limit)
+        if since[1] > seq:
+            hist = None  # a newer DB than this one (recreated?): start over
+    reset = since is not None and hist is None
+    if hist is None:
+        seq = h.db.seq()  # before the rows, as in _tail_payload
+        hist = h.db.tail(device, limit)
+    latest = h.db.latest([device])
+    cur = latest[0] if latest else {}
+    DATA_ROWS.observe(len(hist))
+    out = {
+        "current": cur,
+        "history": hist[::-1],  # newest first
+        "cursor": _cursor("db", seq),
+        "trend": h.trend(device),
+    }
+    if reset:
+        out["reset"] = True
+    return out
  
-@app.route("/submit", methods=["POST"])
+@bp.route("/data/latest")
+def latest():
+    # Fleet view: newest reading of every device (or ?device=a,b,...)
+    h = _homee()
+    devices = [d for d in request.args.get("device","").split(",") if d]
+    version, changed = h.db_version()
+    p, _ = h.device_cache.get(version, ("latest", tuple(devices)),
+                              negotiate(request.headers.get("Accept-Encoding","")),
+                              lambda key: {"devices": h.db.latest(list(key[1]))}, changed)
+    return _send(p, "application/json", "no-cache")
+ 
+@bp.route("/data/aggregate")
+def aggregate():
+    # /data/aggregate?bucket=1h&from=<epoch>&to=<epoch>[&points=N][&shape=temp_c|humidity]
+    from homee_classify import classify_points
+    from homee_rollup import parse_bucket
+    try:
+        now = int(time.time())
+        bucket = parse_bucket(request.args.get("bucket","1h"))
+        end = int(request.args.get("to", now))
+        start = int(request.args.get("from", end - 7*86400))
+        points = int(request.args.get("points", 1000))
+        shape = request.args.get("shape") or None
+        if shape not in (None, "temp_c", "humidity"):
+            raise ValueError(f"bad shape: {shape}")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    rollups = _homee().rollup_store()
+    rollups.sync()  # folds in only rows appended since the last call
+    out = rollups.query(bucket, start, end, points, shape)
+    classify_points(out["points"])  # band of each bucket's mean, one vectorized pass
+    return jsonify(out)
+ 
+@bp.route("/alerts")
+def alerts():
+    # Active alerts plus recent raise/clear transitions (?since=<seq> for only newer ones)
+    h = _homee()
+    device = request.args.get("device") or None
+    try:
+        since = int(request.args.get("since", 0))
+        limit = max(1, min(int(request.args.get("limit", 100)), 500))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if h.shared is not None:  # the feeder's engine: events newest first, as events() returns
+        from homee_alerts import page
+        doc = h.shared.snapshot().doc.get("alerts", {})
+        events, cursor = page(doc.get("events", []), doc.get("cursor", 0), since, device, limit)
+        return jsonify({"active": [a for a in doc.get("active", [])
+                                   if device is None or a["device_id"] == device],
+                        "events": events, "cursor": cursor})
+    events, cursor = h.alerts.events(since, device, limit)
+    return jsonify({"active": h.alerts.active(device), "events": events, "cursor": cursor})
+ 
+@bp.route("/stream")
+def stream():
+    hub = _homee().hub
+    q = hub.subscribe()
+    def gen():
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                try:
+                    row = q.get(timeout=STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if row is None:
+                    return
+                yield f"data: {dumps(row).decode()}\n\n"
+        finally:
+            hub.unsubscribe(q)
+    return Response(gen(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+ 
+@bp.route("/submit", methods=["POST"])
 def submit():
-    # No-op; device already logs to CSV
-    _ = request.get_json(silent=True)
-    return jsonify({"ok": True})
+    # One reading or a batched array; the device has already logged it to disk.
+    h = _homee()
+    body = request.get_json(silent=True)
+    items = body if isinstance(body, list) else [body]
+    try:
+        rows = sorted((normalize(r, h.device_id) for r in items), key=lambda r: r["timestamp"])
+    except ValueError as e:
+        SUBMITTED.labels("rejected").inc(len(items))
+        return jsonify({"ok": False, "error": str(e)}), 400
+    if h.shared is not None:
+        # a worker has no writer thread: committed here, one transaction per request
+        # (SQLite orders the workers); the feeder picks the rows up for everyone
+        try:
+            added = h.db.write(rows)
+        except sqlite3.Error as e:  # locked past the busy timeout, or no schema yet
+            print(f"[DB] Write failed: {e}")
+            return jsonify({"ok": False, "error": "store busy, retry"}), 503
+        SUBMITTED.labels("new").inc(added)
+        SUBMITTED.labels("duplicate").inc(len(rows) - added)
+        return jsonify({"ok": True, "accepted": added})
+    if not h.db.submit(rows):  # one queued write; committed in the writer's next batch
+        return jsonify({"ok": False, "error": "store busy, retry"}), 503
+    # "queued": whether a row is new is only known when the DB writer commits it
+    # (homee_db_rows_total); this device's rows are also checked by the buffer here
+    others = [r for r in rows if r["device_id"] != h.device_id]
+    for r in others:
+        h.alerts.update(r)
+    local = [r for r in rows if r["device_id"] == h.device_id]
+    accepted = h.add_local(local)
+    SUBMITTED.labels("new").inc(accepted)
+    SUBMITTED.labels("duplicate").inc(len(local) - accepted)
+    SUBMITTED.labels("queued").inc(len(others))
+    return jsonify({"ok": True, "accepted": accepted + len(others)})
+ 
+@bp.route("/metrics")
+def metrics_text():
+    # Prometheus text format: this process, plus homee_reader's last snapshot.
+    reader, age = metrics.read_textfile(current_app.config["READER_METRICS"])
+    if age is not None:
+        READER_AGE.set(age)
+    return Response(metrics.merge(metrics.REGISTRY.render(), reader),
+                    mimetype="text/plain; version=0.0.4")
  
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=False)
+    # development server; homee_serve.py runs several workers for production
+    create_app().run(host="0.0.0.0", port=5000, debug=False, threaded=True)
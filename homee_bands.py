@@ -1,49 +1,53 @@
 #!/usr/bin/env python3
-import time
+# The LEDs follow homee_reader's samples (homee_sampler.SharedSample): the
+# reader owns the DHT11, so the two don't contend for it. The reader drives the
+# LEDs itself unless it runs with HOMEE_LEDS=0; until then this refuses to
+# start (homee_leds.claim), rather than both writing the same pins.
+import os, time
 from datetime import datetime
-import pigpio
-import pigpio_dht
-from gpiozero import LED
+from homee_classify import TEMP, HUMIDITY
+from homee_hw import get_backend
+from homee_leds import Animator, blink, claim, lock_path
+from homee_sampler import Sampler, SharedSample, sample_path
 
 # ---- LED pins (BCM) ----
-RED     = LED(5)     # temp hot
-ORANGE  = LED(6)     # humidity high
-YELLOW  = LED(13)    # humidity normal
-GREEN   = LED(16)    # temp normal
-BLUE    = LED(19)    # temp cold
-PURPLE  = LED(26)    # humidity low
+LED_PINS = {
+    "RED": 5,      # temp hot
+    "ORANGE": 6,   # humidity high
+    "YELLOW": 13,  # humidity normal
+    "GREEN": 16,   # temp normal
+    "BLUE": 19,    # temp cold
+    "PURPLE": 26,  # humidity low
+}
+TEMP_LEDS = ("RED", "GREEN", "BLUE")
+HUM_LEDS  = ("ORANGE", "YELLOW", "PURPLE")
 
-# DHT11 on GPIO24
-DHT_PIN = 24
-pi = pigpio.pi()
-sensor = pigpio_dht.DHT11(DHT_PIN)
+# homee_reader's data directory: its sampler publishes the DHT11 samples there
+HOMEE_DIR = os.environ.get("HOMEE_DIR", "/home/raspberry01/homee")
 
-BLINK_ON, BLINK_OFF = 3.0, 3.0
+BLINK = blink(3.0, 3.0)  # every non-solid band
 
-def all_off(*leds):
-    for led in leds:
-        led.off()   # cancels any prior blink, too
+# ---- Band rules: shared table in homee_classify ----
+# Temp (°C): b:0–19 | a:19–24 | z:24–27 | y:27–29 | x:29+   (each [lo, next lo))
+# Hum  (%):  b:<31  | a:31–41 | z:41–60 | y:60–70 | x:70+
+LED_BY_COLOR = {}  # filled by setup() from the hardware backend
+ANIM = None        # Animator over LED_BY_COLOR, created by setup()
+_led_lock = None   # held while this process drives the LEDs
 
-# ---- Band rules (your spec) ----
-# Temp (°C): b:0–18 | a:19–23 | z:24–26 | y:27–28 | x:29–100
-# Hum  (%):  b:0–30 | a:31–40 | z:41–59 | y:60–69 | x:70–100
 def temp_band_msg(t):
-    if t is None: return "?", "Temperature reading unavailable."
-    if 29 <= t <= 100: return "x", "Temperature is TOO HOT!"
-    if 27 <= t <= 28:  return "y", "Temperature is TOO HOT! (RED)"
-    if 24 <= t <= 26:  return "z", "Temperature is getting hot (RED)"
-    if 19 <= t <= 23:  return "a", "Temperature is in normal range (GREEN)"
-    if 0  <= t <= 18:  return "b", "Temperature is TOO COLD! (BLUE)"
-    return "?", "Temperature out of expected range."
+    b = None if t is None else TEMP.classify(t)
+    if b is None: return None, "Temperature reading unavailable."
+    return b, b.detail
 
 def humid_band_msg(h):
-    if h is None: return "?", "Humidity reading unavailable."
-    if 70 <= h <= 100: return "x", "Humidity is TOO HIGH! (ORANGE)"
-    if 60 <= h <= 69:  return "y", "Humidity is getting high (ORANGE)"
-    if 41 <= h <= 59:  return "z", "Humidity is in normal range (YELLOW)"
-    if 31 <= h <= 40:  return "a", "Humidity is getting low (PURPLE)"
-    if 0  <= h <= 30:  return "b", "Humidity is TOO LOW! (PURPLE)"
-    return "?", "Humidity out of expected range."
+    b = None if h is None else HUMIDITY.classify(h)
+    if b is None: return None, "Humidity reading unavailable."
+    return b, b.detail
+
+def _show(band, group):
+    # the rest of the group goes off in the same step
+    ANIM.show(group, {} if band is None else
+              {band.color: "solid" if band.mode == "solid" else BLINK})
 
 _last_tb = None
 _last_hb = None
@@ -52,42 +56,60 @@ def apply_temp(tb):
     global _last_tb
     if tb == _last_tb: return
     _last_tb = tb
-    all_off(RED, GREEN, BLUE)
-    if tb == "x": RED.blink(on_time=BLINK_ON, off_time=BLINK_OFF, background=True)
-    elif tb == "y": RED.on()
-    elif tb == "z": RED.on()
-    elif tb == "a": GREEN.on()
-    elif tb == "b": BLUE.blink(on_time=BLINK_ON, off_time=BLINK_OFF, background=True)
+    _show(tb, "temp")
 
 def apply_hum(hb):
     global _last_hb
     if hb == _last_hb: return
     _last_hb = hb
-    all_off(ORANGE, YELLOW, PURPLE)
-    if hb == "x": ORANGE.blink(on_time=BLINK_ON, off_time=BLINK_OFF, background=True)
-    elif hb == "y": ORANGE.on()
-    elif hb == "z": YELLOW.on()
-    elif hb == "a": PURPLE.on()
-    elif hb == "b": PURPLE.blink(on_time=BLINK_ON, off_time=BLINK_OFF, background=True)
+    _show(hb, "hum")
+
+def on_sample(sample):
+    ts = datetime.fromtimestamp(sample.ts).strftime("%Y-%m-%d %H:%M:%S")
+    t, h = sample.temp_c, sample.humidity
+    tb, t_msg = temp_band_msg(t)
+    hb, h_msg = humid_band_msg(h)
+    print(f"[{ts}] Temp {t:.1f}°C | Hum {h:.1f}%")
+    print("  •", t_msg)
+    print("  •", h_msg)
+    apply_temp(tb)
+    apply_hum(hb)
+
+def setup(hw=None):
+    """LEDs from `hw` (default: HOMEE_HW backend) and a sampler on homee_reader's samples.
+    RuntimeError if another process (homee_reader) drives the LEDs."""
+    global ANIM, _led_lock
+    _led_lock = claim(lock_path(HOMEE_DIR), "homee_bands")
+    hw = hw or get_backend()
+    for name, pin in LED_PINS.items():
+        LED_BY_COLOR[name] = hw.led(pin)
+    ANIM = Animator(LED_BY_COLOR, {"temp": TEMP_LEDS, "hum": HUM_LEDS})
+    # Every 2 s, the reader's latest sample; the sensor itself is the reader's.
+    sampler = Sampler(SharedSample(sample_path(HOMEE_DIR)).read, interval=2.0)
+    sampler.subscribe(on_sample)
+    return hw, sampler
+
+def main():
+    try:
+        hw, sampler = setup()
+    except RuntimeError as e:
+        raise SystemExit(f"homee_bands: {e}; start homee_reader with HOMEE_LEDS=0 "
+                         "to leave them to this.")
+    print("H.O.M.E.E bands → LEDs. Ctrl+C to stop.")
+    try:
+        ANIM.start()
+        sampler.start()
+        while True:
+            time.sleep(10)
+            if sampler.latest(max_age=10) is None:
+                print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] No sample from homee_reader "
+                      f"({sampler.last_error}), retrying...")
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        sampler.stop()
+        ANIM.stop()  # all LEDs off
+        hw.close()
 
-print("H.O.M.E.E bands → LEDs. Ctrl+C to stop.")
-try:
-    while True:
-        result = sensor.read()
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        if result["valid"]:
-            t = result["temp_c"]; h = result["humidity"]
-            tb, t_msg = temp_band_msg(t)
-            hb, h_msg = humid_band_msg(h)
-            print(f"[{ts}] Temp {t:.1f}°C | Hum {h:.1f}%")
-            print("  •", t_msg)
-            print("  •", h_msg)
-            apply_temp(tb)
-            apply_hum(hb)
-        else:
-            print(f"[{ts}] DHT11 read failed, retrying...")
-        time.sleep(2)
-except KeyboardInterrupt:
-    print("\nStopped.")
-finally:
-    all_off(RED, ORANGE, YELLOW, GREEN, BLUE, PURPLE)
+if __name__ == "__main__":
+    main()
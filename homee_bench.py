@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# HOMEe: end-to-end latency benchmark on simulated hardware
+# Runs homee_app in-process (werkzeug, free port) and homee_reader on the "sim"
+# hardware backend, both on a throwaway HOMEE_DIR, then drives the scripted
+# button with a press storm and reports, per press:
+#   press → sensor read (classified)   press → CSV row   press → /data visible
+# as p50/p99/max, plus throughput and drops. No Pi needed; any Linux box will do.
+#
+#   python3 homee_bench.py --presses 200 --rate 20 --dht-latency 0.02 [--json out.json]
+#
+# Each simulated DHT11 read returns distinct values, so a reading is followed
+# through the stages by its (temp_c, humidity) pair.
+
+import argparse, contextlib, io, json, logging, os, shutil, sys, tempfile, threading, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def percentile(xs, p):
+    if not xs: return None
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+def summary(xs):
+    ms = [x * 1000 for x in xs]
+    return {"n": len(ms), "p50_ms": percentile(ms, 50), "p99_ms": percentile(ms, 99),
+            "max_ms": max(ms) if ms else None}
+
+def _key(t, h):
+    return (round(float(t), 1), round(float(h), 1))
+
+class Probe:
+    """First time each reading (by key) was seen at each stage."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sensed = []  # (press wall time, sense done wall time, key)
+        self.failed = 0   # presses whose sensor read failed
+        self.seen = {"csv": {}, "data": {}}
+
+    def sense(self, press_time, key):
+        with self.lock:
+            self.sensed.append((press_time, time.time(), key))
+
+    def mark(self, stage, keys):
+        now = time.time()
+        with self.lock:
+            for k in keys:
+                self.seen[stage].setdefault(k, now)
+
+    def pending(self, stage) -> int:
+        with self.lock:
+            return sum(1 for _, _, k in self.sensed if k not in self.seen[stage])
+
+# ── Setup ──────────────────────────────────────────────────────────────
+def _configure(args, workdir):
+    # homee_reader reads its paths at import time, homee_app in create_app().
+    os.environ["HOMEE_HW"] = "sim"
+    os.environ["HOMEE_DIR"] = workdir
+    os.environ["HOMEE_UPLOADER"] = os.path.join(HERE, "fake_dropbox_uploader.sh")
+    os.environ["FAKE_DROPBOX_DIR"] = os.path.join(workdir, "dropbox")
+    sys.path.insert(0, HERE)
+
+def _serve(app):
+    from werkzeug.serving import make_server
+    srv = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=srv.serve_forever, name="homee-bench-http", daemon=True).start()
+    return srv
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="homee-bench-")
+    try:
+        report = _run(args, workdir)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    report["workdir"] = workdir if args.keep else None
+    return report
+
+def _run(args, workdir):
+    _configure(args, workdir)
+    import requests
+    import homee_app, homee_reader
+    from homee_hw import SimBackend
+    from homee_tail import TailReader
+    from homee_watch import FileWatcher
+
+    app = homee_app.create_app()
+    srv = _serve(app)
+    base = f"http://127.0.0.1:{srv.server_port}"
+    homee_reader.SERVER = base + "/submit"
+    homee_reader.SAMPLE_MAX_AGE = args.max_age  # 0: every press waits for its own read
+    homee_reader.SAMPLE_MIN_GAP = args.min_gap
+    homee_reader.SYNC_WINDOW = args.sync_window
+    hw = SimBackend(dht_latency=args.dht_latency, dht_failure_rate=args.dht_fail, seed=args.seed)
+    homee_reader.setup(hw)
+
+    probe = Probe()
+    sense = homee_reader.SENSE.handler
+    def timed_sense(press_time):
+        try:
+            p = sense(press_time)
+        except Exception:
+            probe.failed += 1
+            raise
+        probe.sense(press_time, _key(p["temp_c"], p["humidity"]))
+        return p
+    homee_reader.SENSE.handler = timed_sense
+
+    # press → CSV: the same inotify watcher + tail reader homee_app's /stream uses
+    tail = TailReader(homee_reader.LOG_FILE, 1000)
+    cursor = [tail.updates(0)[0]]
+    def on_csv():
+        seq, rows = tail.updates(cursor[0])
+        cursor[0] = seq
+        probe.mark("csv", [_key(r["temp_c"], r["humidity"]) for r in rows])
+    watcher = FileWatcher(homee_reader.LOG_FILE, on_csv).start()
+
+    # press → /data: poll like a dashboard would, just much faster
+    stop = threading.Event()
+    polls = [0]
+    def poll():
+        s = requests.Session()
+        while not stop.is_set():
+            try:
+                hist = s.get(base + "/data", params={"limit": 200}, timeout=5).json()["history"]
+                probe.mark("data", [_key(r["temp_c"], r["humidity"]) for r in hist])
+                polls[0] += 1
+            except Exception as e:
+                print(f"[bench] /data poll failed: {e}")
+            stop.wait(args.poll)
+        s.close()
+    poller = threading.Thread(target=poll, name="homee-bench-poll", daemon=True)
+    poller.start()
+
+    homee_reader.start()
+    button = hw.buttons[homee_reader.BTN_PIN]
+    offsets = [i / args.rate for i in range(args.presses)]
+    t0 = time.time()
+    button.play(offsets)
+    pressed = time.time()
+
+    # wait for every press to be sensed (or dropped/failed) and every sensed
+    # reading to show up everywhere, or give up after --drain seconds
+    deadline = time.time() + args.drain
+    while time.time() < deadline:
+        settled = len(probe.sensed) + probe.failed + homee_reader.SENSE.dropped
+        if (settled >= len(button.presses)
+                and probe.pending("csv") == 0 and probe.pending("data") == 0):
+            break
+        time.sleep(0.01)
+    done = time.time()
+
+    stop.set()
+    poller.join(5)
+    watcher.stop()
+    homee_reader.stop()
+    srv.shutdown()
+    app.extensions["homee"].close()  # DB writer, ring and partitions, before the rmtree
+
+    lat = {"sense": [], "csv": [], "data": []}
+    for press, sensed, k in probe.sensed:
+        lat["sense"].append(sensed - press)
+        for stage in ("csv", "data"):
+            if k in probe.seen[stage]:
+                lat[stage].append(probe.seen[stage][k] - press)
+    visible = [probe.seen["data"][k] for _, _, k in probe.sensed if k in probe.seen["data"]]
+    last = max(visible) if visible else done
+    sensor = hw.sensors[homee_reader.DHT_PIN]
+    return {
+        "config": vars(args),
+        "workdir": workdir,
+        "watch_mode": watcher.mode,
+        "presses": len(button.presses),
+        "press_span_s": pressed - t0,
+        "sensed": len(probe.sensed),
+        "latency": {
+            "press_to_sense": summary(lat["sense"]),
+            "press_to_csv": summary(lat["csv"]),
+            "press_to_data": summary(lat["data"]),
+        },
+        "throughput_per_s": len(visible) / (last - t0) if last > t0 else None,
+        "drops": {
+            "sense_queue": homee_reader.SENSE.dropped,
+            "persist_queue": homee_reader.PERSIST.dropped,
+            "http_queue": homee_reader.DELIVER.dropped,
+            "sensor_failed": probe.failed,
+            "not_sensed": len(button.presses) - len(probe.sensed),
+            "not_in_csv": probe.pending("csv"),
+            "not_in_data": probe.pending("data"),
+        },
+        "sensor": {"reads": sensor.reads, "sampler_failures": homee_reader.SAMPLER.failures},
+        "data_polls": polls[0],
+    }
+
+def _print(report):
+    print(f"\npresses {report['presses']} over {report['press_span_s']:.2f}s, "
+          f"sensed {report['sensed']}, watcher: {report['watch_mode']}")
+    print(f"{'stage':<16}{'n':>6}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    fmt = lambda v: f"{v:10.1f}" if v is not None else f"{'-':>10}"
+    for name, s in report["latency"].items():
+        print(f"{name:<16}{s['n']:>6}{fmt(s['p50_ms'])}{fmt(s['p99_ms'])}{fmt(s['max_ms'])}")
+    tp = report["throughput_per_s"]
+    print(f"throughput: {tp:.1f} readings/s" if tp else "throughput: -")
+    print("drops: " + ", ".join(f"{k}={v}" for k, v in report["drops"].items()))
+    print(f"sensor reads {report['sensor']['reads']}, "
+          f"failed {report['sensor']['sampler_failures']}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="HOMEe press → CSV → /data latency benchmark")
+    ap.add_argument("--presses", type=int, default=100, help="button presses in the storm")
+    ap.add_argument("--rate", type=float, default=10.0, help="presses per second")
+    ap.add_argument("--dht-latency", type=float, default=0.0, help="simulated read time (s)")
+    ap.add_argument("--dht-fail", type=float, default=0.0, help="simulated read failure rate")
+    ap.add_argument("--min-gap", type=float, default=0.0, help="sampler min gap between reads (s)")
+    ap.add_argument("--max-age", type=float, default=0.0, help="reuse samples up to this old (s)")
+    ap.add_argument("--poll", type=float, default=0.005, help="/data poll interval (s)")
+    ap.add_argument("--sync-window", type=float, default=3600.0, help="cloud sync debounce (s)")
+    ap.add_argument("--drain", type=float, default=30.0, help="max wait after the last press (s)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    ap.add_argument("--keep", action="store_true", help="keep the HOMEE_DIR (CSV, ring, DB)")
+    ap.add_argument("-v", "--verbose", action="store_true", help="show reader/server output")
+    args = ap.parse_args(argv)
+    if args.verbose:
+        report = run(args)
+    else:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = run(args)
+    _print(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
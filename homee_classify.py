@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# HOMEe: table-driven band classification
+# The band table is the single source of truth for homee_reader, homee_bands and
+# the web app. Each band covers [lo, next band's lo), so there are no gaps
+# between the integer ranges of the original table (23.5 °C is "Ideal temp").
+# Scalars are classified with bisect; arrays with NumPy searchsorted when NumPy
+# is installed (a plain bisect loop otherwise). NumPy is imported on the first
+# batch call, not with this module: the reader and the web app import the band
+# table at startup, and NumPy alone is ~0.1 s of that on a Pi.
+
+import bisect, csv, io, math, os
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+_np = False  # not imported yet
+
+def numpy():
+    """The numpy module, imported on first use; None when it isn't installed."""
+    global _np
+    if _np is False:
+        try:
+            import numpy as np
+        except ImportError:  # optional: only speeds up the batch API
+            np = None
+        _np = np
+    return _np
+
+class Band(NamedTuple):
+    lo: float      # inclusive lower bound
+    code: str      # short code shown by homee_bands
+    color: str     # LED
+    mode: str      # solid | flash1 | flash5
+    message: str   # logged to the CSV / shown on the dashboard
+    detail: str    # longer console text
+
+INF = float("inf")
+
+# ── Tables (from your table) ───────────────────────────────────────────
+TEMP_BANDS = [
+    Band(-INF, "?",  "BLUE",  "flash1", "TEMP IS TOO COLD!",    "Temperature out of expected range."),
+    Band(0,    "b",  "BLUE",  "flash5", "TEMP is too cold",     "Temperature is TOO COLD! (BLUE)"),
+    Band(19,   "a",  "GREEN", "solid",  "Ideal temp",           "Temperature is in normal range (GREEN)"),
+    Band(24,   "z",  "RED",   "solid",  "Temp is getting high", "Temperature is getting hot (RED)"),
+    Band(27,   "y",  "RED",   "flash5", "Temp is too hot",      "Temperature is TOO HOT! (RED)"),
+    Band(29,   "x",  "RED",   "flash1", "TEMP IS TOO HOT!",     "Temperature is TOO HOT!"),
+]
+HUM_BANDS = [
+    Band(-INF, "b",  "PURPLE", "flash5", "HUM IS TOO LOW!",       "Humidity is TOO LOW! (PURPLE)"),
+    Band(31,   "a",  "PURPLE", "solid",  "Humidity getting low",  "Humidity is getting low (PURPLE)"),
+    Band(41,   "z",  "YELLOW", "solid",  "Ideal humidity",        "Humidity is in normal range (YELLOW)"),
+    Band(60,   "y",  "ORANGE", "solid",  "Humidity getting high", "Humidity is getting high (ORANGE)"),
+    Band(70,   "x",  "ORANGE", "flash5", "HUM IS TOO HIGH!",      "Humidity is TOO HIGH! (ORANGE)"),
+]
+
+class BandTable:
+    def __init__(self, name: str, bands: Sequence[Band]):
+        self.name = name
+        self.bands = sorted(bands, key=lambda b: b.lo)
+        self.bounds = [b.lo for b in self.bands[1:]]
+        self._np_bounds = None
+
+    def index(self, value: float) -> int:
+        """Band index for one value; -1 for NaN."""
+        if value != value:
+            return -1
+        return bisect.bisect_right(self.bounds, value)
+
+    def classify(self, value: float) -> Optional[Band]:
+        i = self.index(value)
+        return self.bands[i] if i >= 0 else None
+
+    def index_many(self, values):
+        """Band indexes for a sequence of values in one pass (-1 for NaN)."""
+        np = numpy()
+        if np is not None:
+            if self._np_bounds is None:
+                self._np_bounds = np.asarray(self.bounds, dtype=float)
+            v = np.asarray(values, dtype=float)
+            idx = np.searchsorted(self._np_bounds, v, side="right")
+            idx[np.isnan(v)] = -1
+            return idx
+        return [self.index(v) for v in values]
+
+    def column(self, field: str, idx) -> List[Any]:
+        """Look up one Band field for an array of indexes (missing band → "")."""
+        values = [getattr(b, field) for b in self.bands] + [""]  # idx -1 hits the ""
+        np = numpy()
+        if np is not None:
+            return np.asarray(values, dtype=object)[np.asarray(idx)].tolist()
+        return [values[i] for i in idx]
+
+TEMP = BandTable("temp", TEMP_BANDS)
+HUMIDITY = BandTable("humidity", HUM_BANDS)
+
+# ── Scalar API (what homee_reader logs) ────────────────────────────────
+_NO_BAND = ("", "", "")  # NaN: no band (as BandTable.column gives the batch API)
+
+def classify_temp(c):
+    b = TEMP.classify(c)
+    return _NO_BAND if b is None else (b.color, b.mode, b.message)
+
+def classify_humidity(rh):
+    b = HUMIDITY.classify(rh)
+    return _NO_BAND if b is None else (b.color, b.mode, b.message)
+
+# ── Batch API ──────────────────────────────────────────────────────────
+def _float(s: str) -> float:
+    try:
+        return float(s)
+    except ValueError:
+        return math.nan
+
+# homee_reader's layout: the band columns come last, after four fields that are
+# never quoted, so a row is an unchanged prefix plus one of a few band suffixes.
+READER_HEADER = ["timestamp", "datetime_utc", "temperature_C", "humidity_pct",
+                 "temp_color", "temp_mode", "temp_message",
+                 "hum_color", "hum_mode", "hum_message"]
+CELL_WIDTH = 24  # widest number cell the column parse takes
+
+def _cells(np, buf, lo, hi) -> Optional[Any]:
+    """Floats of the cells buf[lo:hi] (NaN for empty or garbled ones), parsed as
+    one fixed-width bytes array; None if a cell is wider than CELL_WIDTH."""
+    width = hi - lo
+    w = int(width.max())
+    if w > CELL_WIDTH:
+        return None
+    a = np.zeros((len(lo), max(w, 1)), dtype=np.uint8)
+    for j in range(w):  # a handful of byte columns, each over every row
+        a[:, j] = np.where(j < width, buf[np.minimum(lo + j, len(buf) - 1)], 0)
+    a = a.view(f"S{a.shape[1]}").ravel()
+    a[a == b""] = b"nan"  # a failed read is logged with empty cells
+    try:
+        return a.astype(float)
+    except ValueError:  # a garbled cell: NaN for that one
+        return np.array([_float(v.decode()) for v in a], dtype=float)
+
+def _reclassify_reader_csv(data: bytes, temp: BandTable, hum: BandTable) -> Optional[tuple]:
+    """(new file bytes, row count) for a CSV in homee_reader's layout, a column
+    at a time; None for anything else (quoted or short rows, other columns)."""
+    np = numpy()
+    head, _, body = data.partition(b"\n")
+    header = ",".join(READER_HEADER).encode() + b"\r\n"  # line ends as the csv module's
+    if np is None or head.rstrip(b"\r") + b"\r\n" != header:
+        return None
+    if not body:
+        return header, 0
+    buf = np.frombuffer(body, dtype=np.uint8)
+    ends = np.flatnonzero(buf == ord("\n"))
+    if body[-1:] != b"\n":
+        ends = np.append(ends, len(buf))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    commas = np.flatnonzero(buf == ord(","))
+    k = np.searchsorted(commas, starts)  # each row's first comma
+    if k[-1] + 3 >= len(commas):
+        return None
+    c = commas[k[:, None] + np.arange(4)]  # ... and the next three
+    quotes = np.flatnonzero(buf == ord('"'))
+    first = np.searchsorted(quotes, starts)
+    if (c[:, 3] >= ends).any() or (np.searchsorted(quotes, c[:, 3]) != first).any() or \
+            ((np.searchsorted(quotes, ends) - first) % 2).any():
+        return None  # fewer than four fields, a quote in them, or a newline inside quotes
+    t = _cells(np, buf, c[:, 1] + 1, c[:, 2])
+    h = _cells(np, buf, c[:, 2] + 1, c[:, 3])
+    if t is None or h is None:
+        return None
+    nh = len(hum.bands) + 1  # + the no-band slot at -1
+    pair = (np.asarray(temp.index_many(t)) % (len(temp.bands) + 1) * nh
+            + np.asarray(hum.index_many(h)) % nh)
+    # every (temp band, hum band) suffix, encoded by the csv module once
+    bands = lambda table: [(b.color, b.mode, b.message) for b in table.bands] + [_NO_BAND]
+    suffixes = []
+    for tb in bands(temp):
+        for hb in bands(hum):
+            out = io.StringIO()
+            csv.writer(out).writerow(("",) + tb + hb)
+            suffixes.append(out.getvalue().encode())
+    s_len = np.array([len(x) for x in suffixes])
+    table = np.zeros((len(suffixes), s_len.max()), dtype=np.uint8)
+    for i, x in enumerate(suffixes):
+        table[i, :len(x)] = np.frombuffer(x, dtype=np.uint8)
+    # the output is each row's prefix then its suffix: two masked copies
+    pre, suf = c[:, 3] - starts, s_len[pair]
+    rest = np.append(starts[1:], len(buf)) - c[:, 3]  # the old bands and the newline
+    out = np.empty(int(pre.sum() + suf.sum()), dtype=np.uint8)
+    is_pre = _alternate(np, pre, suf)
+    out[is_pre] = buf[_alternate(np, pre, rest)]
+    out[~is_pre] = table[pair][(np.arange(table.shape[1]) < s_len[:, None])[pair]]
+    return header + out.tobytes(), len(starts)
+
+def _alternate(np, on, off):
+    """Boolean mask: on[0] True, off[0] False, on[1] True, ..."""
+    flags = np.tile(np.array([True, False]), len(on))
+    return np.repeat(flags, np.column_stack((on, off)).ravel())
+
+def reclassify_csv(src: str, dst: Optional[str] = None,
+                   temp: BandTable = TEMP, hum: BandTable = HUMIDITY) -> int:
+    """Rewrite the band columns of a readings CSV from the current tables.
+
+    Writes to `dst` (default: `src`, replaced atomically). Returns the row count.
+    homee_reader's own files go through NumPy a column at a time: the number
+    cells are cut out of the raw bytes, classified with searchsorted, and each
+    row is written back as its untouched prefix plus its pair of bands, in one
+    pass (~0.45 s for 200k rows here, 1.75 s through the csv module). Other
+    layouts, or no NumPy, take the csv module row by row.
+    """
+    out = dst or src
+    tmp = out + ".tmp"
+    with open(src, "rb") as f:
+        fast = _reclassify_reader_csv(f.read(), temp, hum)
+    if fast is not None:
+        with open(tmp, "wb") as f:
+            f.write(fast[0])
+        os.replace(tmp, out)
+        return fast[1]
+    with open(src, newline="") as f:
+        rows = list(csv.reader(f))
+    if not rows:
+        return 0
+    header, body = rows[0], rows[1:]
+    col = {name: header.index(name) for name in header}
+    ti = temp.index_many([_float(r[col["temperature_C"]]) for r in body])
+    hi = hum.index_many([_float(r[col["humidity_pct"]]) for r in body])
+    for prefix, table, idx in (("temp", temp, ti), ("hum", hum, hi)):
+        for field in ("color", "mode", "message"):
+            c = col[f"{prefix}_{field}"]
+            for r, v in zip(body, table.column(field, idx)):
+                r[c] = v
+    with open(tmp, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        w.writerows(body)
+    os.replace(tmp, out)
+    return len(body)
+
+def classify_points(points: List[Dict[str, Any]],
+                    temp: BandTable = TEMP, hum: BandTable = HUMIDITY) -> List[Dict[str, Any]]:
+    """Add temp_band/hum_band (from the bucket means) to rollup query points."""
+    ti = temp.index_many([p["temp_c"]["mean"] for p in points])
+    hi = hum.index_many([p["humidity"]["mean"] for p in points])
+    for key, table, idx in (("temp_band", temp, ti), ("hum_band", hum, hi)):
+        cols = {f: table.column(f, idx) for f in ("color", "mode", "message")}
+        for n, p in enumerate(points):
+            p[key] = {f: cols[f][n] for f in cols}
+    return points
+
+def band_messages() -> Dict[tuple, str]:
+    """(color, mode) → message for every band; the pair is unique across both tables."""
+    return {(b.color, b.mode): b.message for t in (TEMP, HUMIDITY) for b in t.bands}
+
+if __name__ == "__main__":
+    # Re-band stored readings after editing the tables:
+    #   python3 homee_classify.py homee_readings.csv [homee_readings.ring ...]
+    import sys, time
+    for path in sys.argv[1:]:
+        t0 = time.perf_counter()
+        if path.endswith(".ring"):
+            from homee_ring import reclassify as reclassify_ring
+            n = reclassify_ring(path)
+        else:
+            n = reclassify_csv(path)
+        print(f"{path}: {n} rows re-banded in {time.perf_counter() - t0:.3f}s")
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# HOMEe: multi-device reading store (SQLite, WAL)
+# Every HOMEe Pi posts its readings with a device_id; the hub keeps them all in
+# one SQLite file:
+#   readings – clustered on (device_id, timestamp, temp_c, humidity), so
+#              per-device ranges and "newest N" are index range scans; a retried
+#              reading is ignored, a different one in the same second is kept
+#   seq      – arrival number of each reading, one counter over all devices,
+#              assigned in the write transaction: ?since= cursors and the
+#              feeder follow it, so late or same-second readings aren't missed
+#   latest   – one row per device, upserted in the same transaction, so the
+#              fleet view is O(devices) instead of a GROUP BY over all readings
+# Writes are queued and applied by one writer thread in batched transactions
+# (homee_pipeline.Stage with batch=N); readers borrow pooled connections, and
+# WAL lets them run while a batch is being written. The pool stands in for
+# per-thread connections: the threaded server starts a thread per request, so
+# thread-local connections would be opened for every request and closed only
+# when the thread object is collected.
+#
+# Under homee_serve the feeder opens the file first and owns it: it creates and
+# migrates the schema, then only reads. Each worker opens it with owner=False
+# (no schema script, no migration, no writer thread) and commits its /submit
+# rows with write(); SQLite's write lock orders the workers, and the seq base is
+# read under it.
+
+import queue, sqlite3, threading, time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from homee_pipeline import Stage
+import homee_metrics as metrics
+
+BATCH = 500          # readings per transaction (at most)
+QUEUE = 1000         # pending submit() calls before new ones are refused
+POOL_SIZE = 8        # idle read connections kept around
+BUSY_TIMEOUT = 5.0   # seconds a connection waits for a lock
+MAX_VARS = 500       # bound parameters per statement (SQLite's limit is 999 on old builds)
+
+COLUMNS = ("device_id", "timestamp", "datetime_utc", "temp_c", "humidity",
+           "temp_color", "temp_mode", "temp_message", "hum_color", "hum_mode", "hum_message")
+
+_READINGS = """
+CREATE TABLE IF NOT EXISTS readings (
+    device_id TEXT NOT NULL, timestamp INTEGER NOT NULL, datetime_utc TEXT,
+    temp_c REAL NOT NULL, humidity REAL NOT NULL,
+    temp_color TEXT, temp_mode TEXT, temp_message TEXT,
+    hum_color TEXT, hum_mode TEXT, hum_message TEXT, seq INTEGER,
+    PRIMARY KEY (device_id, timestamp, temp_c, humidity)
+) WITHOUT ROWID;
+"""
+SCHEMA = _READINGS + """
+CREATE TABLE IF NOT EXISTS latest (
+    device_id TEXT PRIMARY KEY, timestamp INTEGER NOT NULL, datetime_utc TEXT,
+    temp_c REAL, humidity REAL,
+    temp_color TEXT, temp_mode TEXT, temp_message TEXT,
+    hum_color TEXT, hum_mode TEXT, hum_message TEXT
+);
+CREATE INDEX IF NOT EXISTS readings_ts ON readings (timestamp);
+"""
+
+_INSERT = (f"INSERT OR IGNORE INTO readings ({','.join(COLUMNS)},seq) "
+           f"VALUES ({','.join('?' * (len(COLUMNS) + 1))})")
+_UPSERT = (f"INSERT INTO latest ({','.join(COLUMNS)}) VALUES ({','.join('?' * len(COLUMNS))}) "
+           f"ON CONFLICT(device_id) DO UPDATE SET "
+           + ",".join(f"{c}=excluded.{c}" for c in COLUMNS[1:])
+           + " WHERE excluded.timestamp >= latest.timestamp")  # same second: the later one
+_SELECT = f"SELECT {','.join(COLUMNS)} FROM"
+_SEQ_INDEX = "CREATE INDEX IF NOT EXISTS readings_seq ON readings (seq)"
+_MAX_SEQ = "SELECT COALESCE(MAX(seq), 0) FROM readings"
+
+BATCH_SECONDS = metrics.histogram("homee_db_batch_seconds", "Time to commit one write batch")
+BATCH_ROWS = metrics.histogram("homee_db_batch_rows", "Readings per write transaction",
+                               buckets=(1, 5, 10, 50, 100, 250, 500, 1000))
+ROWS = metrics.counter("homee_db_rows_total", "Readings written, by result", ["result"])
+
+def _params(r: Dict[str, Any]) -> tuple:
+    tb, hb = r.get("temp_band") or {}, r.get("hum_band") or {}
+    return (r["device_id"], r["timestamp"], r.get("datetime_utc", ""), r["temp_c"], r["humidity"],
+            tb.get("color", ""), tb.get("mode", ""), tb.get("message", ""),
+            hb.get("color", ""), hb.get("mode", ""), hb.get("message", ""))
+
+def _row(t: tuple) -> Dict[str, Any]:
+    """DB tuple → the /data row shape (NULL temperatures come back as NaN)."""
+    nan = float("nan")
+    return {
+        "device_id": t[0], "timestamp": t[1], "datetime_utc": t[2] or "",
+        "temp_c": nan if t[3] is None else t[3],
+        "humidity": nan if t[4] is None else t[4],
+        "temp_band": {"color": t[5] or "", "mode": t[6] or "", "message": t[7] or ""},
+        "hum_band": {"color": t[8] or "", "mode": t[9] or "", "message": t[10] or ""},
+    }
+
+def _migrate(c: sqlite3.Connection):
+    """Bring an older readings table up to date: re-key one keyed on
+    (device_id, timestamp) only, which dropped a second, different reading in
+    the same second, and add the seq column (older rows keep NULL: they are
+    before every cursor)."""
+    info = list(c.execute("PRAGMA table_info(readings)"))
+    if "seq" not in [r[1] for r in info]:
+        c.execute("ALTER TABLE readings ADD COLUMN seq INTEGER")
+    c.execute(_SEQ_INDEX)
+    pk = [r[1] for r in sorted(info, key=lambda r: r[5]) if r[5]]
+    if pk != ["device_id", "timestamp"]:
+        return
+    cols = ",".join(COLUMNS)
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.execute("ALTER TABLE readings RENAME TO readings_old")
+        c.execute("DROP INDEX IF EXISTS readings_ts")
+        c.execute(_READINGS)
+        c.execute(f"INSERT INTO readings ({cols}) SELECT {cols} FROM readings_old "
+                  "WHERE temp_c IS NOT NULL AND humidity IS NOT NULL")
+        skipped = c.execute("SELECT COUNT(*) FROM readings_old").fetchone()[0] - \
+                  c.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+        c.execute("DROP TABLE readings_old")
+        c.execute("CREATE INDEX IF NOT EXISTS readings_ts ON readings (timestamp)")
+        c.execute(_SEQ_INDEX)
+        c.execute("COMMIT")
+    except BaseException:
+        c.execute("ROLLBACK")
+        raise
+    print("[DB] Re-keyed readings on (device_id, timestamp, temp_c, humidity)"
+          + (f"; dropped {skipped} without a temperature or humidity" if skipped else ""))
+
+class ReadingDB:
+    def __init__(self, path: str, batch: int = BATCH, pool_size: int = POOL_SIZE,
+                 owner: bool = True):
+        self.path = path
+        self.pool_size = pool_size
+        self.version = 0             # bumped after every committed batch (payload cache key)
+        self.changed = time.time()   # wall time of that commit (Last-Modified)
+        self._pool = queue.LifoQueue()
+        self._writer = self._connect()
+        self._write_lock = threading.Lock()  # write() is also called from request threads
+        if owner:  # otherwise another process (homee_serve's feeder) set the schema up
+            self._writer.executescript(SCHEMA)
+            _migrate(self._writer)
+        self._stage = Stage("db", self._write_batch, maxsize=QUEUE, retries=2,
+                            backoff=0.1, batch=batch)
+        self._started = False
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def _connect(self) -> sqlite3.Connection:
+        c = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                            isolation_level=None)  # explicit BEGIN/COMMIT below
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")  # WAL: durable at checkpoints, never corrupt
+        return c
+
+    # ── Writes ─────────────────────────────────────────────────────────
+    def start(self):
+        """Start the writer thread behind submit()."""
+        self._stage.start()
+        self._started = True
+        return self
+
+    def submit(self, rows: List[Dict[str, Any]]) -> bool:
+        """Queue normalized rows (each with a device_id); False if the queue is full."""
+        if not rows:
+            return True
+        self._idle.clear()
+        return self._stage.put(rows)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything submitted so far is committed."""
+        deadline = time.monotonic() + timeout
+        while self._stage.pending() or not self._idle.is_set():
+            if time.monotonic() > deadline:
+                return False
+            self._idle.wait(0.01)
+        return True
+
+    def write(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Insert rows now, in one transaction (the writer thread's path, and a
+        homee_serve worker's)."""
+        params = [_params(r) for r in rows]
+        if not params:
+            return 0
+        t0 = time.perf_counter()
+        c = self._writer
+        with self._write_lock:
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                base = c.execute(_MAX_SEQ).fetchone()[0] + 1  # under the write lock: no other writer
+                before = c.total_changes
+                c.executemany(_INSERT, [p + (base + i,) for i, p in enumerate(params)])
+                added = c.total_changes - before
+                c.executemany(_UPSERT, params)
+                c.execute("COMMIT")
+            except BaseException:
+                c.execute("ROLLBACK")
+                raise
+            self.version += 1
+            self.changed = time.time()
+        BATCH_SECONDS.observe(time.perf_counter() - t0)
+        BATCH_ROWS.observe(len(params))
+        ROWS.labels("new").inc(added)
+        ROWS.labels("duplicate").inc(len(params) - added)  # the same reading again
+        return added
+
+    def _write_batch(self, batches: List[List[Dict[str, Any]]]):
+        try:
+            self.write(r for rows in batches for r in rows)
+        finally:
+            if not self._stage.pending():
+                self._idle.set()
+
+    # ── Reads ──────────────────────────────────────────────────────────
+    @contextmanager
+    def conn(self):
+        """Borrow a read connection; returned to the pool afterwards."""
+        try:
+            c = self._pool.get_nowait()
+        except queue.Empty:
+            c = self._connect()
+            c.execute("PRAGMA query_only=ON")
+        try:
+            yield c
+        finally:
+            if self._pool.qsize() < self.pool_size:
+                self._pool.put(c)
+            else:
+                c.close()
+
+    def _query(self, sql: str, args=()) -> List[Dict[str, Any]]:
+        with self.conn() as c:
+            return [_row(t) for t in c.execute(sql, args)]
+
+    def devices(self) -> List[str]:
+        with self.conn() as c:
+            return [d for (d,) in c.execute("SELECT device_id FROM latest ORDER BY device_id")]
+
+    def latest(self, devices: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Newest reading of every device (or of `devices`)."""
+        if not devices:
+            return self._query(f"{_SELECT} latest ORDER BY device_id")
+        out = []
+        for i in range(0, len(devices), MAX_VARS):
+            chunk = devices[i:i + MAX_VARS]
+            marks = ",".join("?" * len(chunk))
+            out += self._query(f"{_SELECT} latest WHERE device_id IN ({marks})", chunk)
+        out.sort(key=lambda r: r["device_id"])
+        return out
+
+    def range(self, device: str, start: int, end: int, limit: int) -> List[Dict[str, Any]]:
+        """Newest `limit` readings of `device` in [start, end), oldest first."""
+        if limit <= 0:
+            return []  # SQLite reads LIMIT -1 as no limit at all
+        rows = self._query(f"{_SELECT} readings WHERE device_id=? AND timestamp>=? AND timestamp<? "
+                           "ORDER BY timestamp DESC LIMIT ?", (device, start, end, limit))
+        rows.reverse()
+        return rows
+
+    def tail(self, device: str, limit: int) -> List[Dict[str, Any]]:
+        return self.range(device, -2**63, 2**63 - 1, limit)
+
+    def since(self, device: Optional[str], seq: int, limit: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Readings of `device` (None: every device) written after arrival number
+        `seq`, at most the newest `limit`, oldest first; plus the newest arrival
+        number, read in the same transaction (the cursor for the next call)."""
+        where, args = ("seq > ?", (seq,)) if device is None else \
+                      ("seq > ? AND device_id = ?", (seq, device))
+        with self.conn() as c:
+            c.execute("BEGIN")
+            try:
+                rows = [_row(t) for t in c.execute(
+                    f"{_SELECT} readings WHERE {where} ORDER BY timestamp DESC LIMIT ?",
+                    args + (max(0, limit),))]
+                newest = c.execute(_MAX_SEQ).fetchone()[0]
+            finally:
+                c.execute("COMMIT")
+        rows.reverse()
+        return rows, newest
+
+    def seq(self) -> int:
+        """The newest arrival number (0 for an empty store)."""
+        with self.conn() as c:
+            return c.execute(_MAX_SEQ).fetchone()[0]
+
+    def close(self):
+        if self._started:
+            self._stage.stop()
+        self._writer.close()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
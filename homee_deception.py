@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# HOMEe: motion / deception dashboard (implements pseudo_deception_webpage.py)
+# The sensors run in homee_runtime on a background event loop; every event it
+# reports goes to the append-only journal (homee_journal), which backs the log
+# routes:
+#   /api/motion_log  – one page of events, newest first (?cursor=&limit=&type=&since=&until=)
+#   /api/export_log  – the whole journal as CSV, streamed in chunks
+#   /api/clear_log   – empties the journal without stopping the writers
+# and /api/presence lists the cards checked in (homee_presence).
+
+import asyncio, os, threading, time
+from flask import Flask, Response, jsonify, request
+from homee_journal import MAX_PAGE, PAGE_LIMIT, Journal
+from homee_presence import Presence
+from homee_runtime import Runtime
+
+app = Flask(__name__)
+
+HOMEE_DIR = os.environ.get("HOMEE_DIR", "/home/raspberry01/homee")
+JOURNAL_DIR = os.path.join(HOMEE_DIR, "journal")
+PRESENCE_FILE = os.path.join(HOMEE_DIR, "presence.bin")  # IN/OUT snapshot
+CARDS_FILE = os.path.join(HOMEE_DIR, "cards.csv")        # allowlist (uid,name); absent = any card
+journal = Journal(JOURNAL_DIR)
+presence = Presence(PRESENCE_FILE, CARDS_FILE if os.path.exists(CARDS_FILE) else None)
+runtime = None  # set by start_runtime()
+
+def start_runtime(hw=None) -> Runtime:
+    """Run the sensors on their own event loop thread, logging to the journal."""
+    global runtime
+    if hw is None:
+        from homee_hw import get_backend
+        hw = get_backend()
+    runtime = Runtime(hw, log_event=journal.append, presence=presence.start())
+    threading.Thread(target=asyncio.run, args=(runtime.run(),), name="homee-runtime",
+                     daemon=True).start()
+    return runtime
+
+def _float_arg(name: str):
+    v = request.args.get(name)
+    return float(v) if v not in (None, "") else None
+
+@app.route("/")
+def index():
+    return Response(INDEX_HTML, mimetype="text/html")
+
+@app.route("/api/status")
+def status():
+    if runtime is None:
+        return jsonify({"running": False})
+    return jsonify(runtime.status())
+
+@app.route("/api/toggle_light", methods=["POST"])
+def toggle_light():
+    if runtime is None:
+        return jsonify({"error": "sensors not running"}), 503
+    try:
+        return jsonify({"light_enabled": runtime.toggle_light()})
+    except Exception as e:  # loop stopped, or busy for over a second
+        return jsonify({"error": str(e) or type(e).__name__}), 503
+
+@app.route("/api/presence")
+def who_is_in():
+    cards = presence.inside()
+    return jsonify({"count": len(cards), "inside": cards})
+
+@app.route("/api/motion_log")
+def motion_log():
+    try:
+        cursor = request.args.get("cursor")
+        cursor = int(cursor) if cursor else None
+        limit = min(int(request.args.get("limit", PAGE_LIMIT)), MAX_PAGE)
+        since, until = _float_arg("since"), _float_arg("until")
+    except ValueError:
+        return jsonify({"error": "cursor, limit, since and until must be numbers"}), 400
+    types = [t for t in request.args.get("type", "").split(",") if t]
+    events, nxt = journal.query(cursor, limit, types or None, since, until)
+    return jsonify({"events": events, "next": nxt})
+
+@app.route("/api/clear_log", methods=["POST"])
+def clear_log():
+    return jsonify({"success": True, "cleared": journal.clear()})
+
+@app.route("/api/export_log")
+def export_log():
+    try:
+        since, until = _float_arg("since"), _float_arg("until")
+    except ValueError:
+        return jsonify({"error": "since and until must be numbers"}), 400
+    types = [t for t in request.args.get("type", "").split(",") if t]
+    name = time.strftime("homee_events_%Y%m%d_%H%M%S.csv")
+    return Response(journal.export_csv(types or None, since, until), mimetype="text/csv",
+                    headers={"Content-Disposition": f"attachment; filename={name}"})
+
+INDEX_HTML = """<!doctype html><html lang="en"><head>
+<meta charset="utf-8"><meta name="viewport" content="width=device-width,initial-scale=1">
+<title>HOMEe Motion</title>
+<style>
+  body{font-family:system-ui,sans-serif;background:#0f172a;color:#e5e7eb;margin:0;padding:20px}
+  .card{background:#0b1022;border-radius:14px;padding:16px;margin-bottom:16px}
+  button,a.btn{background:#1e293b;color:#e5e7eb;border:0;border-radius:8px;padding:8px 12px;
+    cursor:pointer;text-decoration:none;margin-right:6px}
+  table{width:100%;border-collapse:collapse}td,th{padding:6px;border-bottom:1px solid #1e293b;text-align:left}
+  .on{color:#f87171}.off{color:#4ade80}
+</style></head><body>
+<div class="card"><h2>Status</h2><div id="status">…</div>
+  <p><button onclick="toggle()">Toggle light system</button></p></div>
+<div class="card"><h2>Event log</h2>
+  <p><button onclick="clearLog()">Clear</button><a class="btn" href="/api/export_log">Export CSV</a></p>
+  <table><thead><tr><th>Time</th><th>Event</th><th>Source</th><th>Detail</th></tr></thead>
+  <tbody id="log"></tbody></table>
+  <p><button id="more" onclick="more()" hidden>Older…</button></p></div>
+<script>
+let next = null, paged = false;  // don't refresh away older pages
+function cell(tr, text){ const td = document.createElement('td'); td.textContent = text; tr.appendChild(td); }
+function rows(events){
+  const frag = document.createDocumentFragment();
+  for (const e of events){
+    const tr = document.createElement('tr');
+    cell(tr, new Date(e.ts * 1000).toLocaleString()); cell(tr, e.type); cell(tr, e.source); cell(tr, e.detail);
+    frag.appendChild(tr);
+  }
+  return frag;
+}
+async function page(cursor){
+  const r = await fetch('/api/motion_log' + (cursor ? '?cursor=' + cursor : ''));
+  const j = await r.json();
+  next = j.next; document.getElementById('more').hidden = next === null;
+  return j.events;
+}
+async function reload(){ paged = false; const body = document.getElementById('log'); body.replaceChildren(rows(await page(null))); }
+async function more(){ if (next === null) return; paged = true; document.getElementById('log').appendChild(rows(await page(next))); }
+async function status(){
+  const s = await (await fetch('/api/status')).json();
+  const d = s.distance_cm == null ? '–' : s.distance_cm.toFixed(1) + ' cm';
+  document.getElementById('status').innerHTML =
+    `Motion: <b class="${s.motion ? 'on' : 'off'}">${s.motion ? 'YES' : 'no'}</b> · Distance: ${d} · ` +
+    `Light system: ${s.light_enabled ? 'ON' : 'OFF'} · Light: ${s.light_on ? 'on' : 'off'} · ` +
+    `Inside: ${s.inside ?? 0}`;
+}
+async function toggle(){ await fetch('/api/toggle_light', {method: 'POST'}); status(); reload(); }
+async function clearLog(){ await fetch('/api/clear_log', {method: 'POST'}); reload(); }
+status(); reload(); setInterval(status, 1000); setInterval(() => paged || reload(), 5000);
+</script></body></html>"""
+
+if __name__ == "__main__":
+    start_runtime()
+    try:
+        app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
+    finally:
+        if runtime is not None:
+            runtime.stop()
+        journal.close()
+        presence.close()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# HOMEe: streaming distance filter for the motion detector (see pseudo_detection.py)
+#   RollingMedian  – median of the last N samples in O(log N) per sample
+#                    (two heaps with lazy deletion)
+#   Baseline       – calibrates from the first samples ("no one in front"), then
+#                    follows slow drift (temperature, sensor ageing) while idle
+#   MotionDetector – filter + baseline + threshold → motion on/off
+#   replay()       – the same pipeline over a recorded trace, with the median
+#                    done in NumPy when it is installed
+# NaN samples (echo timeouts) are skipped by both the streaming and batch paths.
+
+import heapq, math
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # optional: only speeds up replay()
+    np = None
+
+WINDOW = 5             # samples in the moving median
+BASELINE_SAMPLES = 50  # calibration samples
+THRESHOLD_CM = 15.0    # |filtered - baseline| above this is motion
+DRIFT_ALPHA = 0.01     # baseline EWMA weight per idle sample (0 = frozen)
+MAX_DRIFT_CM = 10.0    # drift beyond this from calibration → recalibrate
+
+# ── Rolling median ─────────────────────────────────────────────────────
+class RollingMedian:
+    """Median of the last `window` values. The lower half lives in a max-heap
+    (negated), the upper half in a min-heap; values leaving the window are only
+    marked and dropped when they reach a heap top. Dead values far from the
+    median never get there, so the heaps are rebuilt from the window once they
+    hold twice as many entries as it does (amortized O(1) per sample)."""
+
+    def __init__(self, window: int = WINDOW):
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        self.window = window
+        self._win = deque()
+        self._lo: List[float] = []   # max-heap of the smaller half (stored negated)
+        self._hi: List[float] = []   # min-heap of the larger half
+        self._nlo = self._nhi = 0    # live sizes (heaps may hold dead entries)
+        self._dead: Dict[float, int] = {}
+
+    def __len__(self):
+        return len(self._win)
+
+    def push(self, x: float) -> float:
+        """Add a sample; returns the median of the current window."""
+        if self._lo and x <= -self._lo[0]:
+            heapq.heappush(self._lo, -x)
+            self._nlo += 1
+        else:
+            heapq.heappush(self._hi, x)
+            self._nhi += 1
+        self._win.append(x)
+        if len(self._win) > self.window:
+            self._remove(self._win.popleft())
+        self._balance()
+        if len(self._lo) + len(self._hi) > 2 * self.window + 16:
+            self._rebuild()
+        return self.median()
+
+    def median(self) -> float:
+        if not self._win:
+            return math.nan
+        if self._nlo > self._nhi:
+            return -self._lo[0]
+        return (-self._lo[0] + self._hi[0]) / 2
+
+    def _remove(self, x: float):
+        self._dead[x] = self._dead.get(x, 0) + 1
+        if self._lo and x <= -self._lo[0]:
+            self._nlo -= 1
+            if x == -self._lo[0]:
+                self._prune(self._lo, -1)
+        else:
+            self._nhi -= 1
+            if self._hi and x == self._hi[0]:
+                self._prune(self._hi, 1)
+
+    def _rebuild(self):
+        s = sorted(self._win)
+        k = (len(s) + 1) // 2
+        self._lo = [-v for v in s[k - 1::-1]]  # descending negated == ascending: a valid heap
+        self._hi = s[k:]                       # sorted: already a heap
+        self._nlo, self._nhi = k, len(s) - k
+        self._dead.clear()
+
+    def _prune(self, heap: List[float], sign: int):
+        while heap:
+            x = sign * heap[0]
+            n = self._dead.get(x)
+            if not n:
+                return
+            if n == 1:
+                del self._dead[x]
+            else:
+                self._dead[x] = n - 1
+            heapq.heappop(heap)
+
+    def _balance(self):
+        # keep nlo == nhi or nlo == nhi + 1
+        if self._nlo > self._nhi + 1:
+            heapq.heappush(self._hi, -heapq.heappop(self._lo))
+            self._nlo -= 1
+            self._nhi += 1
+            self._prune(self._lo, -1)
+        elif self._nlo < self._nhi:
+            heapq.heappush(self._lo, -heapq.heappop(self._hi))
+            self._nhi -= 1
+            self._nlo += 1
+            self._prune(self._hi, 1)
+
+# ── Baseline ───────────────────────────────────────────────────────────
+class Baseline:
+    """Calibrated from the median of the first `samples` values, then tracked
+    with an EWMA over idle (no-motion) values."""
+
+    def __init__(self, samples: int = BASELINE_SAMPLES, alpha: float = DRIFT_ALPHA,
+                 max_drift: float = MAX_DRIFT_CM):
+        self.samples = samples
+        self.alpha = alpha
+        self.max_drift = max_drift
+        self.value: Optional[float] = None
+        self.calibrated_at: Optional[float] = None  # value right after calibration
+        self._cal = RollingMedian(samples)
+        self._seen = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.value is not None
+
+    @property
+    def drift(self) -> float:
+        return 0.0 if self.value is None else self.value - self.calibrated_at
+
+    def calibrate(self, x: float) -> bool:
+        """Feed a calibration sample; True once the baseline is set."""
+        self._seen += 1
+        m = self._cal.push(x)
+        if self._seen >= self.samples:
+            self.value = self.calibrated_at = m
+        return self.ready
+
+    def track(self, x: float):
+        """Follow slow drift with an idle sample."""
+        self.value += self.alpha * (x - self.value)
+        if abs(self.drift) > self.max_drift:
+            self.recalibrate()
+
+    def recalibrate(self):
+        self.value = self.calibrated_at = None
+        self._cal = RollingMedian(self.samples)
+        self._seen = 0
+
+# ── Detector ───────────────────────────────────────────────────────────
+class Reading(NamedTuple):
+    raw: float
+    filtered: float
+    baseline: float   # NaN while calibrating
+    change: float     # |filtered - baseline|
+    motion: bool
+
+class MotionDetector:
+    def __init__(self, window: int = WINDOW, baseline_samples: int = BASELINE_SAMPLES,
+                 threshold: float = THRESHOLD_CM, alpha: float = DRIFT_ALPHA,
+                 max_drift: float = MAX_DRIFT_CM):
+        self.threshold = threshold
+        self.filter = RollingMedian(window)
+        self.baseline = Baseline(baseline_samples, alpha, max_drift)
+        self.motion = False
+
+    def update(self, cm: float) -> Optional[Reading]:
+        """Process one distance sample; None for NaN (echo timeout)."""
+        if cm != cm:
+            return None
+        f = self.filter.push(cm)
+        b = self.baseline
+        if not b.ready:
+            b.calibrate(f)
+            return Reading(cm, f, math.nan, 0.0, False)
+        change = abs(f - b.value)
+        self.motion = change > self.threshold
+        if not self.motion:
+            b.track(f)
+        return Reading(cm, f, b.value if b.ready else math.nan, change, self.motion)
+
+# ── Batch replay ───────────────────────────────────────────────────────
+def rolling_median(x: Sequence[float], window: int = WINDOW):
+    """Moving median of every sample (the first window-1 use the samples so far),
+    identical to feeding RollingMedian one value at a time."""
+    if np is None:
+        rm = RollingMedian(window)
+        return [rm.push(v) for v in x]
+    a = np.asarray(x, dtype=float)
+    out = np.empty(len(a))
+    head = min(window - 1, len(a))
+    rm = RollingMedian(window)
+    for i in range(head):
+        out[i] = rm.push(a[i])
+    if len(a) >= window:
+        view = np.lib.stride_tricks.sliding_window_view(a, window)
+        out[window - 1:] = np.median(view, axis=1)
+    return out
+
+def replay(distances: Sequence[float], window: int = WINDOW,
+           baseline_samples: int = BASELINE_SAMPLES, threshold: float = THRESHOLD_CM,
+           alpha: float = DRIFT_ALPHA, max_drift: float = MAX_DRIFT_CM) -> Dict[str, list]:
+    """Run a recorded trace through the detector. Returns per-valid-sample lists
+    (index, filtered, baseline, change, motion) plus motion events as
+    (start index, end index) pairs; NaN samples are skipped."""
+    if np is not None:
+        a = np.asarray(distances, dtype=float)
+        index = np.flatnonzero(~np.isnan(a))
+        filtered = rolling_median(a[index], window).tolist()
+        index = index.tolist()
+    else:
+        index = [i for i, v in enumerate(distances) if v == v]
+        filtered = rolling_median([distances[i] for i in index], window)
+    # The baseline is recursive (it only moves while idle), so this part stays a loop.
+    b = Baseline(baseline_samples, alpha, max_drift)
+    base, change, motion, events = [], [], [], []
+    start = None
+    for i, f in zip(index, filtered):
+        if not b.ready:
+            b.calibrate(f)
+            base.append(math.nan); change.append(0.0); motion.append(False)
+            continue
+        c = abs(f - b.value)
+        m = c > threshold
+        base.append(b.value); change.append(c); motion.append(m)
+        if not m:
+            b.track(f)
+        if m and start is None:
+            start = i
+        elif not m and start is not None:
+            events.append((start, i))
+            start = None
+    if start is not None:
+        events.append((start, index[-1]))
+    return {"index": index, "filtered": filtered, "baseline": base,
+            "change": change, "motion": motion, "events": events}
+
+def load_trace(path: str) -> List[float]:
+    """Distances from a CSV with a distance_cm column, or one number per line."""
+    import csv
+    with open(path, newline="") as f:
+        first = f.readline()
+        f.seek(0)
+        if "distance_cm" in first:
+            return [float(r["distance_cm"] or "nan") for r in csv.DictReader(f)]
+        return [float(line) for line in f if line.strip()]
+
+if __name__ == "__main__":
+    # Tune offline: python3 homee_filter.py trace.csv [--window 5] [--threshold 15] ...
+    import argparse, time
+    ap = argparse.ArgumentParser(description="Replay a distance trace through the motion filter")
+    ap.add_argument("trace")
+    ap.add_argument("--window", type=int, default=WINDOW)
+    ap.add_argument("--baseline", type=int, default=BASELINE_SAMPLES)
+    ap.add_argument("--threshold", type=float, default=THRESHOLD_CM)
+    ap.add_argument("--alpha", type=float, default=DRIFT_ALPHA)
+    ap.add_argument("--max-drift", type=float, default=MAX_DRIFT_CM)
+    args = ap.parse_args()
+    trace = load_trace(args.trace)
+    t0 = time.perf_counter()
+    out = replay(trace, args.window, args.baseline, args.threshold, args.alpha, args.max_drift)
+    dt = time.perf_counter() - t0
+    print(f"{len(trace)} samples ({len(out['index'])} valid) in {dt:.3f}s, "
+          f"{len(out['events'])} motion events")
+    for s, e in out["events"][:20]:
+        print(f"  samples {s}–{e}")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# HOMEe: response helpers for the web app (fast JSON, compression, conditional GET)
+# Payloads are encoded once per data version and kept per (key, encoding), so a
+# dashboard poll on an unchanged log costs a dict lookup and usually a 304.
+#   JSON:        orjson when installed, else compact json.dumps
+#   Compression: br (if the brotli module is installed) or gzip, by Accept-Encoding
+
+import gzip, hashlib, json, math, threading, time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional: ~5-10x faster than json for /data rows
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: smaller than gzip for text
+    brotli = None
+
+MIN_COMPRESS = 512   # bytes; smaller bodies aren't worth the CPU or headers
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5   # good ratio at gzip-like speed on a Pi
+ENCODINGS = (("br",) if brotli is not None else ()) + ("gzip",)  # preferred first
+
+def _finite(obj: Any) -> Any:
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    return obj
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON; NaN and infinities become null (JSON.parse rejects NaN)."""
+    if orjson is not None:
+        return orjson.dumps(obj)  # NaN → null
+    try:
+        return json.dumps(obj, separators=(",", ":"), allow_nan=False).encode()
+    except ValueError:  # a blank CSV cell or NULL DB value: only then walk the object
+        return json.dumps(_finite(obj), separators=(",", ":")).encode()
+
+def negotiate(accept_encoding: str) -> str:
+    """Best encoding we can produce for an Accept-Encoding header ("" = identity)."""
+    offered = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            offered[name] = q
+    for enc in ENCODINGS:
+        if offered.get(enc, offered.get("*", 0)) > 0:
+            return enc
+    return ""
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    return data
+
+def etag_for(*parts, encoding: str = "") -> str:
+    """Strong validator; each content-encoding of the same data gets its own tag."""
+    tag = hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+    return f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+
+def http_date(ts: float) -> str:
+    return formatdate(ts, usegmt=True)
+
+def not_modified(headers, etag: str, last_modified: Optional[float]) -> bool:
+    """True if the request's validators match (If-None-Match wins over If-Modified-Since)."""
+    inm = headers.get("If-None-Match")
+    if inm is not None:
+        tags = [t.strip() for t in inm.split(",")]
+        return "*" in tags or etag in tags or ("W/" + etag) in tags
+    ims = headers.get("If-Modified-Since")
+    if ims and last_modified is not None:
+        # Last-Modified is sent in whole seconds, but a change later in that same
+        # second is still a change: compare the exact time, never its rounding.
+        try:
+            return last_modified <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+class Encoded:
+    """One representation: body bytes plus the headers that go with them."""
+    __slots__ = ("body", "encoding", "etag", "last_modified")
+
+    def __init__(self, body: bytes, encoding: str, etag: str, last_modified: Optional[float]):
+        self.body = body
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def headers(self, cache_control: str) -> Dict[str, str]:
+        h = {"ETag": self.etag, "Vary": "Accept-Encoding", "Cache-Control": cache_control}
+        if self.encoding:
+            h["Content-Encoding"] = self.encoding
+        if self.last_modified is not None:
+            h["Last-Modified"] = http_date(self.last_modified)
+        return h
+
+class PayloadCache:
+    """Encoded bodies keyed by (key, encoding), all dropped when the version changes.
+
+    The version is also the ETag, so it must not repeat across restarts: a
+    per-process counter alone would hand a browser that kept an old tag a 304
+    for different data (see homee_app's versions, which carry a boot nonce).
+
+    `build(key)` returns the object to serialize (or its JSON bytes); it only
+    runs on a miss.
+    get() returns (Encoded, hit).
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries  # cursor queries add keys; keep it bounded
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries: Dict[Tuple[Any, str], Encoded] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, key, encoding: str, build,
+            last_modified: Optional[float] = None) -> Tuple[Encoded, bool]:
+        with self._lock:
+            if version != self._version:
+                self._version, self._entries = version, {}
+            hit = self._entries.get((key, encoding))
+        if hit is not None:
+            self.hits += 1
+            return hit, True
+        self.misses += 1
+        obj = build(key)
+        raw = obj if isinstance(obj, bytes) else dumps(obj)
+        enc = encoding if len(raw) >= MIN_COMPRESS else ""
+        out = Encoded(compress(raw, enc), enc, etag_for(version, key, encoding=enc), last_modified)
+        with self._lock:
+            if version == self._version:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+                self._entries[(key, encoding)] = out
+        return out, False
+
+def static_payload(body: bytes, encoding: str, cache: Dict[str, Encoded],
+                   last_modified: Optional[float] = None) -> Encoded:
+    """Encoded form of a never-changing body (e.g. the dashboard HTML), built once."""
+    hit = cache.get(encoding)
+    if hit is None:
+        enc = encoding if len(body) >= MIN_COMPRESS else ""
+        hit = cache[encoding] = Encoded(compress(body, enc), enc, etag_for(body, encoding=enc),
+                                        last_modified or time.time())
+    return hit
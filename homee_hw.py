@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# HOMEe: pluggable hardware layer
+# homee_reader/homee_bands ask a backend for LEDs, the button and the DHT11
+# instead of importing gpiozero/pigpio directly, so the same code runs on a Pi
+# ("pi") or anywhere with simulated parts ("sim"). Pick one with HOMEE_HW=pi|sim.
+#
+#   hw = get_backend()
+#   led = hw.led(5); btn = hw.button(18, pull_up=True, bounce_time=0.15)
+#   dht = hw.dht11(24); dht.read() → {"temp_c":…, "humidity":…, "valid":…}
+#   pi = hw.gpio()      # pigpio-style handle: edge callbacks with µs ticks
+#   rfid = hw.rfid(); rfid.read_uid() → "A1B2C3D4" or None (non-blocking poll)
+#   lcd = hw.lcd(); lcd.clear(); lcd.write_string("Welcome")
+#   hw.close()
+
+import heapq, itertools, os, random, threading, time
+from typing import Callable, List, Optional, Tuple
+
+# ── Raspberry Pi (gpiozero + pigpio) ───────────────────────────────────
+class PiBackend:
+    name = "pi"
+
+    def __init__(self):
+        self._pi = None
+
+    def led(self, pin: int):
+        from gpiozero import LED
+        return LED(pin)
+
+    def button(self, pin: int, **kw):
+        from gpiozero import Button
+        return Button(pin, **kw)
+
+    def gpio(self):
+        """The process-wide pigpio handle."""
+        import pigpio
+        if self._pi is None:
+            self._pi = pigpio.pi()
+            if not self._pi.connected:
+                raise RuntimeError("pigpio daemon not running. Start with: sudo pigpiod")
+        return self._pi
+
+    def dht11(self, pin: int):
+        # signature: DHT11(gpio, pi=pi); one pigpio handle per process
+        import pigpio_dht
+        return pigpio_dht.DHT11(pin, pi=self.gpio())
+
+    def rfid(self):
+        return _MFRC522Reader()
+
+    def lcd(self, address: int = 0x27):
+        from RPLCD.i2c import CharLCD
+        return CharLCD("PCF8574", address, cols=16, rows=2)
+
+    def close(self):
+        if self._pi is not None:
+            self._pi.stop()
+            self._pi = None
+
+class _MFRC522Reader:
+    """MFRC522 (SPI) card poll: one request + anticollision, no waiting for a card."""
+
+    def __init__(self):
+        import MFRC522
+        self._m = MFRC522.MFRC522()
+        self._ok = self._m.MI_OK
+
+    def read_uid(self) -> Optional[str]:
+        status, _ = self._m.MFRC522_Request(self._m.PICC_REQIDL)
+        if status != self._ok:
+            return None
+        status, uid = self._m.MFRC522_Anticoll()
+        if status != self._ok:
+            return None
+        return "".join(f"{b:02X}" for b in uid[:4])
+
+# ── Simulation ─────────────────────────────────────────────────────────
+class SimDHT11:
+    """DHT11 stand-in with configurable read latency and failure rate.
+
+    `values(n)` gives (temp_c, humidity) for the n-th read; the default walks
+    through distinct values so every reading can be told apart in benchmarks.
+    """
+
+    def __init__(self, pin: int, latency: float = 0.0, failure_rate: float = 0.0,
+                 values: Optional[Callable[[int], Tuple[float, float]]] = None, seed=None):
+        self.pin = pin
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.values = values or (lambda n: (15 + (n % 200) / 10, 20 + (n // 200 % 600) / 10))
+        self.reads = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def read(self):
+        with self._lock:  # one read at a time, like the real bus
+            if self.latency:
+                time.sleep(self.latency)
+            n = self.reads
+            self.reads += 1
+            if self._rng.random() < self.failure_rate:
+                return {"valid": False, "temp_c": 0, "humidity": 0}
+            t, h = self.values(n)
+            return {"valid": True, "temp_c": t, "humidity": h}
+
+class MockLED:
+    """Records every state change as (monotonic time, state); blink is just a state."""
+
+    def __init__(self, pin: int):
+        self.pin = pin
+        self.state = "off"
+        self.history: List[Tuple[float, str]] = []
+
+    def _set(self, state: str):
+        self.state = state
+        self.history.append((time.monotonic(), state))
+
+    def on(self):
+        self._set("on")
+
+    def off(self):
+        self._set("off")
+
+    def blink(self, on_time=1.0, off_time=1.0, n=None, background=True):
+        self._set(f"blink({on_time},{off_time})")
+
+    @property
+    def is_lit(self) -> bool:
+        return self.state != "off"
+
+    def close(self):
+        pass
+
+class ScriptedButton:
+    """Button whose presses come from code: press() now, or play() a schedule."""
+
+    def __init__(self, pin: int, **kw):
+        self.pin = pin
+        self.when_pressed = None
+        self.presses: List[float] = []
+
+    def press(self):
+        self.presses.append(time.monotonic())
+        cb = self.when_pressed
+        if cb is not None:
+            cb()
+
+    def play(self, offsets: List[float]):
+        """Press at each offset (seconds from now); blocks until the last one."""
+        t0 = time.monotonic()
+        for off in offsets:
+            delay = t0 + off - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.press()
+
+    def close(self):
+        pass
+
+class SimRFID:
+    """Cards are presented with present(uid); each one is read once."""
+
+    def __init__(self):
+        self._cards: List[str] = []
+        self._lock = threading.Lock()
+        self.polls = 0
+
+    def present(self, uid: str):
+        with self._lock:
+            self._cards.append(uid.upper())
+
+    def read_uid(self) -> Optional[str]:
+        with self._lock:
+            self.polls += 1
+            return self._cards.pop(0) if self._cards else None
+
+class MockLCD:
+    """Records what a 16x2 character LCD would show: .text and (time, text) .history."""
+
+    def __init__(self):
+        self.text = ""
+        self.history: List[Tuple[float, str]] = []
+
+    def clear(self):
+        self.text = ""
+        self.history.append((time.monotonic(), ""))
+
+    def write_string(self, s: str):
+        self.text += s
+        self.history.append((time.monotonic(), self.text))
+
+    def close(self, clear: bool = False):
+        if clear:
+            self.clear()
+
+SPEED_OF_SOUND = 34300.0  # cm/s at ~20 °C
+
+class _SimCallback:
+    def __init__(self, owner, gpio, edge, func):
+        self.owner, self.gpio, self.edge, self.func = owner, gpio, edge, func
+
+    def cancel(self):
+        self.owner._cancel(self)
+
+class SimPigpio:
+    """The subset of pigpio.pi used for ultrasonic ranging, with a simulated echo.
+
+    gpio_trigger() on the trigger pin makes the echo pin go high after
+    `echo_delay` and low again after the round trip for `distance()` cm (plus
+    Gaussian `noise`); with probability `dropout` no echo comes back. Edge
+    callbacks get (gpio, level, tick) with tick in µs, wrapping at 2**32 like
+    the real thing. Events are delivered from one thread, in time order.
+    """
+    EITHER_EDGE, RISING_EDGE, FALLING_EDGE = 2, 0, 1
+    INPUT, OUTPUT = 0, 1
+
+    def __init__(self, distance: Callable[[], float] = lambda: 100.0, noise: float = 0.0,
+                 dropout: float = 0.0, echo_delay: float = 0.0005, seed=None):
+        self.distance = distance
+        self.noise = noise
+        self.dropout = dropout
+        self.echo_delay = echo_delay
+        self.connected = True
+        self.echo_pins = set()  # pins that answer a trigger (set by set_mode INPUT)
+        self.triggers = 0
+        self._rng = random.Random(seed)
+        self._cbs: List[_SimCallback] = []
+        self._events = []  # heap of (due monotonic, seq, gpio, level)
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._stopped = False
+        self._t0 = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="homee-sim-gpio", daemon=True)
+        self._thread.start()
+
+    def get_current_tick(self) -> int:
+        return int((time.monotonic() - self._t0) * 1e6) & 0xFFFFFFFF
+
+    def set_mode(self, gpio: int, mode: int):
+        if mode == self.INPUT:
+            self.echo_pins.add(gpio)
+        else:
+            self.echo_pins.discard(gpio)
+
+    def write(self, gpio: int, level: int):
+        pass
+
+    def callback(self, gpio: int, edge: int = EITHER_EDGE, func=None):
+        cb = _SimCallback(self, gpio, edge, func)
+        with self._cv:
+            self._cbs.append(cb)
+        return cb
+
+    def _cancel(self, cb):
+        with self._cv:
+            if cb in self._cbs:
+                self._cbs.remove(cb)
+
+    def gpio_trigger(self, gpio: int, pulse_len: int = 10, level: int = 1):
+        self.triggers += 1
+        if self._rng.random() < self.dropout:
+            return
+        cm = self.distance()
+        if self.noise:
+            cm = max(0.0, cm + self._rng.gauss(0, self.noise))
+        now = time.monotonic() + pulse_len / 1e6
+        rise = now + self.echo_delay
+        fall = rise + 2 * cm / SPEED_OF_SOUND
+        with self._cv:
+            for pin in self.echo_pins:
+                heapq.heappush(self._events, (rise, next(self._seq), pin, 1))
+                heapq.heappush(self._events, (fall, next(self._seq), pin, 0))
+            self._cv.notify()
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while not self._stopped and (not self._events or
+                                             self._events[0][0] > time.monotonic()):
+                    self._cv.wait(self._events[0][0] - time.monotonic() if self._events else None)
+                if self._stopped:
+                    return
+                due, _, gpio, level = heapq.heappop(self._events)
+                cbs = [cb for cb in self._cbs if cb.gpio == gpio and
+                       (cb.edge == self.EITHER_EDGE or cb.edge == (0 if level else 1))]
+            tick = int((due - self._t0) * 1e6) & 0xFFFFFFFF  # time of the edge, not of delivery
+            for cb in cbs:
+                cb.func(gpio, level, tick)
+
+    def stop(self):
+        with self._cv:
+            self._stopped = True
+            self._cv.notify()
+
+class SimBackend:
+    name = "sim"
+
+    def __init__(self, dht_latency: float = 0.0, dht_failure_rate: float = 0.0, seed=None):
+        self.dht_latency = dht_latency
+        self.dht_failure_rate = dht_failure_rate
+        self.seed = seed
+        self.leds = {}
+        self.buttons = {}
+        self.sensors = {}
+        self.pi = None
+        self.rfid_reader = SimRFID()
+        self.lcd_screen = MockLCD()
+
+    def led(self, pin: int):
+        return self.leds.setdefault(pin, MockLED(pin))
+
+    def button(self, pin: int, **kw):
+        return self.buttons.setdefault(pin, ScriptedButton(pin, **kw))
+
+    def dht11(self, pin: int):
+        return self.sensors.setdefault(
+            pin, SimDHT11(pin, self.dht_latency, self.dht_failure_rate, seed=self.seed))
+
+    def rfid(self):
+        return self.rfid_reader
+
+    def lcd(self, address: int = 0x27):
+        return self.lcd_screen
+
+    def gpio(self):
+        if self.pi is None:
+            self.pi = SimPigpio(seed=self.seed)
+        return self.pi
+
+    def close(self):
+        if self.pi is not None:
+            self.pi.stop()
+
+BACKENDS = {"pi": PiBackend, "sim": SimBackend}
+
+def get_backend(name: Optional[str] = None):
+    name = name or os.environ.get("HOMEE_HW", "pi")
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"unknown hardware backend: {name} (expected one of {sorted(BACKENDS)})")
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# HOMEe: append-only event journal (RFID scans, intruders, motion, light switches)
+# Events are JSON lines in numbered segment files (events-<first seq>.jsonl)
+# under `root`; every event gets a sequence number that is never reused, even
+# across clear(). For each segment the journal keeps three compact arrays in
+# memory – timestamp, byte offset and type code per event – so time ranges are a
+# bisect and type filters a scan over small ints; the events themselves are read
+# from disk only for the page being returned.
+#   query()      – newest first, cursor-paginated (cursor = last seq you got)
+#   export_csv() – generator of CSV chunks, oldest first, constant memory
+# Writers hold the lock only to write one line and extend the index. clear()
+# and segment rotation swap the segment list under the lock and unlink files
+# after releasing it; retention (max_segments) bounds disk and index size.
+
+import bisect, csv, io, json, os, re, threading, time
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import homee_metrics as metrics
+
+SEGMENT_EVENTS = 10000   # events per segment file
+MAX_SEGMENTS = 20        # oldest segments beyond this are deleted (~200k events)
+PAGE_LIMIT = 100         # default and …
+MAX_PAGE = 1000          # … maximum events per query()
+EXPORT_CHUNK = 64 * 1024 # bytes of CSV per yielded chunk
+CSV_HEADER = ["seq", "timestamp", "datetime_utc", "type", "source", "detail"]
+
+_NAME = re.compile(r"^events-(\d+)\.jsonl$")
+
+EVENTS = metrics.counter("homee_journal_events_total", "Events appended to the journal", ["type"])
+
+def _utc(ts: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+class _Segment:
+    __slots__ = ("path", "first", "ts", "off", "kind", "counts")
+
+    def __init__(self, path: str, first: int):
+        self.path = path
+        self.first = first         # seq of the segment's first event
+        self.ts = array("d")
+        self.off = array("Q")
+        self.kind = array("H")
+        self.counts: Dict[int, int] = {}  # type code → events (skip segments without the type)
+
+    def __len__(self):
+        return len(self.ts)
+
+    def add(self, ts: float, off: int, code: int):
+        self.ts.append(ts)
+        self.off.append(off)
+        self.kind.append(code)
+        self.counts[code] = self.counts.get(code, 0) + 1
+
+class Journal:
+    def __init__(self, root: str, segment_events: int = SEGMENT_EVENTS,
+                 max_segments: int = MAX_SEGMENTS):
+        self.root = root
+        self.segment_events = segment_events
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._types: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._segs: List[_Segment] = []
+        self._f = None             # open tail segment (binary append)
+        self._next = 1
+        self._last_ts = 0.0
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _code(self, kind: str) -> int:
+        code = self._codes.get(kind)
+        if code is None:
+            code = self._codes[kind] = len(self._types)
+            self._types.append(kind)
+        return code
+
+    def _load(self):
+        names = sorted((int(m.group(1)), n) for n in os.listdir(self.root)
+                       if (m := _NAME.match(n)))
+        for first, name in names:
+            seg = _Segment(os.path.join(self.root, name), first)
+            good = 0
+            with open(seg.path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn write from a crash
+                    try:
+                        e = json.loads(line)
+                        seg.add(e["ts"], good, self._code(e["type"]))
+                    except (ValueError, KeyError, TypeError):
+                        break  # corrupt: seq = first + index, so nothing after it can be trusted
+                    good += len(line)
+            size = os.path.getsize(seg.path)
+            if good < size:
+                print(f"[journal] {name}: truncated at byte {good} ({size - good} bytes "
+                      "torn or corrupt)")
+                os.truncate(seg.path, good)
+            self._segs.append(seg)
+            self._next = max(self._next, first + len(seg))
+            if len(seg):
+                self._last_ts = max(self._last_ts, seg.ts[-1])
+
+    # ── Writing ────────────────────────────────────────────────────────
+    def append(self, kind: str, source: str = "", detail: str = "",
+               ts: Optional[float] = None) -> int:
+        """Record one event; returns its sequence number."""
+        ts = time.time() if ts is None else ts
+        drop = []
+        with self._lock:
+            ts = max(ts, self._last_ts)  # keep the time index sorted if the clock steps back
+            seq = self._next
+            line = json.dumps({"seq": seq, "ts": ts, "type": kind, "source": source,
+                               "detail": detail}, separators=(",", ":")).encode() + b"\n"
+            if self._f is None or len(self._segs[-1]) >= self.segment_events:
+                drop = self._rotate(seq)
+            seg = self._segs[-1]
+            off = self._f.tell()
+            self._f.write(line)
+            self._f.flush()
+            seg.add(ts, off, self._code(kind))
+            self._next = seq + 1
+            self._last_ts = ts
+        EVENTS.labels(kind).inc()
+        self._unlink(drop)
+        return seq
+
+    def _rotate(self, first: int) -> List[_Segment]:
+        if self._f is not None:
+            self._f.close()
+        tail = self._segs[-1] if self._segs else None
+        if tail is not None and len(tail) < self.segment_events:
+            self._f = open(tail.path, "ab")  # resume the segment left by a restart
+            return []
+        seg = _Segment(os.path.join(self.root, f"events-{first:012d}.jsonl"), first)
+        self._f = open(seg.path, "ab")
+        self._segs.append(seg)
+        drop, self._segs = self._segs[:-self.max_segments], self._segs[-self.max_segments:]
+        return drop
+
+    def clear(self) -> int:
+        """Forget every event (sequence numbers keep counting); returns how many."""
+        with self._lock:
+            drop, self._segs = self._segs, []
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+        self._unlink(drop)
+        return sum(len(s) for s in drop)
+
+    def _unlink(self, segs: Iterable[_Segment]):
+        for seg in segs:
+            try:
+                os.remove(seg.path)  # readers that already opened it keep their handle
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+    # ── Reading ────────────────────────────────────────────────────────
+    def _snapshot(self) -> List[Tuple[_Segment, int]]:
+        with self._lock:
+            return [(s, len(s)) for s in self._segs]
+
+    def _type_codes(self, types: Optional[Iterable[str]]):
+        """None = all types; an empty set = nothing can match."""
+        if not types:
+            return None
+        return {self._codes[t] for t in types if t in self._codes}
+
+    def __len__(self):
+        return sum(n for _, n in self._snapshot())
+
+    def types(self) -> List[str]:
+        return list(self._types)
+
+    def query(self, cursor: Optional[int] = None, limit: int = PAGE_LIMIT,
+              types: Optional[Iterable[str]] = None, since: Optional[float] = None,
+              until: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Events newest first with seq < cursor, since <= ts < until, type in
+        `types`. Returns (events, next cursor); the cursor is None at the end."""
+        limit = max(1, min(limit, MAX_PAGE))
+        codes = self._type_codes(types)
+        if codes is not None and not codes:
+            return [], None
+        picked: List[Tuple[_Segment, int]] = []
+        for seg, n in reversed(self._snapshot()):
+            hi = n if cursor is None else min(n, cursor - seg.first)
+            if hi <= 0 or (codes is not None and not codes & seg.counts.keys()):
+                continue
+            if until is not None:
+                hi = bisect.bisect_left(seg.ts, until, 0, hi)
+            lo = bisect.bisect_left(seg.ts, since, 0, hi) if since is not None else 0
+            kind = seg.kind
+            for i in range(hi - 1, lo - 1, -1):
+                if codes is None or kind[i] in codes:
+                    picked.append((seg, i))
+                    if len(picked) > limit:
+                        break
+            if len(picked) > limit or lo > 0:
+                break  # page full, or everything earlier is before `since`
+        more = len(picked) > limit
+        picked = picked[:limit]
+        events = self._read(picked)
+        return events, (picked[-1][0].first + picked[-1][1] if more else None)
+
+    def _read(self, picked: List[Tuple[_Segment, int]]) -> List[Dict[str, Any]]:
+        out, f, path = [], None, None
+        try:
+            for seg, i in picked:
+                if seg.path != path:
+                    if f is not None:
+                        f.close()
+                    path = seg.path
+                    try:
+                        f = open(path, "rb")
+                    except FileNotFoundError:
+                        f = None  # cleared or rotated out meanwhile
+                if f is None:
+                    continue
+                f.seek(seg.off[i])
+                out.append(json.loads(f.readline()))
+        finally:
+            if f is not None:
+                f.close()
+        return out
+
+    def export_csv(self, types: Optional[Iterable[str]] = None, since: Optional[float] = None,
+                   until: Optional[float] = None) -> Iterator[str]:
+        """CSV text in chunks of ~EXPORT_CHUNK, oldest first. Covers the events that
+        existed when the export started; memory use doesn't depend on their number."""
+        codes = self._type_codes(types)
+        segs = self._snapshot()
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(CSV_HEADER)
+        if codes is not None and not codes:
+            yield buf.getvalue()
+            return
+        for seg, n in segs:
+            if codes is not None and not codes & seg.counts.keys():
+                continue
+            hi = bisect.bisect_left(seg.ts, until, 0, n) if until is not None else n
+            lo = bisect.bisect_left(seg.ts, since, 0, hi) if since is not None else 0
+            if lo >= hi:
+                continue
+            try:
+                f = open(seg.path, "rb")
+            except FileNotFoundError:
+                continue
+            with f:
+                f.seek(seg.off[lo])
+                for i in range(lo, hi):
+                    line = f.readline()
+                    if codes is not None and seg.kind[i] not in codes:
+                        continue
+                    e = json.loads(line)
+                    w.writerow([e["seq"], f"{e['ts']:.3f}", _utc(e["ts"]), e["type"],
+                                e["source"], e["detail"]])
+                    if buf.tell() >= EXPORT_CHUNK:
+                        yield buf.getvalue()
+                        buf.seek(0)
+                        buf.truncate()
+        yield buf.getvalue()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# HOMEe: one thread for every LED pattern
+# gpiozero's LED.blink(background=True) starts a thread per blinking LED, and
+# homee_reader's error blink started two more (then slept 2 s on the sense
+# thread). The Animator owns all the band LEDs instead and runs their patterns
+# from a single timer wheel: time is cut into TICK-long slots, each pending
+# toggle sits in the slot of its due tick, and a heap of the due ticks tells
+# the loop which slot is next: it sleeps until then (a 3 s blink wakes it
+# twice per period, not every tick), or until show() brings a new request.
+# While nothing blinks it sleeps until the next change.
+#
+#   anim = Animator(leds, {"temp": TEMP_GROUP, "hum": HUM_GROUP}).start()
+#   anim.show("temp", {"RED": "flash1"})   # the group's other LEDs go off
+#   anim.show("hum", {"PURPLE": "error"})  # 2 s of fast blinking, then off
+#
+# show() only records the request; the loop applies a whole group in one pass
+# with the group's patterns starting on the same tick. Asking for what a group
+# already shows is a no-op, so a running blink keeps its phase (patterns with a
+# cycle count, like "error", always restart).
+#
+# One process drives the LEDs: the driver holds claim() on lock_path() for as
+# long as it runs (homee_reader by default; homee_bands when the reader is
+# started with HOMEE_LEDS=0), and the other refuses to start.
+
+import fcntl, heapq, os, threading, time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+TICK = 0.05        # s; pattern steps are rounded to whole ticks
+WHEEL_SLOTS = 256  # 12.8 s per revolution; longer steps wait whole rounds
+
+class Pattern(NamedTuple):
+    steps: Tuple[Tuple[bool, float], ...]  # (lit, seconds); one step = static
+    cycles: int = 0                        # 0 = repeat forever, else then off
+
+def blink(on_time: float, off_time: float, cycles: int = 0) -> Pattern:
+    return Pattern(((True, on_time), (False, off_time)), cycles)
+
+SOLID = Pattern(((True, 0.0),))
+OFF = Pattern(((False, 0.0),))
+PATTERNS = {
+    "solid":  SOLID,
+    "off":    OFF,
+    "flash1": blink(0.5, 0.5),
+    "flash5": blink(2.5, 2.5),
+    "error":  blink(0.2, 0.2, cycles=5),
+}
+
+def lock_path(homee_dir: str) -> str:
+    """The LED lock of the HOMEe using `homee_dir` (next to its sample file)."""
+    from homee_sampler import sample_path
+    return os.path.splitext(sample_path(homee_dir))[0] + ".leds"
+
+def claim(path: str, who: str):
+    """Take the LEDs for this process: an exclusive flock on `path`, held until
+    the returned file is closed (or the process dies). RuntimeError naming the
+    holder if another process has them."""
+    f = open(path, "a+")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.seek(0)
+        holder = f.read().strip() or "another process"
+        f.close()
+        raise RuntimeError(f"the LEDs are driven by {holder}")
+    f.seek(0)
+    f.truncate()
+    f.write(f"{who} (pid {os.getpid()})\n")
+    f.flush()
+    return f
+
+class _Anim:
+    __slots__ = ("pattern", "ticks", "step", "cycle", "gen")
+
+    def __init__(self, pattern: Pattern, gen: int):
+        self.pattern = pattern
+        self.ticks = [max(1, round(s / TICK)) for _, s in pattern.steps]
+        self.step = 0
+        self.cycle = 0
+        self.gen = gen
+
+class Animator:
+    def __init__(self, leds: Dict[str, object], groups: Optional[Dict[str, Iterable[str]]] = None):
+        self.leds = leds
+        self.groups = {g: tuple(names) for g, names in (groups or {}).items()}
+        self._shown: Dict[str, Dict[str, Pattern]] = {}   # group → what it was asked to show
+        self._pending: Dict[str, Dict[str, Pattern]] = {}  # group → next request (newest wins)
+        self._anims: Dict[str, _Anim] = {}
+        self._wheel: List[list] = [[] for _ in range(WHEEL_SLOTS)]
+        self._dues: List[int] = []  # heap: due tick of each entry in the wheel
+        self._gen = 0
+        self._t0 = time.monotonic()
+        self._tick = 0     # last tick processed
+        self._cv = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="homee-leds", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the loop and switch every LED off."""
+        with self._cv:
+            self._stopped = True
+            self._cv.notify()
+        if self._thread.is_alive():
+            self._thread.join(2)
+        for led in self.leds.values():
+            led.off()
+
+    # ── Requests (any thread) ──────────────────────────────────────────
+    def show(self, group: str, states: Dict[str, Union[str, Pattern]]):
+        """Set every LED of `group`: the ones named in `states` get that pattern
+        (a Pattern or a PATTERNS name), the rest go off."""
+        want = {n: PATTERNS[p] if isinstance(p, str) else p for n, p in states.items()}
+        for n in want:
+            if n not in self.groups[group]:
+                raise ValueError(f"{n} is not in LED group {group}")
+        with self._cv:
+            finite = any(p.cycles for p in want.values())  # e.g. "error": always replay
+            if not finite and want == self._pending.get(group, self._shown.get(group)):
+                return
+            self._pending[group] = want
+            self._cv.notify()
+
+    def showing(self, group: str) -> Dict[str, Pattern]:
+        with self._cv:
+            return dict(self._pending.get(group, self._shown.get(group, {})))
+
+    # ── Loop ───────────────────────────────────────────────────────────
+    def _now_tick(self) -> int:
+        return int((time.monotonic() - self._t0) / TICK)
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while not self._stopped and not self._pending and not self._dues:
+                    self._cv.wait()
+                if self._stopped:
+                    return
+                pending, self._pending = self._pending, {}
+                self._shown.update(pending)
+            now = self._now_tick()
+            dues = self._dues
+            while dues and dues[0] <= now:  # only the slots with something due
+                tick = heapq.heappop(dues)
+                if tick > self._tick:
+                    self._turn(tick)
+                    self._tick = tick
+            self._tick = now
+            for group, want in pending.items():
+                self._apply(group, want, now)
+            with self._cv:
+                if self._stopped:
+                    return
+                if self._dues and not self._pending:  # show() wakes it sooner
+                    self._cv.wait(max(0.0, self._t0 + self._dues[0] * TICK - time.monotonic()))
+
+    def _apply(self, group: str, want: Dict[str, Pattern], tick: int):
+        self._gen += 1
+        for name in self.groups[group]:
+            a = _Anim(want.get(name, OFF), self._gen)
+            self._anims[name] = a
+            self._write(name, a)
+            if len(a.pattern.steps) > 1:
+                self._schedule(name, a, tick + a.ticks[0])
+
+    def _write(self, name: str, a: _Anim):
+        led = self.leds[name]
+        led.on() if a.pattern.steps[a.step][0] else led.off()
+
+    def _schedule(self, name: str, a: _Anim, due: int):
+        self._wheel[due % WHEEL_SLOTS].append((due, name, a.gen))
+        heapq.heappush(self._dues, due)
+
+    def _turn(self, tick: int):
+        slot = self._wheel[tick % WHEEL_SLOTS]
+        if not slot:
+            return
+        keep = []
+        for entry in slot:
+            due, name, gen = entry
+            if due > tick:
+                keep.append(entry)  # a later revolution
+                continue
+            a = self._anims.get(name)
+            if a is None or a.gen != gen:
+                continue  # replaced since it was scheduled
+            a.step += 1
+            if a.step == len(a.ticks):
+                a.step = 0
+                a.cycle += 1
+                if a.pattern.cycles and a.cycle >= a.pattern.cycles:
+                    self.leds[name].off()
+                    continue
+            self._write(name, a)
+            self._schedule(name, a, due + a.ticks[a.step])
+        self._wheel[tick % WHEEL_SLOTS] = keep
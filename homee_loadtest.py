@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# HOMEe: replay load test for the web app
+# Starts homee_app in its own process on a HOMEE_DIR (fill one with homee_synth
+# first, at the size you want to test) and puts two kinds of load on it:
+#   replay      – carries the history on: each new reading is appended to the
+#                 CSV and POSTed to /submit, as homee_reader does, at --speed ×
+#                 real time (--interval s of readings per --interval/--speed s)
+#   dashboards  – --clients browsers in polling mode: /data?limit= plus /alerts
+#                 on load, then /data?since= every --poll s; now and then one
+#                 reloads at another limit or asks for a week of /data/aggregate
+# The load runs in phases – replay only, dashboards only, both – so the server's
+# CPU time and RSS (read from /proc) can be put down to an endpoint. Reported:
+# time to the first answer after start (warm start included), per endpoint
+# p50/p99/max latency and errors, and per phase server CPU (% of one core and
+# ms per request) and RSS.
+#
+#   python3 homee_synth.py --rows 1e6 --dir /tmp/homee-big
+#   python3 homee_loadtest.py --dir /tmp/homee-big --speed 60 --clients 20 --duration 30
+#
+# The clients share the machine (and a GIL) with the server here; for numbers
+# from a Pi, run the app there and point --url (and --pid, for CPU/RSS, when it
+# is local) at it.
+
+import argparse, contextlib, csv, json, os, random, socket, subprocess, sys, threading, time
+from homee_bench import summary
+from homee_synth import INTERVAL, Model, band_row
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PHASES = ("replay", "dashboards", "mixed")
+RELOAD = 0.03     # share of dashboard requests that are a full reload
+AGGREGATE = 0.01  # … and a 7-day /data/aggregate
+LIMITS = (50, 100, 200, 500)  # the dashboard's "Show last" choices
+
+# Runs in the server process: homee_app on HOMEE_DIR from the environment.
+SERVE = """
+import logging, sys
+import flask.cli
+logging.getLogger("werkzeug").setLevel(logging.ERROR)
+flask.cli.show_server_banner = lambda *a, **k: None
+from homee_app import create_app
+create_app().run(host="127.0.0.1", port=int(sys.argv[1]), threaded=True)
+"""
+
+# ── Measurements ───────────────────────────────────────────────────────
+class Recorder:
+    """Latencies and errors per endpoint, for the current phase."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.lat, self.errors = {}, {}
+
+    def add(self, endpoint: str, seconds: float, ok: bool):
+        with self.lock:
+            self.lat.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self) -> dict:
+        with self.lock:
+            return {ep: dict(summary(xs), errors=self.errors.get(ep, 0))
+                    for ep, xs in sorted(self.lat.items())}
+
+class ProcStats:
+    """CPU seconds and RSS of a process, from /proc (Linux). Samples RSS in the
+    background so a phase's peak isn't missed between its start and end."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.tick = os.sysconf("SC_CLK_TCK")
+        self.peak = 0
+        self._stop = threading.Event()
+        threading.Thread(target=self._sample, name="homee-loadtest-proc", daemon=True).start()
+
+    def cpu(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.tick  # utime + stime
+
+    def rss(self) -> int:
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def _sample(self):
+        while not self._stop.wait(0.2):
+            try:
+                self.peak = max(self.peak, self.rss())
+            except OSError:
+                return
+
+    def close(self):
+        self._stop.set()
+
+# ── Load ───────────────────────────────────────────────────────────────
+def _timed(rec: Recorder, session, endpoint: str, method: str, url: str, **kw):
+    t0 = time.perf_counter()
+    try:
+        r = session.request(method, url, timeout=30, **kw)
+        ok = r.status_code < 400
+    except Exception:
+        r, ok = None, False
+    rec.add(endpoint, time.perf_counter() - t0, ok)
+    return r if ok else None
+
+class Replay:
+    """Readings after the last one in the history, at `speed` × real time."""
+
+    def __init__(self, base: str, log_file, start: float, interval: float, speed: float,
+                 seed: int, device: str):
+        self.base, self.log_file = base, log_file
+        self.t, self.interval, self.speed = start, interval, speed
+        self.model = Model(seed + 1)
+        self.device = device
+        self.sent = 0
+        self.behind = 0.0  # worst lag behind schedule (s)
+
+    def run(self, rec: Recorder, stop: threading.Event):
+        import requests
+        s = requests.Session()
+        f = open(self.log_file, "a", newline="") if self.log_file else None
+        w = csv.writer(f) if f else None
+        t0, n = time.monotonic(), 0
+        try:
+            while not stop.is_set():
+                lag = time.monotonic() - (t0 + n * self.interval / self.speed)
+                if lag < 0:
+                    stop.wait(-lag)
+                    continue
+                self.behind = max(self.behind, lag)
+                ts = int(self.t)
+                temp, hum = self.model.step(self.t)
+                row, tb, hb = band_row(ts, temp, hum)
+                if w is not None:
+                    w.writerow(row)  # the reader logs first, then posts
+                    f.flush()
+                _timed(rec, s, "/submit", "POST", self.base + "/submit", json={
+                    "device_id": self.device, "timestamp": ts, "datetime_utc": row[1],
+                    "temp_c": temp, "humidity": hum,
+                    "temp_band": {"color": tb.color, "mode": tb.mode, "message": tb.message},
+                    "hum_band": {"color": hb.color, "mode": hb.mode, "message": hb.message}})
+                self.t += self.interval
+                self.sent += 1
+                n += 1
+        finally:
+            if f:
+                f.close()
+            s.close()
+
+def dashboard(base: str, rec: Recorder, stop: threading.Event, poll: float, seed: int):
+    import requests
+    rng = random.Random(seed)
+    s = requests.Session()
+    cursor, limit = None, 50
+    stop.wait(rng.uniform(0, poll))  # don't all poll on the same tick
+    while not stop.is_set():
+        r = rng.random()
+        if cursor is None or r < RELOAD:
+            limit = rng.choice(LIMITS)
+            resp = _timed(rec, s, "/data (load)", "GET", f"{base}/data?limit={limit}")
+            _timed(rec, s, "/alerts", "GET", base + "/alerts")
+        elif r < RELOAD + AGGREGATE:
+            resp = None
+            _timed(rec, s, "/data/aggregate", "GET",
+                   f"{base}/data/aggregate?bucket=1h&from={int(time.time()) - 7 * 86400}")
+        else:
+            resp = _timed(rec, s, "/data (poll)", "GET",
+                          f"{base}/data?since={cursor}&limit={limit}")
+        if resp is not None:
+            cursor = resp.json().get("cursor", cursor)
+        stop.wait(poll * rng.uniform(0.9, 1.1))
+    s.close()
+
+# ── Server ─────────────────────────────────────────────────────────────
+def _free_port() -> int:
+    with contextlib.closing(socket.socket()) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(homee_dir: str, timeout: float = 600.0):
+    """homee_app in a child process; returns (process, base URL, seconds to the first /data)."""
+    import requests
+    port = _free_port()
+    env = dict(os.environ, HOMEE_DIR=homee_dir)
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", SERVE, str(port)], cwd=HERE, env=env)
+    base = f"http://127.0.0.1:{port}"
+    while time.perf_counter() - t0 < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"homee_app exited with {proc.returncode}")
+        try:
+            if requests.get(base + "/data?limit=1", timeout=5).ok:
+                return proc, base, time.perf_counter() - t0
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError(f"homee_app did not answer within {timeout:.0f}s")
+
+# ── Run ────────────────────────────────────────────────────────────────
+def _last_reading(homee_dir: str):
+    from homee_tail import TailReader
+    rows = TailReader(os.path.join(homee_dir, "homee_readings.csv"), 1).read(1)
+    return rows[-1]["timestamp"] if rows else None
+
+def run(args) -> dict:
+    proc = None
+    if args.url:
+        base, ready, pid = args.url.rstrip("/"), None, args.pid
+    else:
+        proc, base, ready = start_server(args.dir)
+        pid = proc.pid
+    stats = ProcStats(pid) if pid else None
+    log_file = os.path.join(args.dir, "homee_readings.csv") if args.dir else None
+    last = _last_reading(args.dir) if args.dir else None
+    replay = Replay(base, log_file, (last or time.time()) + args.interval, args.interval,
+                    args.speed, args.seed, os.environ.get("HOMEE_DEVICE", "homee"))
+    rec = Recorder()
+    phases = {}
+    try:
+        for phase in args.phases:
+            rec.reset()
+            stop = threading.Event()
+            threads = []
+            if phase in ("replay", "mixed"):
+                threads.append(threading.Thread(target=replay.run, args=(rec, stop), daemon=True))
+            if phase in ("dashboards", "mixed"):
+                threads += [threading.Thread(target=dashboard, daemon=True,
+                                             args=(base, rec, stop, args.poll, args.seed * 1000 + i))
+                            for i in range(args.clients)]
+            sent0 = replay.sent
+            if stats:
+                stats.peak = rss0 = stats.rss()
+                cpu0 = stats.cpu()
+            t0 = time.perf_counter()
+            for t in threads:
+                t.start()
+            stop.wait(args.duration)
+            stop.set()
+            for t in threads:
+                t.join(35)
+            wall = time.perf_counter() - t0
+            endpoints = rec.report()
+            requests_n = sum(e["n"] for e in endpoints.values())
+            out = {"seconds": wall, "requests": requests_n, "rps": requests_n / wall,
+                   "readings": replay.sent - sent0, "endpoints": endpoints}
+            if stats:
+                cpu = stats.cpu() - cpu0
+                out["server"] = {"cpu_pct": 100 * cpu / wall,
+                                 "cpu_ms_per_request": 1000 * cpu / requests_n if requests_n else None,
+                                 "rss_mb": rss0 / 2**20, "rss_peak_mb": stats.peak / 2**20}
+            phases[phase] = out
+    finally:
+        if stats:
+            stats.close()
+        if proc is not None:
+            proc.terminate()
+            proc.wait(10)
+    return {"config": vars(args), "ready_s": ready, "rows_before": last,
+            "replay_behind_s": replay.behind, "phases": phases}
+
+def _print(report):
+    if report["ready_s"] is not None:
+        print(f"\nserver ready in {report['ready_s']:.2f}s")
+    fmt = lambda v: f"{v:10.1f}" if v is not None else f"{'-':>10}"
+    for name, p in report["phases"].items():
+        print(f"\n[{name}] {p['requests']} requests in {p['seconds']:.1f}s "
+              f"({p['rps']:.1f}/s), {p['readings']} readings replayed")
+        print(f"  {'endpoint':<18}{'n':>7}{'err':>6}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for ep, s in p["endpoints"].items():
+            print(f"  {ep:<18}{s['n']:>7}{s['errors']:>6}"
+                  f"{fmt(s['p50_ms'])}{fmt(s['p99_ms'])}{fmt(s['max_ms'])}")
+        srv = p.get("server")
+        if srv:
+            per = srv["cpu_ms_per_request"]
+            print(f"  server: cpu {srv['cpu_pct']:.0f}% of a core"
+                  f"{f', {per:.2f} ms/request' if per is not None else ''}, "
+                  f"rss {srv['rss_mb']:.1f} MB (peak {srv['rss_peak_mb']:.1f} MB)")
+    if report["replay_behind_s"] > 1:
+        print(f"\nreplay fell up to {report['replay_behind_s']:.1f}s behind schedule")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="HOMEe replay load test (/submit, /data)")
+    ap.add_argument("--dir", help="HOMEE_DIR with a history (see homee_synth)")
+    ap.add_argument("--url", help="test a running app instead of starting one")
+    ap.add_argument("--pid", type=int, help="with --url: the app's pid, for CPU/RSS")
+    ap.add_argument("--speed", type=float, default=60.0, help="replay at this × real time")
+    ap.add_argument("--interval", type=float, default=INTERVAL, help="s between readings")
+    ap.add_argument("--clients", type=int, default=10, help="concurrent dashboards")
+    ap.add_argument("--poll", type=float, default=5.0, help="dashboard poll interval (s)")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds per phase")
+    ap.add_argument("--phases", default=",".join(PHASES), help="comma-separated: " + ", ".join(PHASES))
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = ap.parse_args(argv)
+    args.phases = [p for p in args.phases.split(",") if p]
+    if not args.dir and not args.url:
+        ap.error("give --dir (start the app on it) or --url")
+    for p in args.phases:
+        if p not in PHASES:
+            ap.error(f"unknown phase {p!r}")
+    report = run(args)
+    _print(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# HOMEe: in-process counters and histograms, rendered in Prometheus text format
+# Metrics are module-level objects created where they are measured:
+#
+#   POST_SECONDS = metrics.histogram("homee_post_seconds", "POST /submit latency")
+#   with POST_SECONDS.time(): ...
+#   DROPS = metrics.counter("homee_stage_dropped_total", "Items dropped", ["stage"])
+#   DROPS.labels("http").inc()
+#
+# Recording is a bisect and a few additions under a per-metric lock; all text
+# formatting happens in render(), i.e. only when something scrapes /metrics.
+# homee_reader runs in its own process, so it writes its metrics to a text file
+# (TextfileWriter) that homee_app appends to its own /metrics output.
+
+import bisect, math, os, threading, time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# seconds: 1 ms … 60 s (sensor reads, file appends, HTTP, uploads)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+WRITE_INTERVAL = 15.0  # seconds between textfile writes
+
+def _fmt(v: float) -> str:
+    if v == math.inf: return "+Inf"
+    if v == -math.inf: return "-Inf"
+    if v != v: return "NaN"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+def _labelstr(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra: parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+# ── Metric children (one per label set) ────────────────────────────────
+class _Value:
+    """Counter or gauge value; set_function() makes it read a callback at render time."""
+
+    def __init__(self):
+        self._v = 0.0
+        self._fn: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1):
+        with self._lock:
+            self._v += n
+
+    def set(self, v: float):
+        self._v = v
+
+    def set_function(self, fn: Callable[[], float]):
+        self._fn = fn
+
+    def get(self) -> float:
+        return float(self._fn()) if self._fn is not None else self._v
+
+class _Hist:
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, v: float):
+        i = bisect.bisect_left(self._bounds, v)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += v
+
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._counts), self._sum
+
+class _Timer:
+    def __init__(self, hist):
+        self._hist = hist
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.perf_counter() - self._t0)
+        return False
+
+# ── Metric families ────────────────────────────────────────────────────
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new())
+        return child
+
+    def _new(self):
+        return _Value()
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            out.extend(self._samples(key, child))
+        return out
+
+    def _samples(self, key, child) -> List[str]:
+        return [f"{self.name}{_labelstr(self.labelnames, key)} {_fmt(child.get())}"]
+
+class Counter(_Family):
+    kind = "counter"
+
+    def inc(self, n: float = 1):
+        self._default.inc(n)
+
+    def set_function(self, fn):
+        self._default.set_function(fn)
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, v: float):
+        self._default.set(v)
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new(self):
+        return _Hist(self.buckets)
+
+    def observe(self, v: float):
+        self._default.observe(v)
+
+    def time(self):
+        return self._default.time()
+
+    def _samples(self, key, child) -> List[str]:
+        counts, total = child.snapshot()
+        out, acc = [], 0
+        for bound, n in zip(self.buckets + (math.inf,), counts):
+            acc += n
+            le = 'le="' + _fmt(bound) + '"'
+            out.append(f"{self.name}_bucket{_labelstr(self.labelnames, key, le)} {acc}")
+        labels = _labelstr(self.labelnames, key)
+        out.append(f"{self.name}_sum{labels} {_fmt(total)}")
+        out.append(f"{self.name}_count{labels} {acc}")
+        return out
+
+# ── Registry ───────────────────────────────────────────────────────────
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Family] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Family) -> _Family:
+        """Add `metric`; a metric already registered under the name is returned instead."""
+        with self._lock:
+            have = self._metrics.get(metric.name)
+            if have is not None:
+                if type(have) is not type(metric) or have.labelnames != metric.labelnames:
+                    raise ValueError(f"metric {metric.name} already registered differently")
+                return have
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name, help, labels=(), registry=REGISTRY) -> Counter:
+    return registry.register(Counter(name, help, labels))
+
+def gauge(name, help, labels=(), registry=REGISTRY) -> Gauge:
+    return registry.register(Gauge(name, help, labels))
+
+def histogram(name, help, labels=(), buckets=LATENCY_BUCKETS, registry=REGISTRY) -> Histogram:
+    return registry.register(Histogram(name, help, labels, buckets))
+
+# ── Cross-process export (node_exporter "textfile" style) ──────────────
+class TextfileWriter:
+    """Periodically writes `registry.render()` to `path` (atomically, only on change)."""
+
+    def __init__(self, path: str, registry: Registry = REGISTRY,
+                 interval: float = WRITE_INTERVAL):
+        self.path = path
+        self.registry = registry
+        self.interval = interval
+        self._last = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="homee-metrics", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(5)
+        self.write()
+
+    def write(self):
+        text = self.registry.render()
+        if text == self._last:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(text)
+            os.replace(tmp, self.path)
+            self._last = text
+        except OSError as e:
+            print(f"[metrics] cannot write {self.path}: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+def read_textfile(path: str) -> Tuple[str, Optional[float]]:
+    """(contents, age in seconds) of a file written by TextfileWriter; ("", None) if missing."""
+    try:
+        with open(path) as f:
+            return f.read(), time.time() - os.fstat(f.fileno()).st_mtime
+    except OSError:
+        return "", None
+
+def merge(text: str, other: str) -> str:
+    """Append the families in `other` that `text` doesn't already have."""
+    have = {line.split()[2] for line in text.splitlines() if line.startswith("# TYPE ")}
+    out, keep = [], True
+    for line in other.splitlines():
+        if line.startswith("# HELP "):
+            keep = line.split()[2] not in have
+        if keep:
+            out.append(line)
+    return text + ("\n".join(out) + "\n" if out else "")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# HOMEe: day-partitioned reading log with a timestamp → byte-offset index
+# One CSV per UTC day (YYYY-MM-DD.csv) plus a sidecar YYYY-MM-DD.idx holding
+# (timestamp, offset) pairs for every INDEX_EVERY-th row. Range queries open only
+# the days they touch and binary-search the index for the starting offset.
+# Sealed (past) days can be gzip-compressed; their index still applies because
+# offsets refer to the uncompressed bytes.
+
+import bisect, calendar, csv, gzip, io, os, shutil, struct, threading, time
+from typing import List, Dict, Any, Optional
+from homee_tail import parse_lines
+
+INDEX = struct.Struct("<qQ")  # timestamp, byte offset of the row
+INDEX_EVERY = 32              # rows between index entries
+DAY = 86400
+
+def day_name(ts: int) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+def _day_start(name: str) -> int:
+    return calendar.timegm(time.strptime(name, "%Y-%m-%d"))
+
+class PartitionedLog:
+    """Day partitions under `root`. With compress_after=N, partitions older than
+    N days are gzipped whenever the writer rolls over to a new day."""
+
+    def __init__(self, root: str, header: List[str], compress_after: Optional[int] = None):
+        self.root = root
+        self.header = header
+        self.compress_after = compress_after
+        self._lock = threading.Lock()
+        self._day = None      # name of the open partition
+        self._f = None        # open CSV (binary append)
+        self._idx = None      # open index (binary append)
+        self._rows = 0        # rows written to the open partition
+        self._index_cache = {}  # path → (size, timestamps, offsets)
+
+    # ── Writing ────────────────────────────────────────────────────────
+    def append(self, ts: int, fields: List[Any]):
+        """Append one row (already in header order) to the partition for `ts`."""
+        line = io.StringIO()
+        csv.writer(line).writerow(fields)
+        data = line.getvalue().encode("utf-8")
+        with self._lock:
+            day = day_name(ts)
+            if day != self._day:
+                rollover = self._day is not None
+                self._open(day)
+                if rollover and self.compress_after is not None:
+                    self.compress_old(self.compress_after)
+            off = self._f.tell()
+            if self._rows % INDEX_EVERY == 0:
+                self._idx.write(INDEX.pack(int(ts), off))
+                self._idx.flush()
+            self._f.write(data)
+            self._f.flush()
+            self._rows += 1
+
+    def _open(self, day: str):
+        self._close()
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, day + ".csv")
+        self._f = open(path, "ab")
+        if self._f.tell() == 0:
+            buf = io.StringIO()
+            csv.writer(buf).writerow(self.header)
+            self._f.write(buf.getvalue().encode("utf-8"))
+            self._rows = 0
+        else:
+            with open(path, "rb") as f:  # resume the row count for index spacing
+                self._rows = max(sum(1 for _ in f) - 1, 0)
+        self._idx = open(os.path.join(self.root, day + ".idx"), "ab")
+        self._day = day
+
+    def _close(self):
+        for f in (self._f, self._idx):
+            if f is not None:
+                f.close()
+        self._f = self._idx = self._day = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    # ── Partitions ─────────────────────────────────────────────────────
+    def days(self) -> List[str]:
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted({n.split(".", 1)[0] for n in names if n.endswith((".csv", ".csv.gz"))})
+
+    def partition(self, day: str) -> Optional[str]:
+        for ext in (".csv", ".csv.gz"):
+            path = os.path.join(self.root, day + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def compress_old(self, keep_days: int = 2) -> List[str]:
+        """gzip sealed partitions older than `keep_days` days; returns the new paths."""
+        cutoff = day_name(int(time.time()) - keep_days * DAY)
+        done = []
+        for day in self.days():
+            src = os.path.join(self.root, day + ".csv")
+            if day >= cutoff or day == self._day or not os.path.exists(src):
+                continue
+            dst = src + ".gz"
+            with open(src, "rb") as fi, gzip.open(dst + ".tmp", "wb") as fo:
+                shutil.copyfileobj(fi, fo)
+            os.replace(dst + ".tmp", dst)
+            os.remove(src)
+            done.append(dst)
+        return done
+
+    # ── Range queries ──────────────────────────────────────────────────
+    def _index(self, day: str):
+        path = os.path.join(self.root, day + ".idx")
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return [], []
+        hit = self._index_cache.get(path)
+        if hit and hit[0] == size:
+            return hit[1], hit[2]
+        with open(path, "rb") as f:
+            data = f.read(size - size % INDEX.size)
+        pairs = list(INDEX.iter_unpack(data))
+        tss, offs = [p[0] for p in pairs], [p[1] for p in pairs]
+        self._index_cache[path] = (size, tss, offs)
+        return tss, offs
+
+    def range(self, start: int, end: int, limit: int) -> List[Dict[str, Any]]:
+        """Rows with start <= timestamp < end, oldest first, at most `limit` (newest kept)."""
+        if limit <= 0:
+            return []
+        wanted = [d for d in self.days() if d >= day_name(start) and _day_start(d) < end]
+        out: List[Dict[str, Any]] = []
+        for day in reversed(wanted):  # newest day first so `limit` stops early
+            rows = self._read_day(day, start, end)
+            out[:0] = rows
+            if len(out) >= limit:
+                break
+        return out[-limit:]
+
+    def _read_day(self, day: str, start: int, end: int) -> List[Dict[str, Any]]:
+        path = self.partition(day)
+        if path is None:
+            return []
+        tss, offs = self._index(day)
+        i = bisect.bisect_left(tss, start) - 1  # last indexed row before `start`
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            header = next(csv.reader([f.readline().decode("utf-8", "replace")]))
+            if i >= 0:
+                f.seek(offs[i])
+            lines = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # row still being written
+                try:
+                    ts = int(line.split(b",", 1)[0])
+                except ValueError:
+                    continue
+                if ts >= end:
+                    break
+                if ts >= start:
+                    lines.append(line.rstrip(b"\r\n"))
+        return parse_lines(header, lines)
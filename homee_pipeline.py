@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# HOMEe: small staged pipeline (one worker thread + bounded queue per stage)
+# A stage's handler returns a result that is handed to every downstream stage;
+# returning None ends the item there. Failures are retried with exponential
+# backoff, then passed to on_error. Full queues apply the stage's policy:
+#   "drop_new" – refuse the item (the caller sees put() → False)
+#   "drop_old" – discard the oldest queued item to make room
+# With batch=N (> 1) the handler gets a list of up to N items that were already
+# queued, so a backlog is delivered in one call instead of N.
+
+import queue, threading, time, traceback
+import homee_metrics as metrics
+
+_STOP = object()
+
+HANDLER_SECONDS = metrics.histogram("homee_stage_seconds", "Handler time per call", ["stage"])
+RETRIES  = metrics.counter("homee_stage_retries_total", "Handler calls retried", ["stage"])
+FAILURES = metrics.counter("homee_stage_failures_total", "Items given up on", ["stage"])
+DROPPED  = metrics.counter("homee_stage_dropped_total", "Items dropped on a full queue", ["stage"])
+QUEUED   = metrics.gauge("homee_stage_queued", "Items waiting in the queue", ["stage"])
+
+class Stage:
+    def __init__(self, name, handler, maxsize=16, retries=0, backoff=1.0,
+                 on_full="drop_new", on_error=None, batch=1):
+        if on_full not in ("drop_new", "drop_old"):
+            raise ValueError(on_full)
+        self.name = name
+        self.handler = handler
+        self.retries = retries
+        self.backoff = backoff
+        self.on_full = on_full
+        self.on_error = on_error
+        self.batch = batch
+        self.downstream = []
+        self.dropped = 0
+        self._q = queue.Queue(maxsize=maxsize)
+        self._seconds = HANDLER_SECONDS.labels(name)
+        self._retries = RETRIES.labels(name)
+        self._failures = FAILURES.labels(name)
+        self._dropped = DROPPED.labels(name)
+        QUEUED.labels(name).set_function(self._q.qsize)
+        self._thread = threading.Thread(target=self._run, name=f"homee-{name}", daemon=True)
+
+    def to(self, *stages):
+        self.downstream.extend(stages)
+        return self
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._q.put(_STOP)  # blocks briefly if full; the worker is draining
+        self._thread.join(timeout)
+
+    def pending(self) -> int:
+        return self._q.qsize()
+
+    def put(self, item) -> bool:
+        while True:
+            try:
+                self._q.put_nowait(item)
+                return True
+            except queue.Full:
+                self.dropped += 1
+                self._dropped.inc()
+                if self.on_full == "drop_new":
+                    print(f"[{self.name}] queue full, dropping item")
+                    return False
+                try:
+                    self._q.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        while True:
+            item = self._q.get()
+            if item is _STOP:
+                return
+            stop = False
+            if self.batch > 1:
+                item = [item]
+                while len(item) < self.batch:
+                    try:
+                        nxt = self._q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is _STOP:
+                        stop = True
+                        break
+                    item.append(nxt)
+            result = self._attempt(item)
+            if result is not None:
+                for s in self.downstream:
+                    s.put(result)
+            if stop:
+                return
+
+    def _attempt(self, item):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                with self._seconds.time():
+                    return self.handler(item)
+            except Exception as e:
+                if attempt == self.retries:
+                    self._failures.inc()
+                    print(f"[{self.name}] failed after {attempt + 1} attempt(s): {e}")
+                    if self.on_error is not None:
+                        try:
+                            self.on_error(item, e)
+                        except Exception:
+                            traceback.print_exc()
+                    return None
+                self._retries.inc()
+                time.sleep(delay)
+                delay *= 2
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# HOMEe: who is in the building (RFID check-in / check-out per card)
+# pseudo_code_RFID.py kept one global last_uid, so a second person's scan
+# flipped the first person's state, and any card was welcome. Here every card
+# has its own entry in a dict keyed by UID (O(1) per scan however many cards
+# are registered), the people inside are a set (listing them doesn't walk the
+# registry), and repeated reads of a card resting on the reader are debounced –
+# unknown cards too, in a bounded map of their own, so a stranger's card left
+# on the reader is one denial rather than one per poll.
+#
+# An allowlist (CSV: uid,name) limits who can check in; without one every card
+# is accepted and enrolled on first scan. State is snapshotted to a compact
+# binary file by a background thread (at most every SAVE_INTERVAL, only when
+# something changed) and read back in a single pass at startup.
+#
+# Snapshot: header magic(8s) version(I) count(I), then per card
+#   uid_len(B) name_len(B) inside(B) pad(B) scans(I) since(d) last_seen(d),
+#   uid bytes, name bytes (utf-8)
+
+import csv, os, struct, threading, time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import homee_metrics as metrics
+
+DEBOUNCE = 3.0        # s; the same card read again within this is the same scan
+SAVE_INTERVAL = 5.0   # s between snapshots while scans are coming in
+MAX_UNKNOWN = 256     # unknown UIDs remembered for debouncing (least recent evicted)
+
+MAGIC = b"HOMEEPRS"
+VERSION = 1
+HEADER = struct.Struct("<8sII")
+RECORD = struct.Struct("<BBBxIdd")
+
+SCANS = metrics.counter("homee_presence_scans_total", "RFID scans by result", ["result"])
+INSIDE = metrics.gauge("homee_presence_inside", "Cards currently checked in")
+
+def normalize_uid(uid: str) -> str:
+    """Upper-case hex without separators; ValueError if it isn't a 4–10 byte UID."""
+    uid = uid.strip().replace(":", "").replace(" ", "").upper()
+    if not 8 <= len(uid) <= 20 or len(uid) % 2:
+        raise ValueError(f"bad RFID UID: {uid!r}")
+    bytes.fromhex(uid)
+    return uid
+
+class Card:
+    __slots__ = ("uid", "name", "inside", "since", "last_seen", "scans")
+
+    def __init__(self, uid: str, name: str = "", inside: bool = False, since: float = 0.0,
+                 last_seen: float = 0.0, scans: int = 0):
+        self.uid = uid
+        self.name = name
+        self.inside = inside
+        self.since = since          # time of the last IN/OUT change
+        self.last_seen = last_seen  # time of the last read (debounced ones too)
+        self.scans = scans
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"uid": self.uid, "name": self.name, "inside": self.inside, "since": self.since,
+                "last_seen": self.last_seen, "scans": self.scans}
+
+class Presence:
+    def __init__(self, path: Optional[str] = None, allowlist: Optional[str] = None,
+                 debounce: float = DEBOUNCE, save_interval: float = SAVE_INTERVAL):
+        self.path = path              # snapshot file (None = memory only)
+        self.debounce = debounce
+        self.save_interval = save_interval
+        self.enroll = allowlist is None  # no allowlist: any card may check in
+        self._cards: Dict[str, Card] = {}
+        self._inside: set = set()
+        self._unknown: "OrderedDict[str, float]" = OrderedDict()  # uid → last read
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = None
+        if path:
+            self.load()
+        if allowlist:
+            listed = self.load_allowlist(allowlist)
+            for uid in [u for u in self._cards if u not in listed]:
+                self.remove(uid)  # taken off the list since the last snapshot
+        INSIDE.set_function(self.count_inside)
+
+    # ── Registry ───────────────────────────────────────────────────────
+    def register(self, uid: str, name: str = "") -> Card:
+        uid = normalize_uid(uid)
+        with self._lock:
+            card = self._cards.get(uid)
+            if card is None:
+                card = self._cards[uid] = Card(uid, name)
+            elif name:
+                card.name = name
+            self._dirty = True
+            return card
+
+    def remove(self, uid: str) -> bool:
+        uid = normalize_uid(uid)
+        with self._lock:
+            self._inside.discard(uid)
+            self._dirty = True
+            return self._cards.pop(uid, None) is not None
+
+    def load_allowlist(self, path: str) -> set:
+        """Register the cards in a uid,name CSV (header optional); returns their UIDs."""
+        listed = set()
+        with open(path, newline="") as f:
+            for row in csv.reader(f):
+                if not row or not row[0].strip() or row[0].strip().lower() == "uid":
+                    continue
+                listed.add(self.register(row[0], row[1].strip() if len(row) > 1 else "").uid)
+        return listed
+
+    def __len__(self):
+        return len(self._cards)
+
+    def get(self, uid: str) -> Optional[Card]:
+        return self._cards.get(normalize_uid(uid))
+
+    # ── Scans ──────────────────────────────────────────────────────────
+    def scan(self, uid: str, now: Optional[float] = None) -> Tuple[str, Optional[Card]]:
+        """Toggle a card IN/OUT. Returns (result, card) with result one of
+        "in", "out", "repeat" (debounced; card is None for an unknown one) or
+        "unknown" (not on the allowlist)."""
+        uid = normalize_uid(uid)
+        now = time.time() if now is None else now
+        with self._lock:
+            card = self._cards.get(uid)
+            if card is None:
+                if not self.enroll:
+                    return self._deny(uid, now)
+                card = self._cards[uid] = Card(uid)
+            elif now - card.last_seen < self.debounce:
+                card.last_seen = now
+                SCANS.labels("repeat").inc()
+                return "repeat", card
+            card.last_seen = now
+            card.since = now
+            card.scans += 1
+            card.inside = not card.inside
+            if card.inside:
+                self._inside.add(uid)
+            else:
+                self._inside.discard(uid)
+            self._dirty = True
+        result = "in" if card.inside else "out"
+        SCANS.labels(result).inc()
+        return result, card
+
+    def _deny(self, uid: str, now: float) -> Tuple[str, None]:
+        """An unknown card: "unknown" once, then "repeat" while it keeps being read."""
+        last = self._unknown.pop(uid, None)
+        self._unknown[uid] = now
+        if len(self._unknown) > MAX_UNKNOWN:
+            self._unknown.popitem(last=False)
+        if last is not None and now - last < self.debounce:
+            SCANS.labels("repeat").inc()
+            return "repeat", None
+        SCANS.labels("unknown").inc()
+        return "unknown", None
+
+    def count_inside(self) -> int:
+        return len(self._inside)
+
+    def inside(self) -> List[Dict[str, Any]]:
+        """Checked-in cards, longest inside first."""
+        with self._lock:
+            cards = [self._cards[u].to_dict() for u in self._inside]
+        cards.sort(key=lambda c: c["since"])
+        return cards
+
+    # ── Snapshot ───────────────────────────────────────────────────────
+    def load(self) -> int:
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        try:
+            magic, version, count = HEADER.unpack_from(data)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("not a presence snapshot")
+            cards, pos = {}, HEADER.size
+            for _ in range(count):
+                ul, nl, inside, scans, since, seen = RECORD.unpack_from(data, pos)
+                pos += RECORD.size
+                uid = data[pos:pos + ul].hex().upper()
+                name = data[pos + ul:pos + ul + nl].decode("utf-8", "replace")
+                pos += ul + nl
+                cards[uid] = Card(uid, name, bool(inside), since, seen, scans)
+        except (struct.error, ValueError) as e:
+            print(f"[Presence] Ignoring unreadable snapshot {self.path}: {e}")
+            return 0
+        with self._lock:
+            self._cards.update(cards)
+            self._inside = {u for u, c in self._cards.items() if c.inside}
+        return len(cards)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            cards = list(self._cards.values())
+            self._dirty = False
+        parts = [HEADER.pack(MAGIC, VERSION, len(cards))]
+        for c in cards:
+            uid, name = bytes.fromhex(c.uid), c.name.encode("utf-8")[:255]
+            parts += [RECORD.pack(len(uid), len(name), c.inside, c.scans, c.since, c.last_seen),
+                      uid, name]
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(b"".join(parts))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            self._dirty = True
+            print(f"[Presence] Cannot write {self.path}: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="homee-presence", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.save_interval):
+            if self._dirty:
+                self.save()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+        if self._dirty:
+            self.save()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# HOMEe: edge-timestamped ultrasonic ranging (HC-SR04 style, via pigpio)
+# Replaces the trigger → busy-wait for echo → sleep(1) loop of
+# pseudo_code_intruder.py. A scheduler thread fires the 10 µs trigger pulse at a
+# fixed rate and then just waits; pigpio reports both echo edges with hardware
+# µs ticks on its callback thread, where the distance is computed, checked and
+# published. Nothing spins, and a measurement is available ~1 ms + round trip
+# after its trigger.
+#
+#   ranger = Ranger(hw.gpio(), rate=20).start()
+#   ranger.subscribe(lambda m: print(m.cm, m.status))
+#   IntruderAlarm(ranger, on_intruder=lambda m: ...)   # fires once per approach
+#
+# An event loop can own the schedule instead: start(thread=False), then call
+# fire() once per period and expire() after `timeout` (see homee_runtime).
+
+import threading, time
+from typing import Callable, List, NamedTuple, Optional
+import homee_metrics as metrics
+from homee_filter import RollingMedian
+
+TRIG_PIN, ECHO_PIN = 4, 17  # as in pseudo_detection.py
+RATE = 20.0                 # measurements per second
+ECHO_TIMEOUT = 0.03         # s; > round trip at MAX_CM
+MIN_CM, MAX_CM = 2.0, 400.0 # sensor's usable range
+SPIKE_CM = 30.0             # a jump this far from the recent median needs confirming
+WINDOW = 5                  # samples in that median
+SPEED_OF_SOUND = 34300.0    # cm/s at ~20 °C
+_EITHER_EDGE, _OUTPUT, _INPUT = 2, 1, 0  # pigpio constants
+
+MEASUREMENTS = metrics.counter("homee_ranging_total", "Ultrasonic measurements by status",
+                               ["status"])
+
+class Measurement(NamedTuple):
+    cm: float      # NaN unless status == "ok"
+    status: str    # ok | timeout | range | spike
+    ts: float      # wall clock (epoch seconds)
+    mono: float    # time.monotonic() at the falling edge (or timeout)
+
+def tick_diff(t1: int, t2: int) -> int:
+    """µs from tick t1 to t2; pigpio ticks wrap every ~72 minutes."""
+    return (t2 - t1) & 0xFFFFFFFF
+
+class Ranger:
+    def __init__(self, pi, trigger: int = TRIG_PIN, echo: int = ECHO_PIN, rate: float = RATE,
+                 timeout: float = ECHO_TIMEOUT, spike_cm: float = SPIKE_CM, window: int = WINDOW):
+        self.pi = pi
+        self.trigger = trigger
+        self.echo = echo
+        self.period = 1.0 / rate
+        self.timeout = timeout
+        self.spike_cm = spike_cm
+        self._median = RollingMedian(window)
+        self._suspect: Optional[float] = None  # unconfirmed jump
+        self._subs: List[Callable[[Measurement], None]] = []
+        self._latest: Optional[Measurement] = None
+        self._lock = threading.Lock()
+        self._rise: Optional[int] = None
+        self._waiting = False
+        self._done = threading.Event()
+        self._stop = threading.Event()
+        self._cb = None
+        self._thread = threading.Thread(target=self._run, name="homee-ranging", daemon=True)
+        pi.set_mode(trigger, _OUTPUT)
+        pi.set_mode(echo, _INPUT)
+        pi.write(trigger, 0)
+
+    def subscribe(self, fn: Callable[[Measurement], None]):
+        """fn(Measurement) runs on the pigpio callback thread: keep it short."""
+        self._subs.append(fn)
+
+    def latest(self) -> Optional[Measurement]:
+        return self._latest
+
+    def start(self, thread: bool = True):
+        """Listen for echoes; with thread=False the caller drives fire()/expire()."""
+        self._cb = self.pi.callback(self.echo, _EITHER_EDGE, self._edge)
+        if thread:
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._done.set()
+        if self._thread.is_alive():
+            self._thread.join(2)
+        if self._cb is not None:
+            self._cb.cancel()
+
+    # ── Trigger schedule ───────────────────────────────────────────────
+    def fire(self):
+        """Start one measurement; the result is published from the echo callback."""
+        self.expire()
+        with self._lock:
+            self._rise = None
+            self._waiting = True
+            self._done.clear()
+        self.pi.gpio_trigger(self.trigger, 10, 1)
+
+    def expire(self):
+        """Publish a timeout if the last measurement is still waiting for its echo."""
+        with self._lock:
+            timed_out, self._waiting = self._waiting, False
+        if timed_out:
+            self._publish(Measurement(float("nan"), "timeout", time.time(), time.monotonic()))
+
+    def _run(self):
+        nxt = time.monotonic()
+        while not self._stop.is_set():
+            self.fire()
+            if not self._done.wait(self.timeout):
+                self.expire()
+            nxt += self.period
+            now = time.monotonic()
+            if nxt < now:
+                nxt = now  # overran (slow subscriber or long echo): don't burst to catch up
+            self._stop.wait(nxt - now)
+
+    # ── Echo edges (pigpio callback thread) ────────────────────────────
+    def _edge(self, gpio: int, level: int, tick: int):
+        with self._lock:
+            if not self._waiting:
+                return  # stray edge, or the echo came back after the timeout
+            if level == 1:
+                self._rise = tick
+                return
+            if level != 0 or self._rise is None:
+                return  # 2 = pigpio watchdog
+            us = tick_diff(self._rise, tick)
+            self._waiting = False
+        cm = us * 1e-6 * SPEED_OF_SOUND / 2
+        self._publish(Measurement(*self._check(cm), time.time(), time.monotonic()))
+        self._done.set()
+
+    def _check(self, cm: float):
+        if not MIN_CM <= cm <= MAX_CM:
+            return float("nan"), "range"
+        med = self._median.median()
+        if len(self._median) >= 3 and abs(cm - med) > self.spike_cm:
+            # one odd echo is noise; two in a row that agree are a real change
+            if self._suspect is None or abs(cm - self._suspect) > self.spike_cm:
+                self._suspect = cm
+                return float("nan"), "spike"
+            self._median.push(self._suspect)
+        self._suspect = None
+        self._median.push(cm)
+        return cm, "ok"
+
+    def _publish(self, m: Measurement):
+        self._latest = m
+        MEASUREMENTS.labels(m.status).inc()
+        for fn in list(self._subs):
+            try:
+                fn(m)
+            except Exception as e:
+                print(f"[ranging] subscriber failed: {e}")
+
+class IntruderAlarm:
+    """Calls on_intruder(Measurement) once when something comes within (lo, hi) cm;
+    re-arms after `clear` consecutive valid readings outside the zone."""
+
+    def __init__(self, ranger: Ranger, on_intruder: Callable[[Measurement], None],
+                 lo: float = 2.0, hi: float = 10.0, clear: int = 3):
+        self.on_intruder = on_intruder
+        self.lo, self.hi, self.clear = lo, hi, clear
+        self.active = False
+        self.events = 0
+        self._outside = 0
+        ranger.subscribe(self._on)
+
+    def _on(self, m: Measurement):
+        if m.status != "ok":
+            return
+        if self.lo < m.cm < self.hi:
+            self._outside = 0
+            if not self.active:
+                self.active = True
+                self.events += 1
+                self.on_intruder(m)
+        elif self.active:
+            self._outside += 1
+            if self._outside >= self.clear:
+                self.active = False
+
+if __name__ == "__main__":
+    # Live view; with HOMEE_HW=sim an object walks up to the sensor after 2 s
+    # and the detection latency is printed.
+    import sys
+    from homee_hw import get_backend
+    hw = get_backend()
+    pi = hw.gpio()
+    appeared = []
+    if hw.name == "sim":
+        t_close = time.monotonic() + 2.0
+        pi.distance = lambda: 150.0 if time.monotonic() < t_close else 6.0
+        pi.noise = 0.5
+        appeared.append(t_close)
+    ranger = Ranger(pi, rate=float(sys.argv[1]) if len(sys.argv) > 1 else RATE)
+    def intruder(m):
+        lat = f", {1000 * (m.mono - appeared[0]):.0f} ms after it appeared" if appeared else ""
+        print(f"Intruder Detected! {m.cm:.1f} cm{lat}")
+    IntruderAlarm(ranger, intruder)
+    ranger.start()
+    try:
+        while True:
+            time.sleep(0.5)
+            m = ranger.latest()
+            if m: print(f"{m.cm:6.1f} cm  {m.status}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ranger.stop()
+        hw.close()
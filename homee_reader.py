@@ -2,158 +2,300 @@
 # HOMEe: button-triggered env logger for Raspberry Pi (UTC logging + full band messages)
 # GPIO: BTN=18, DHT11=24, LEDs RED=5 ORANGE=6 YELLOW=13 GREEN=16 BLUE=19 PURPLE=26
  
-from gpiozero import LED, Button
 from signal import pause
-from time import sleep, time, strftime, gmtime
-import requests, pigpio, pigpio_dht, csv, os, subprocess, traceback
+from time import time, strftime, gmtime
+import requests, requests.adapters, csv, os, traceback
+import homee_metrics as metrics
+from homee_classify import classify_temp, classify_humidity  # shared band table
+from homee_hw import get_backend
+from homee_leds import Animator, claim, lock_path
+from homee_ring import RingStore
+from homee_partition import PartitionedLog
+from homee_pipeline import Stage
+from homee_sampler import SampleWriter, Sampler, sample_path
+from homee_sync import CloudSync
  
 # ── Config ─────────────────────────────────────────────────────────────
+# HOMEE_DIR relocates all data files (e.g. to a temp dir for benchmarks/CI).
+HOMEE_DIR = os.environ.get("HOMEE_DIR", "/home/raspberry01/homee")
 SERVER   = "http://127.0.0.1:5000/submit"
-LOG_FILE = "/home/raspberry01/homee/homee_readings.csv"
+DEVICE_ID = os.environ.get("HOMEE_DEVICE", "homee")  # unique per Pi when several report to one hub
+LOG_FILE = os.path.join(HOMEE_DIR, "homee_readings.csv")
+RING_FILE = os.path.join(HOMEE_DIR, "homee_readings.ring")  # recent readings for homee_app
+PARTITION_DIR = os.path.join(HOMEE_DIR, "readings")        # one CSV + .idx per UTC day
+COMPRESS_AFTER_DAYS = 7                                   # gzip older day partitions
+# Uploader argv; {src}/{dst} are filled per segment. HOMEE_UPLOADER can point at
+# fake_dropbox_uploader.sh to test sync without a Dropbox account.
 DROPBOX_UPLOADER = [
     "/bin/bash",
-    "/home/raspberry01/homee/Dropbox-Uploader/dropbox_uploader.sh",
-    "upload", LOG_FILE, "homee_readings.csv", "/",
+    os.environ.get("HOMEE_UPLOADER",
+                   "/home/raspberry01/homee/Dropbox-Uploader/dropbox_uploader.sh"),
+    "upload", "{src}", "{dst}",
 ]
-BTN = Button(18, pull_up=True, bounce_time=0.15)
+SYNC_STATE   = os.path.join(HOMEE_DIR, "homee_sync.json")  # what has been uploaded
+SYNC_SEGMENTS = os.path.join(HOMEE_DIR, "segments")        # sealed, not-yet-uploaded
+SYNC_WINDOW  = 30.0                                        # coalesce presses (seconds)
+METRICS_FILE = os.path.join(HOMEE_DIR, "homee_reader.prom") # merged into homee_app /metrics
+SAMPLE_FILE  = sample_path(HOMEE_DIR)                      # latest sample, for homee_bands
+# The reader drives the LEDs unless HOMEE_LEDS=0 leaves them to homee_bands
+# (only one process may: see homee_leds.claim).
+DRIVE_LEDS   = os.environ.get("HOMEE_LEDS", "1") != "0"
+BTN_PIN = 18
 DHT_PIN = 24
+LED_PINS = {"RED": 5, "ORANGE": 6, "YELLOW": 13, "GREEN": 16, "BLUE": 19, "PURPLE": 26}
+ 
+# Hardware objects are created by setup(), not at import, so this module can be
+# imported and driven with simulated parts (see homee_hw / homee_bench).
+HW = None
+BTN = None
+LEDS = {}
+ANIM = None  # Animator: the only thing that drives LEDS (None without DRIVE_LEDS)
+_led_lock = None
+sensor = None
+SAMPLER = None
  
 # ── LEDs ───────────────────────────────────────────────────────────────
-LEDS = {
-    "RED": LED(5), "ORANGE": LED(6), "YELLOW": LED(13),
-    "GREEN": LED(16), "BLUE": LED(19), "PURPLE": LED(26),
-}
 TEMP_GROUP = {"RED","GREEN","BLUE"}
 HUM_GROUP  = {"ORANGE","YELLOW","PURPLE"}
  
-def _group_off(group):
-    for n in group: LEDS[n].off()
- 
 def _apply_led(color, mode):
-    grp = TEMP_GROUP if color in TEMP_GROUP else HUM_GROUP
-    _group_off(grp)
-    led = LEDS[color]
-    if   mode == "solid":  led.on()
-    elif mode == "flash1": led.blink(on_time=0.5, off_time=0.5, background=True)
-    elif mode == "flash5": led.blink(on_time=2.5, off_time=2.5, background=True)
-    elif mode == "off":    led.off()
-    else: raise ValueError(mode)
- 
-# ── Bands (from your table) ────────────────────────────────────────────
-def classify_temp(c):
-    if c >= 29:        return ("RED","flash1","TEMP IS TOO HOT!")
-    if 27 <= c <= 28:  return ("RED","flash5","Temp is too hot")
-    if 24 <= c <= 26:  return ("RED","solid","Temp is getting high")
-    if 19 <= c <= 23:  return ("GREEN","solid","Ideal temp")
-    if 0  <= c <= 18:  return ("BLUE","flash5","TEMP is too cold")
-    return ("BLUE","flash1","TEMP IS TOO COLD!")
- 
-def classify_humidity(rh):
-    if rh >= 70:       return ("ORANGE","flash5","HUM IS TOO HIGH!")
-    if 60 <= rh <= 69: return ("ORANGE","solid","Humidity getting high")
-    if 41 <= rh <= 59: return ("YELLOW","solid","Ideal humidity")
-    if 31 <= rh <= 40: return ("PURPLE","solid","Humidity getting low")
-    return ("PURPLE","flash5","HUM IS TOO LOW!")
- 
-# ── Sensor (signature: DHT11(gpio, pi=pi)) ─────────────────────────────
-pi = pigpio.pi()
-if not pi.connected:
-    raise RuntimeError("pigpio daemon not running. Start with: sudo pigpiod")
- 
-sensor = pigpio_dht.DHT11(DHT_PIN, pi=pi)
- 
-def _read_dht11(max_tries=5, retry_delay=0.8):
-    """Handles dict/tuple outputs; returns (temp_c, humidity)."""
-    last_err = None
-    for _ in range(max_tries):
-        try:
-            r = sensor.read()
-            if isinstance(r, dict):
-                if r.get("valid", True):
-                    c = r.get("temp_c") or r.get("temperature")
-                    h = r.get("humidity")
-                    if c is not None and h is not None:
-                        return float(c), float(h)
-            elif isinstance(r, tuple):
-                nums = [v for v in r if isinstance(v, (int, float))]
-                if len(nums) >= 2:
-                    a, b = float(nums[-2]), float(nums[-1])
-                    if 0 <= a <= 80 and 0 <= b <= 100: return a, b
-                    if 0 <= b <= 80 and 0 <= a <= 100: return b, a
-        except Exception as e:
-            last_err = e
-        sleep(retry_delay)
-    raise RuntimeError(f"DHT11 read failed: {last_err}")
+    # Presses and live samples both call this; the animator applies the whole
+    # group at once and ignores a request for what is already showing.
+    if ANIM is not None and color:  # no color: no band (a NaN reading)
+        ANIM.show("temp" if color in TEMP_GROUP else "hum", {color: mode})
  
-# ── CSV (UTC + messages) ───────────────────────────────────────────────
-def log_to_csv(ts, temp, rh, t_color, t_mode, t_msg, h_color, h_mode, h_msg):
-    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
-    new = not os.path.exists(LOG_FILE)
-    with open(LOG_FILE, "a", newline="") as f:
-        w = csv.writer(f)
-        if new:
-            w.writerow([
-                "timestamp","datetime_utc","temperature_C","humidity_pct",
-                "temp_color","temp_mode","temp_message",
-                "hum_color","hum_mode","hum_message"
-            ])
-        w.writerow([
-            ts, strftime("%Y-%m-%dT%H:%M:%SZ", gmtime()),
-            round(temp,1), round(rh,1),
-            t_color, t_mode, t_msg,
-            h_color, h_mode, h_msg
-        ])
+# ── Sensor ─────────────────────────────────────────────────────────────
+# One sampling daemon owns the sensor; presses and the live LED bands share it.
+SAMPLE_MAX_AGE = 3.0   # a press reuses a cached sample up to this old (seconds)
+SAMPLE_TIMEOUT = 4.0   # otherwise wait this long for a fresh read
+SAMPLE_MIN_GAP = 1.1   # DHT11 limit; only lower this for simulated sensors
+LIVE_BANDS     = True  # keep the LEDs tracking every sample, not just presses
  
-# ── Button handler ─────────────────────────────────────────────────────
-def on_press():
-    print("\nButton pressed → Reading sensor...")
-    try:
-        c, rh = _read_dht11()
-        t_color, t_mode, t_msg = classify_temp(c)
-        h_color, h_mode, h_msg = classify_humidity(rh)
+def _read_dht11(max_age=None, timeout=None):
+    """Returns (temp_c, humidity) from the sampler cache or the next read."""
+    s = SAMPLER.get(max_age=SAMPLE_MAX_AGE if max_age is None else max_age,
+                    timeout=SAMPLE_TIMEOUT if timeout is None else timeout)
+    if s is None:
+        raise RuntimeError(f"DHT11 read failed: {SAMPLER.last_error or 'no valid sample'}")
+    return s.temp_c, s.humidity
  
-        _apply_led(t_color, t_mode)
-        _apply_led(h_color, h_mode)
+def _show_bands(sample):
+    t_color, t_mode, _ = classify_temp(sample.temp_c)
+    h_color, h_mode, _ = classify_humidity(sample.humidity)
+    _apply_led(t_color, t_mode)
+    _apply_led(h_color, h_mode)
  
-        ts = int(time())  # epoch seconds (UTC by definition)
-        log_to_csv(ts, c, rh, t_color, t_mode, t_msg, h_color, h_mode, h_msg)
-        print(f"Logged UTC: {strftime('%Y-%m-%dT%H:%M:%SZ', gmtime())} | "
-              f"{c:.1f}°C, {rh:.1f}% → {t_color}/{h_color}")
+# ── CSV (UTC + messages) + binary ring ─────────────────────────────────
+APPEND_SECONDS = metrics.histogram("homee_store_append_seconds",
+                                   "Time to append one reading", ["store"])
+APPEND_FAILURES = metrics.counter("homee_store_append_failures_total",
+                                  "Failed appends (the CSV still has the row)", ["store"])
+_t_ring, _t_part, _t_csv = (APPEND_SECONDS.labels(s) for s in ("ring", "partition", "csv"))
+CSV_HEADER = [
+    "timestamp","datetime_utc","temperature_C","humidity_pct",
+    "temp_color","temp_mode","temp_message",
+    "hum_color","hum_mode","hum_message"
+]
+_csv = None   # (file, writer), kept open between readings
+_ring = None  # RingStore, opened on first reading
+_parts = None # PartitionedLog, created by setup()
  
-        # POST
+def _csv_writer():
+    """Open the CSV once; reopen only if it was deleted or replaced underneath us."""
+    global _csv
+    if _csv is not None:
+        f, w = _csv
         try:
-            payload = {
-                "timestamp": ts, "temp_c": round(c,1), "humidity": round(rh,1),
-                "temp_band":{"color":t_color,"mode":t_mode,"message":t_msg},
-                "hum_band":{"color":h_color,"mode":h_mode,"message":h_msg},
-                "datetime_utc": strftime("%Y-%m-%dT%H:%M:%SZ", gmtime()),
-            }
-            r = requests.post(SERVER, json=payload, timeout=5)
-            print(f"POST {SERVER} -> {r.status_code}")
-        except Exception as e:
-            print(f"[HTTP] Failed to POST: {e}")
+            if os.fstat(f.fileno()).st_ino == os.stat(LOG_FILE).st_ino:
+                return w
+        except FileNotFoundError:
+            pass
+        f.close()
+    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+    f = open(LOG_FILE, "a", newline="")
+    w = csv.writer(f)
+    if f.tell() == 0:
+        w.writerow(CSV_HEADER)
+    _csv = (f, w)
+    return w
  
-        # Dropbox upload
+def log_to_csv(ts, temp, rh, t_color, t_mode, t_msg, h_color, h_mode, h_msg, done=None):
+    """Append one reading to the ring, its day partition and the CSV. Sinks named
+    in `done` are skipped and the ones that succeed are added to it, so a retry
+    after a failed CSV write doesn't append the reading to the others again."""
+    global _ring
+    done = set() if done is None else done
+    if "ring" not in done:
+        try:
+            with _t_ring.time():
+                if _ring is None:
+                    _ring = RingStore(RING_FILE, writable=True)
+                _ring.append(ts, round(temp,1), round(rh,1), t_color, t_mode, h_color, h_mode)
+            done.add("ring")
+        except Exception as e:
+            APPEND_FAILURES.labels("ring").inc()
+            print(f"[Ring] Append failed: {e}")  # CSV below is still the record of truth
+    row = [
+        ts, strftime("%Y-%m-%dT%H:%M:%SZ", gmtime(ts)),  # the reading's, even on a retry
+        round(temp,1), round(rh,1),
+        t_color, t_mode, t_msg,
+        h_color, h_mode, h_msg
+    ]
+    if "partition" not in done:
         try:
-            subprocess.run(DROPBOX_UPLOADER, check=False)
+            with _t_part.time():
+                _parts.append(ts, row)
+            done.add("partition")
         except Exception as e:
-            print(f"[Dropbox] Upload failed: {e}")
+            APPEND_FAILURES.labels("partition").inc()
+            print(f"[Partition] Append failed: {e}")
+    if "csv" not in done:
+        with _t_csv.time():
+            w = _csv_writer()
+            w.writerow(row)
+            _csv[0].flush()
+        done.add("csv")
+ 
+# ── Pipeline stages (each runs on its own worker thread) ───────────────
+def _sense(press_time):
+    c, rh = _read_dht11()
+    t_color, t_mode, t_msg = classify_temp(c)
+    h_color, h_mode, h_msg = classify_humidity(rh)
+ 
+    _apply_led(t_color, t_mode)  # feedback right after the read, before any I/O
+    _apply_led(h_color, h_mode)
+ 
+    ts = int(time())  # epoch seconds (UTC by definition)
+    return {
+        "device_id": DEVICE_ID,
+        "timestamp": ts, "temp_c": round(c,1), "humidity": round(rh,1),
+        "temp_band":{"color":t_color,"mode":t_mode,"message":t_msg},
+        "hum_band":{"color":h_color,"mode":h_mode,"message":h_msg},
+        "datetime_utc": strftime("%Y-%m-%dT%H:%M:%SZ", gmtime(ts)),
+    }
+ 
+def _sense_failed(_job, e):
+    print("Measurement failed:", e)
+    traceback.print_exc()
+    # 2 s of fast blinking on RED and PURPLE, then off until the next sample
+    # repaints; the sense stage doesn't wait for it
+    if ANIM is not None:
+        ANIM.show("temp", {"RED": "error"})
+        ANIM.show("hum", {"PURPLE": "error"})
  
-    except Exception as e:
-        print("Measurement failed:", e)
-        traceback.print_exc()
-        LEDS["RED"].blink(on_time=0.2, off_time=0.2, background=True)
-        LEDS["PURPLE"].blink(on_time=0.2, off_time=0.2, background=True)
-        sleep(2); LEDS["RED"].off(); LEDS["PURPLE"].off()
+_written = {}  # id(reading) → sinks it has reached, while PERSIST retries it
+ 
+def _persist(p):
+    tb, hb = p["temp_band"], p["hum_band"]
+    done = _written.setdefault(id(p), set())
+    log_to_csv(p["timestamp"], p["temp_c"], p["humidity"],
+               tb["color"], tb["mode"], tb["message"],
+               hb["color"], hb["mode"], hb["message"], done)  # raises: retried, done kept
+    print(f"Logged UTC: {p['datetime_utc']} | "
+          f"{p['temp_c']:.1f}°C, {p['humidity']:.1f}% → {tb['color']}/{hb['color']}")
+    SYNC.notify()
+    del _written[id(p)]
+    return p
+ 
+# One keep-alive session for all POSTs (connection reused between readings)
+_http = requests.Session()
+_http.mount("http://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2))
+ 
+POST_SECONDS = metrics.histogram("homee_post_seconds", "POST /submit latency")
+POSTS = metrics.counter("homee_posts_total", "POST /submit attempts by result", ["result"])
+POST_ROWS = metrics.counter("homee_post_rows_total", "Readings sent to /submit")
+ 
+def _deliver(batch):
+    # /submit takes a single reading or an array; a backlog goes in one request
+    try:
+        with POST_SECONDS.time():
+            r = _http.post(SERVER, json=(batch[0] if len(batch) == 1 else batch), timeout=5)
+        print(f"POST {SERVER} ({len(batch)}) -> {r.status_code}")
+        r.raise_for_status()
+    except requests.HTTPError:
+        POSTS.labels("http_error").inc()
+        raise
+    except Exception:
+        POSTS.labels("error").inc()
+        raise
+    POSTS.labels("ok").inc()
+    POST_ROWS.inc(len(batch))
+ 
+# Dropbox: only rows appended since the last upload, one segment per burst
+SYNC = None  # CloudSync, created by setup()
+METRICS = None  # TextfileWriter, created by setup()
+ 
+# sense → persist → deliver, with persist also poking the debounced cloud sync.
+# Queues are bounded: extra presses are dropped while a backlog is pending.
+SENSE   = Stage("sense",   _sense,   maxsize=2, on_error=_sense_failed)
+PERSIST = Stage("persist", _persist, maxsize=32, retries=2, backoff=0.2,
+                on_error=lambda p, e: _written.pop(id(p), None))
+DELIVER = Stage("http",    _deliver, maxsize=32, retries=3, backoff=1.0, on_full="drop_old",
+                batch=16)
+SENSE.to(PERSIST)
+PERSIST.to(DELIVER)
+STAGES = (SENSE, PERSIST, DELIVER)  # upstream first, so stop() drains in order
+ 
+# ── Button handler ─────────────────────────────────────────────────────
+def on_press():
+    # Runs on the gpiozero callback thread: only enqueue, never block.
+    if SENSE.put(time()):
+        print("\nButton pressed → Reading sensor...")
+ 
+# ── Setup / lifecycle ──────────────────────────────────────────────────
+def setup(hw=None):
+    """Create hardware and storage objects from the config above (call once)."""
+    global HW, BTN, LEDS, ANIM, sensor, SAMPLER, SYNC, METRICS, _parts, _led_lock
+    if DRIVE_LEDS:
+        _led_lock = claim(lock_path(HOMEE_DIR), "homee_reader")  # before any pin is touched
+    HW = hw or get_backend()
+    BTN = HW.button(BTN_PIN, pull_up=True, bounce_time=0.15)
+    if DRIVE_LEDS:
+        LEDS = {name: HW.led(pin) for name, pin in LED_PINS.items()}
+        ANIM = Animator(LEDS, {"temp": TEMP_GROUP, "hum": HUM_GROUP})
+    sensor = HW.dht11(DHT_PIN)
+    SAMPLER = Sampler(sensor.read, min_gap=SAMPLE_MIN_GAP)
+    _parts = PartitionedLog(PARTITION_DIR, CSV_HEADER, compress_after=COMPRESS_AFTER_DAYS)
+    SYNC = CloudSync(LOG_FILE, DROPBOX_UPLOADER, SYNC_STATE, SYNC_SEGMENTS, window=SYNC_WINDOW)
+    METRICS = metrics.TextfileWriter(METRICS_FILE)
+ 
+def start():
+    if ANIM is not None:
+        ANIM.start()
+        if LIVE_BANDS: SAMPLER.subscribe(_show_bands)
+    SAMPLER.subscribe(SampleWriter(SAMPLE_FILE))  # other processes read this, not the sensor
+    SAMPLER.start()
+    for stage in STAGES: stage.start()
+    SYNC.start()
+    METRICS.start()
+    BTN.when_pressed = on_press
+ 
+def stop():
+    global _ring, _csv, _led_lock
+    BTN.when_pressed = None
+    for stage in STAGES: stage.stop()
+    SAMPLER.stop()
+    SYNC.stop()  # flushes the last burst
+    METRICS.stop()
+    _http.close()
+    if ANIM is not None: ANIM.stop()  # all LEDs off
+    if _ring is not None: _ring.close(); _ring = None
+    if _csv is not None: _csv[0].close(); _csv = None
+    _parts.close()
+    HW.close()
+    if _led_lock is not None: _led_lock.close(); _led_lock = None  # homee_bands may take them now
+    try:
+        os.unlink(SAMPLE_FILE)  # no stale sample for homee_bands to show
+    except OSError:
+        pass
  
 # ── Main ───────────────────────────────────────────────────────────────
 def main():
     print("HOMEe ready. Press the button to measure, log (UTC), send, and upload.")
-    BTN.when_pressed = on_press
+    setup()
+    start()
     try: pause()
-    finally:
-        for led in LEDS.values(): led.off()
-        pi.stop()
+    finally: stop()
  
 if __name__ == "__main__":
     main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# HOMEe: bounded in-memory buffer of the most recent readings
+# Filled by POST /submit (single readings or batches), warmed from the log at
+# startup, and read by /data without touching the filesystem. Every row that
+# goes in gets the next sequence number: ?since= cursors count arrivals, so a
+# second reading in the same second, or a late one, is still handed out.
+
+import bisect, math, threading, time
+from collections import deque
+from typing import List, Dict, Any, Iterable, Tuple
+
+def _band(b) -> Dict[str, str]:
+    b = b if isinstance(b, dict) else {}
+    return {"color": str(b.get("color","")), "mode": str(b.get("mode","")),
+            "message": str(b.get("message",""))}
+
+def normalize(r: Dict[str, Any], device: str = "") -> Dict[str, Any]:
+    """Coerce a submitted reading into the /data row shape; ValueError if unusable.
+    Readings without a device_id are attributed to `device`."""
+    if not isinstance(r, dict):
+        raise ValueError("reading must be an object")
+    try:
+        ts = int(r["timestamp"])
+        t = float(r["temp_c"])
+        h = float(r["humidity"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"bad reading: {e}")
+    if not (math.isfinite(t) and math.isfinite(h)):
+        raise ValueError("bad reading: temp_c and humidity must be numbers")
+    return {
+        "device_id": str(r.get("device_id") or device),
+        "timestamp": ts,
+        "datetime_utc": str(r.get("datetime_utc","")),
+        "temp_c": t,
+        "humidity": h,
+        "temp_band": _band(r.get("temp_band")),
+        "hum_band": _band(r.get("hum_band")),
+    }
+
+def _same(a, b) -> bool:
+    def eq(x, y):
+        return x == y or (math.isnan(x) and math.isnan(y))
+    return (a["timestamp"] == b["timestamp"] and eq(a["temp_c"], b["temp_c"])
+            and eq(a["humidity"], b["humidity"]))
+
+class RecentBuffer:
+    """Last `capacity` readings, oldest first, kept in timestamp order."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._rows = deque(maxlen=capacity)
+        self._seqs = deque(maxlen=capacity)  # arrival number of each row in _rows
+        self.seq = 0                 # arrival number of the newest row added
+        self._lock = threading.Lock()
+        self.version = 0             # bumped whenever the contents change
+        self.changed = time.time()   # wall time of the last change
+
+    def __len__(self):
+        return len(self._rows)
+
+    def newest_ts(self) -> int:
+        rows = self._rows
+        return rows[-1]["timestamp"] if rows else -1
+
+    def add(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Insert already-normalized rows; returns how many were new."""
+        added = 0
+        with self._lock:
+            for r in rows:
+                buf = self._rows
+                if not buf or r["timestamp"] > buf[-1]["timestamp"]:
+                    buf.append(r)  # the normal case: newest reading
+                    added += 1
+                    self.seq += 1
+                    self._seqs.append(self.seq)
+                    continue
+                # late or retried reading: place it by timestamp, skip duplicates
+                ts = [x["timestamp"] for x in buf]
+                lo, hi = bisect.bisect_left(ts, r["timestamp"]), bisect.bisect_right(ts, r["timestamp"])
+                if any(_same(buf[i], r) for i in range(lo, hi)):
+                    continue
+                if len(buf) == buf.maxlen:
+                    if lo == 0:
+                        continue  # older than everything we keep
+                    buf.popleft()
+                    self._seqs.popleft()
+                    hi -= 1
+                buf.insert(hi, r)
+                added += 1
+                self.seq += 1
+                self._seqs.insert(hi, self.seq)
+            if added:
+                self.version += 1
+                self.changed = time.time()
+        return added
+
+    def since(self, seq: int, limit: int) -> List[Dict[str, Any]]:
+        """Rows added after arrival number `seq` (at most the newest `limit`),
+        oldest first. Late rows sit anywhere in the buffer, so this is one pass
+        over the sequence numbers (≤ capacity ints)."""
+        limit = max(0, min(limit, self.capacity))
+        with self._lock:
+            out = [r for r, n in zip(self._rows, self._seqs) if n > seq]
+        return out[-limit:] if limit else []
+
+    def entries(self, limit: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """tail() with each row's arrival number: (seq, row), oldest first."""
+        limit = max(0, min(limit, self.capacity))
+        with self._lock:
+            out = list(zip(self._seqs, self._rows))
+        return out[-limit:] if limit else []
+
+    def newest(self):
+        rows = self._rows
+        return rows[-1] if rows else None
+
+    def tail(self, limit: int) -> List[Dict[str, Any]]:
+        limit = max(0, min(limit, self.capacity))
+        with self._lock:
+            rows = list(self._rows)
+        return rows[-limit:] if limit else []
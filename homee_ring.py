@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# HOMEe: memory-mapped ring store for recent readings
+# Fixed-width binary records in a preallocated file, so appends never grow the
+# file and "last N readings" is a constant-time slice. The CSV stays as the
+# export/mirror format; this is the fast path for the web app.
+#
+# Layout: 32-byte header, then CAPACITY records of RECORD.size bytes.
+#   header: magic(8s) version(I) record_size(I) capacity(I) pad(I) count(Q)
+#   record: timestamp(q) temp_c(f) humidity(f) t_color t_mode h_color h_mode (B each)
+# `count` is the total number of records ever appended; the newest record sits
+# in slot (count-1) % capacity. It is bumped only after the record is written.
+
+import mmap, os, struct, time
+from typing import List, Dict, Any
+from homee_classify import HUMIDITY, TEMP, band_messages, numpy
+
+MAGIC   = b"HOMEERNG"
+VERSION = 1
+HEADER  = struct.Struct("<8sIIIIQ")
+RECORD  = struct.Struct("<qffBBBB")
+_COUNT  = struct.Struct("<Q")
+_COUNT_AT = HEADER.size - _COUNT.size
+DEFAULT_CAPACITY = 4096  # ~80 KB
+
+# ── Band codes ─────────────────────────────────────────────────────────
+COLORS = ["", "RED", "ORANGE", "YELLOW", "GREEN", "BLUE", "PURPLE"]
+MODES  = ["", "solid", "flash1", "flash5", "off"]
+_COLOR_CODE = {c: i for i, c in enumerate(COLORS)}
+_MODE_CODE  = {m: i for i, m in enumerate(MODES)}
+
+MESSAGES = band_messages()  # (color, mode) → message, from the shared band table
+
+def _band(color_code: int, mode_code: int) -> Dict[str, str]:
+    color, mode = COLORS[color_code], MODES[mode_code]
+    return {"color": color, "mode": mode, "message": MESSAGES.get((color, mode), "")}
+
+def decode(rec) -> Dict[str, Any]:
+    ts, t, h, tc, tm, hc, hm = rec
+    return {
+        "timestamp": ts,
+        "datetime_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts)),
+        "temp_c": round(t, 1),
+        "humidity": round(h, 1),
+        "temp_band": _band(tc, tm),
+        "hum_band": _band(hc, hm),
+    }
+
+# ── Ring file ──────────────────────────────────────────────────────────
+class RingStore:
+    """Open (and with writable=True, create) a ring file at `path`."""
+
+    def __init__(self, path: str, capacity: int = DEFAULT_CAPACITY, writable: bool = False):
+        self.path = path
+        self.writable = writable
+        if writable and not os.path.exists(path):
+            _create(path, capacity)
+        self._f = open(path, "r+b" if writable else "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0,
+                                 access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        except Exception:
+            self._f.close()
+            raise
+        magic, version, rsize, cap, _, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or rsize != RECORD.size:
+            self.close()
+            raise ValueError(f"{path}: not a HOMEe ring file (v{VERSION})")
+        self.capacity = cap
+
+    def close(self):
+        self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def count(self) -> int:
+        # read twice so a torn 64-bit update on 32-bit ARM is never returned
+        while True:
+            a = _COUNT.unpack_from(self._mm, _COUNT_AT)[0]
+            b = _COUNT.unpack_from(self._mm, _COUNT_AT)[0]
+            if a == b:
+                return a
+
+    def append(self, ts: int, temp: float, rh: float,
+               t_color: str, t_mode: str, h_color: str, h_mode: str):
+        n = self.count
+        RECORD.pack_into(self._mm, HEADER.size + (n % self.capacity) * RECORD.size,
+                         int(ts), temp, rh,
+                         _COLOR_CODE.get(t_color, 0), _MODE_CODE.get(t_mode, 0),
+                         _COLOR_CODE.get(h_color, 0), _MODE_CODE.get(h_mode, 0))
+        _COUNT.pack_into(self._mm, _COUNT_AT, n + 1)  # publish
+
+    def tail_raw(self, limit: int):
+        """Last `limit` records, oldest first, as RECORD tuples (no text parsing)."""
+        n = self.count
+        k = max(0, min(limit, n, self.capacity - 1))  # keep one slot clear of a concurrent writer
+        if not k:
+            return []
+        view = memoryview(self._mm)
+        try:
+            first = (n - k) % self.capacity
+            end = first + k
+            segs = [(first, min(end, self.capacity)), (0, max(0, end - self.capacity))]
+            out = []
+            for a, b in segs:
+                if b > a:
+                    out.extend(RECORD.iter_unpack(view[HEADER.size + a * RECORD.size:
+                                                       HEADER.size + b * RECORD.size]))
+        finally:
+            view.release()
+        lapped = self.count - n  # records the writer added while we were slicing
+        return out[lapped:] if lapped else out
+
+    def tail(self, limit: int) -> List[Dict[str, Any]]:
+        return [decode(r) for r in self.tail_raw(limit)]
+
+def _create(path: str, capacity: int):
+    """Preallocate the whole file once, then rename into place."""
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, capacity, 0, 0))
+        f.write(bytes(capacity * RECORD.size))  # real blocks, not a sparse file
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+# ── Batch reclassification ─────────────────────────────────────────────
+def reclassify(path: str, temp=TEMP, hum=HUMIDITY) -> int:
+    """Recompute the band codes of every stored record from the band tables.
+
+    With NumPy this is one vectorized pass over the mmap (no copies, no parsing).
+    Returns the number of records updated.
+    """
+    with RingStore(path, writable=True) as ring:
+        n = min(ring.count, ring.capacity)
+        if not n:
+            return 0
+        lut = {}
+        for key, table, codes, field in (("tc", temp, _COLOR_CODE, "color"), ("tm", temp, _MODE_CODE, "mode"),
+                                          ("hc", hum, _COLOR_CODE, "color"), ("hm", hum, _MODE_CODE, "mode")):
+            lut[key] = [codes.get(getattr(b, field), 0) for b in table.bands] + [0]  # idx -1 → 0
+        np = numpy()
+        if np is not None:
+            recs = np.frombuffer(ring._mm, dtype=_np_record(np), count=n, offset=HEADER.size)
+            ti = temp.index_many(recs["temp"])
+            hi = hum.index_many(recs["hum"])
+            for key, idx in (("tc", ti), ("tm", ti), ("hc", hi), ("hm", hi)):
+                recs[key] = np.asarray(lut[key], dtype=np.uint8)[idx]
+            del recs  # release the buffer before the mmap closes
+        else:
+            for slot in range(n):
+                at = HEADER.size + slot * RECORD.size
+                ts, t, h, *_ = RECORD.unpack_from(ring._mm, at)
+                ti, hi = temp.index(t), hum.index(h)
+                RECORD.pack_into(ring._mm, at, ts, t, h,
+                                 lut["tc"][ti], lut["tm"][ti], lut["hc"][hi], lut["hm"][hi])
+        return n
+
+def _np_record(np):
+    return np.dtype([
+        ("ts", "<i8"), ("temp", "<f4"), ("hum", "<f4"),
+        ("tc", "u1"), ("tm", "u1"), ("hc", "u1"), ("hm", "u1"),
+    ])
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# HOMEe: time-bucketed rollups (minute / hour / day) for long-range trends
+# Each tier keeps count, sum, min and max of temperature and humidity per bucket.
+# Rows are folded in as they are appended to the CSV (only new bytes are read),
+# and the tiers are snapshotted to JSON so a restart resumes from the last offset.
+
+import bisect, csv, json, math, os, threading, time
+from typing import Dict, List, Any, Optional
+
+TIERS = {"minute": 60, "hour": 3600, "day": 86400}
+RETENTION = {"minute": 7 * 86400, "hour": 2 * 365 * 86400, "day": None}  # seconds; None = forever
+MAX_POINTS = 1000        # hard cap on buckets returned by one query
+SNAPSHOT_EVERY = 300     # seconds between JSON snapshots
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+def parse_bucket(spec: str) -> int:
+    """'90s', '5m', '1h', '1d', '2w' → seconds."""
+    spec = spec.strip().lower()
+    n = int(spec[:-1] or 1) if spec[-1:] in _UNITS else int(spec)
+    secs = n * _UNITS.get(spec[-1:], 1)
+    if secs <= 0:
+        raise ValueError(f"bad bucket: {spec}")
+    return secs
+
+# ── Bucket stats: [count, t_sum, t_min, t_max, h_sum, h_min, h_max] ─────
+def _new():
+    return [0, 0.0, math.inf, -math.inf, 0.0, math.inf, -math.inf]
+
+def _fold(b, t: float, h: float):
+    b[0] += 1
+    b[1] += t; b[2] = min(b[2], t); b[3] = max(b[3], t)
+    b[4] += h; b[5] = min(b[5], h); b[6] = max(b[6], h)
+
+def _merge(a, b):
+    a[0] += b[0]
+    a[1] += b[1]; a[2] = min(a[2], b[2]); a[3] = max(a[3], b[3])
+    a[4] += b[4]; a[5] = min(a[5], b[5]); a[6] = max(a[6], b[6])
+
+def _point(start: int, b) -> Dict[str, Any]:
+    n = b[0]
+    return {
+        "t": start, "count": n,
+        "temp_c":   {"min": b[2], "max": b[3], "mean": round(b[1] / n, 2)},
+        "humidity": {"min": b[5], "max": b[6], "mean": round(b[4] / n, 2)},
+    }
+
+class _Tier:
+    def __init__(self, seconds: int, retention: Optional[int]):
+        self.seconds = seconds
+        self.retention = retention
+        self.keys: List[int] = []   # sorted bucket starts
+        self.buckets: Dict[int, list] = {}
+
+    def add(self, ts: int, t: float, h: float):
+        start = ts - ts % self.seconds
+        b = self.buckets.get(start)
+        if b is None:
+            b = self.buckets[start] = _new()
+            if not self.keys or start > self.keys[-1]:
+                self.keys.append(start)   # the normal, in-order case
+            else:
+                bisect.insort(self.keys, start)
+            self._expire(start)
+        _fold(b, t, h)
+
+    def _expire(self, newest: int):
+        if self.retention is None:
+            return
+        cut = bisect.bisect_left(self.keys, newest - self.retention)
+        if cut:
+            for k in self.keys[:cut]:
+                del self.buckets[k]
+            del self.keys[:cut]
+
+    def range(self, start: int, end: int):
+        lo = bisect.bisect_left(self.keys, start)
+        hi = bisect.bisect_left(self.keys, end)
+        return [(k, self.buckets[k]) for k in self.keys[lo:hi]]
+
+# ── Downsampling ───────────────────────────────────────────────────────
+def lttb(xs: List[float], ys: List[float], n: int) -> List[int]:
+    """Largest-Triangle-Three-Buckets: indices of `n` points that keep the curve's shape."""
+    size = len(xs)
+    if n >= size or n < 3:
+        return list(range(size))
+    out, a = [0], 0
+    every = (size - 2) / (n - 2)
+    for i in range(n - 2):
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        nlo, nhi = hi, min(int((i + 2) * every) + 1, size)
+        avg_x = sum(xs[nlo:nhi]) / (nhi - nlo)
+        avg_y = sum(ys[nlo:nhi]) / (nhi - nlo)
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        out.append(best)
+        a = best
+    out.append(size - 1)
+    return out
+
+# ── Store ──────────────────────────────────────────────────────────────
+class RollupStore:
+    """Rollup tiers fed incrementally from the CSV at `path`."""
+
+    def __init__(self, path: str, snapshot: Optional[str] = None):
+        self.path = path
+        self.snapshot = snapshot
+        self._lock = threading.Lock()
+        self._tiers = {name: _Tier(s, RETENTION[name]) for name, s in TIERS.items()}
+        self._ino = None
+        self._offset = 0      # CSV bytes consumed so far
+        self._cols = None     # (ts, temp, hum) column indexes from the header
+        self._saved = time.monotonic()
+        if snapshot:
+            self._load()
+
+    def add(self, ts: int, t: float, h: float):
+        if math.isnan(t) or math.isnan(h):
+            return
+        for tier in self._tiers.values():
+            tier.add(ts, t, h)
+
+    def sync(self):
+        """Fold in whatever has been appended to the CSV since the last call."""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            if st.st_ino != self._ino or st.st_size < self._offset:
+                self._reset(st.st_ino)
+            if st.st_size > self._offset:
+                with open(self.path, "rb") as f:
+                    self._consume(f)
+            if self.snapshot and time.monotonic() - self._saved > SNAPSHOT_EVERY:
+                self._save()
+
+    def _reset(self, ino):
+        self._tiers = {name: _Tier(s, RETENTION[name]) for name, s in TIERS.items()}
+        self._ino, self._offset, self._cols = ino, 0, None
+
+    def _consume(self, f, chunk: int = 1 << 20):
+        f.seek(self._offset)
+        tail = b""
+        while True:
+            data = f.read(chunk)
+            if not data:
+                return
+            data = tail + data
+            cut = data.rfind(b"\n") + 1  # a half-written row waits for the next call
+            tail = data[cut:]
+            if cut:
+                self._fold_lines(data[:cut].decode("utf-8", "replace").splitlines())
+                self._offset += cut
+
+    def _fold_lines(self, lines: List[str]):
+        if self._cols is None:
+            header = next(csv.reader([lines.pop(0)]))
+            self._cols = (header.index("timestamp"), header.index("temperature_C"),
+                          header.index("humidity_pct"))
+        i_ts, i_t, i_h = self._cols
+        for fields in csv.reader(lines):
+            try:
+                self.add(int(fields[i_ts]), float(fields[i_t]), float(fields[i_h]))
+            except (ValueError, IndexError):
+                continue
+
+    def query(self, bucket: int, start: int, end: int, max_points: int = MAX_POINTS,
+              shape: Optional[str] = None) -> Dict[str, Any]:
+        """Buckets of `bucket` seconds over [start, end), at most `max_points` of them.
+
+        The bucket is widened when the range would need more points. With
+        shape="temp_c" or "humidity", finer buckets are kept instead and thinned
+        with LTTB on that metric's mean, preserving peaks for charts.
+        """
+        max_points = max(1, min(max_points, MAX_POINTS))
+        span = max(end - start, 1)
+        if not shape:
+            bucket = max(bucket, -(-span // max_points))
+        names = list(TIERS)  # fine → coarse
+        i = max([j for j, n in enumerate(names) if TIERS[n] <= bucket] or [0])
+        now = time.time()
+        # finer tiers expire old buckets: step up until the tier still covers `start`
+        while i < len(names) - 1 and RETENTION[names[i]] is not None \
+                and start < now - RETENTION[names[i]]:
+            i += 1
+        if shape:
+            # keep source buckets fine, but never touch more than a few x max_points
+            while i < len(names) - 1 and span // TIERS[names[i]] > 4 * max_points:
+                i += 1
+            bucket = TIERS[names[i]]
+        name = names[i]
+        tier = self._tiers[name]
+        bucket = -(-max(bucket, tier.seconds) // tier.seconds) * tier.seconds
+        merged: List[list] = []
+        starts: List[int] = []
+        with self._lock:
+            for k, b in tier.range(start - start % bucket, end):
+                s = k - k % bucket
+                if starts and starts[-1] == s:
+                    _merge(merged[-1], b)
+                else:
+                    starts.append(s)
+                    merged.append(list(b))
+        points = [_point(s, b) for s, b in zip(starts, merged)]
+        if shape and len(points) > max_points:
+            ys = [p[shape]["mean"] for p in points]
+            points = [points[i] for i in lttb(starts, ys, max_points)]
+        return {"bucket": bucket, "tier": name, "from": start, "to": end, "points": points}
+
+    # ── Snapshot ───────────────────────────────────────────────────────
+    def _save(self):
+        state = {
+            "ino": self._ino, "offset": self._offset, "cols": self._cols,
+            "tiers": {n: [[k, t.buckets[k]] for k in t.keys] for n, t in self._tiers.items()},
+        }
+        tmp = self.snapshot + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp, self.snapshot)
+        self._saved = time.monotonic()
+
+    def _load(self):
+        try:
+            with open(self.snapshot) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        for name, rows in state.get("tiers", {}).items():
+            tier = self._tiers.get(name)
+            if tier is None:
+                continue
+            for k, b in rows:
+                tier.keys.append(k)
+                tier.buckets[k] = b
+            tier.keys.sort()
+        self._ino = state.get("ino")
+        self._offset = state.get("offset", 0)
+        self._cols = tuple(state["cols"]) if state.get("cols") else None
+
+    def close(self):
+        if self.snapshot:
+            with self._lock:
+                self._save()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# HOMEe: one asyncio event loop for the RFID, intruder and motion logic
+# Replaces the three threads of pseudo_code_RFID.py, pseudo_code_intruder.py and
+# pseudo_detection.py, which shared lcd_lock/rfid_lock and global flags and
+# stopped sensing while they waited out their own display effects (2 s after a
+# card, 5 s of flashing after an intruder).
+#   Sensors are tasks on a fixed-rate schedule:
+#     rfid    – polls the reader (SPI call in a worker thread) at RFID_RATE
+#     ranging – fires the ultrasonic Ranger at RANGE_RATE; its measurements fan
+#               out to the intruder and motion tasks
+#   Outputs are actors, each the only owner of its hardware:
+#     LcdActor – shows a message, clears it after `seconds` unless replaced
+#     LedActor – on/off/flash per LED; a new command cancels that LED's effect
+# Sensor tasks only post messages, so a display effect never delays a reading.
+#
+#   HOMEE_HW=sim python3 homee_runtime.py    # scripted demo, prints what happened
+
+import asyncio, math, time
+from typing import Any, Callable, Dict, Optional
+from homee_filter import MotionDetector
+from homee_presence import Presence
+from homee_ranging import IntruderAlarm, Measurement, Ranger
+import homee_metrics as metrics
+
+# Placeholder pins (the pseudo code leaves them open); they avoid the reader's 18/24.
+LED_PINS = {"red": 21, "green": 20, "blue": 12}
+LIGHT_PIN = 25           # room light relay
+LIGHT_BTN = 27           # toggles the light system
+TRIG_PIN, ECHO_PIN = 4, 17
+
+RFID_RATE = 10.0         # reader polls per second
+RANGE_RATE = 10.0        # ultrasonic measurements per second (was 1/s and 1/0.3 s)
+CARD_SECONDS = 2.0       # Welcome/Goodbye + green LED (Access denied + red)
+INTRUDER_SECONDS = 5.0   # red flashing + LCD message
+FLASH_ON = FLASH_OFF = 0.2
+LIGHT_HOLD = 5.0         # s the room light stays on after motion stops
+INTRUDER_LO, INTRUDER_HI = 2.0, 10.0
+
+TICK_LATE = metrics.histogram("homee_runtime_tick_late_seconds",
+                              "How late a sensor task started its sample", ["task"])
+EVENTS = metrics.counter("homee_runtime_events_total", "Runtime events by kind", ["kind"])
+
+def print_event(kind: str, source: str = "", detail: str = ""):
+    print(f"{time.strftime('%H:%M:%S')} {kind} {source} {detail}".rstrip())
+
+async def every(period: float, name: str = ""):
+    """Yield once per period on an absolute schedule (no drift); ticks missed
+    while the consumer was busy are skipped, not bunched."""
+    loop = asyncio.get_running_loop()
+    nxt = loop.time()
+    while True:
+        late = loop.time() - nxt
+        if name:
+            TICK_LATE.labels(name).observe(max(late, 0.0))
+        yield
+        nxt += period
+        now = loop.time()
+        if nxt < now:
+            nxt += math.ceil((now - nxt) / period) * period
+        await asyncio.sleep(nxt - now)
+
+# ── Actors ─────────────────────────────────────────────────────────────
+class LcdActor:
+    """Owns the LCD. show() never blocks; when several messages queue up while
+    the display is busy only the newest is written."""
+
+    def __init__(self, lcd):
+        self.lcd = lcd
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.writes = 0
+        self._gen = 0          # bumps on every write; a pending clear only applies to its own
+
+    def show(self, text: str, seconds: Optional[float] = None):
+        self.queue.put_nowait((text, seconds, None))
+
+    def clear(self):
+        self.queue.put_nowait(("", None, None))
+
+    def _write(self, text: str):
+        # I2C: a few ms per character on a PCF8574 backpack, so off the loop thread
+        self.lcd.clear()
+        if text:
+            self.lcd.write_string(text)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            # the newest show()/clear() wins; an expiry only if there is none, and
+            # only its own message's (not one that has since been replaced)
+            real = [m for m in batch if m[2] is None]
+            due = [m for m in batch if m[2] == self._gen]
+            if not real and not due:
+                continue
+            text, seconds, _ = (real or due)[-1]
+            self._gen += 1
+            await asyncio.to_thread(self._write, text)
+            self.writes += 1
+            if seconds:
+                loop.call_later(seconds, self.queue.put_nowait, ("", None, self._gen))
+
+class LedActor:
+    """Owns the LEDs (and the room light) by name."""
+
+    def __init__(self, leds: Dict[str, object]):
+        self.leds = leds
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._effects: Dict[str, asyncio.Task] = {}
+
+    def on(self, name: str, seconds: Optional[float] = None):
+        self.queue.put_nowait((name, "on", seconds))
+
+    def off(self, name: str):
+        self.queue.put_nowait((name, "off", None))
+
+    def flash(self, name: str, seconds: float):
+        self.queue.put_nowait((name, "flash", seconds))
+
+    async def run(self):
+        while True:
+            name, mode, seconds = await self.queue.get()
+            effect = self._effects.pop(name, None)
+            if effect is not None:
+                effect.cancel()
+            led = self.leds[name]
+            if mode == "off":
+                led.off()
+            elif mode == "on" and not seconds:
+                led.on()
+            else:
+                self._effects[name] = asyncio.create_task(self._effect(led, mode, seconds))
+
+    async def _effect(self, led, mode: str, seconds: float):
+        try:
+            if mode == "on":
+                led.on()
+                await asyncio.sleep(seconds)
+            else:
+                end = asyncio.get_running_loop().time() + seconds
+                while asyncio.get_running_loop().time() < end:
+                    led.on()
+                    await asyncio.sleep(FLASH_ON)
+                    led.off()
+                    await asyncio.sleep(FLASH_OFF)
+        finally:
+            led.off()
+
+# ── Runtime ────────────────────────────────────────────────────────────
+class Runtime:
+    """log_event(kind, source, detail) is called on the loop thread for every
+    event; homee_journal.Journal.append fits."""
+
+    def __init__(self, hw, log_event: Callable[[str, str, str], Any] = print_event,
+                 rfid_rate: float = RFID_RATE, range_rate: float = RANGE_RATE,
+                 presence: Optional[Presence] = None):
+        self.hw = hw
+        self.log_event = log_event
+        self.rfid_rate = rfid_rate
+        self.range_rate = range_rate
+        self.presence = presence if presence is not None else Presence()  # IN/OUT per card
+        self.light_enabled = True
+        self.detector = MotionDetector()
+        self.motion_since: Optional[float] = None
+        self.distance: Optional[float] = None  # last valid ultrasonic reading, cm
+        self.samples = {"rfid": 0, "ranging": 0}
+        self._light = None                      # room light output
+        self._light_off = None                  # TimerHandle for the LIGHT_HOLD timeout
+        self._stop: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _event(self, kind: str, source: str, detail: str = ""):
+        EVENTS.labels(kind).inc()
+        try:
+            self.log_event(kind, source, detail)
+        except Exception as e:
+            print(f"[runtime] log_event failed: {e}")
+
+    # ── Sensor tasks ───────────────────────────────────────────────────
+    async def _rfid(self, reader):
+        async for _ in every(1.0 / self.rfid_rate, "rfid"):
+            uid = await asyncio.to_thread(reader.read_uid)
+            self.samples["rfid"] += 1
+            if not uid:
+                continue
+            try:
+                result, card = self.presence.scan(uid)
+            except ValueError:
+                continue  # garbled read
+            if result == "repeat":
+                continue  # card still lying on the reader
+            if result == "unknown":
+                self.lcd.show("Access denied", CARD_SECONDS)
+                self.leds.on("red", CARD_SECONDS)
+                self._event("RFID Unknown", uid)
+                continue
+            name = f" {card.name}" if card.name else ""
+            if result == "in":
+                self.lcd.show(f"Welcome{name}"[:32], CARD_SECONDS)
+                self._event("RFID Scan IN", card.uid, card.name)
+            else:
+                self.lcd.show(f"Goodbye{name}"[:32], CARD_SECONDS)
+                self._event("RFID Scan OUT", card.uid, card.name)
+            self.leds.on("green", CARD_SECONDS)
+
+    async def _ranging(self, ranger: Ranger):
+        timeout = min(ranger.timeout, 0.8 / self.range_rate)
+        async for _ in every(1.0 / self.range_rate, "ranging"):
+            ranger.fire()
+            await asyncio.sleep(timeout)
+            ranger.expire()
+            self.samples["ranging"] += 1
+
+    def _intruder(self, m: Measurement):
+        self.lcd.show("Intruder Detected!", INTRUDER_SECONDS)
+        self.leds.flash("red", INTRUDER_SECONDS)
+        self._event("Intruder Detected", "ultrasonic", f"{m.cm:.1f} cm")
+
+    def _measurement(self, m: Measurement):
+        if m.status != "ok":
+            return
+        self.distance = m.cm
+        r = self.detector.update(m.cm)
+        if r is None or not self.detector.baseline.ready:
+            return
+        now = self._loop.time()
+        if r.motion:
+            if self.motion_since is None:
+                self.motion_since = now
+                self.leds.on("red")
+                self.leds.off("green")
+                if self.light_enabled:
+                    self.leds.on("light")
+                self._event("Motion Start", "ultrasonic", f"{r.change:.1f} cm")
+            if self._light_off is not None:
+                self._light_off.cancel()
+                self._light_off = None
+        elif self.motion_since is not None:
+            self._event("Motion End", "ultrasonic", f"{now - self.motion_since:.1f} s")
+            self.motion_since = None
+            self.leds.on("green")
+            self.leds.off("red")
+            self._light_off = self._loop.call_later(LIGHT_HOLD, self.leds.off, "light")
+
+    def _toggle_light(self):
+        self.light_enabled = not self.light_enabled
+        if not self.light_enabled:
+            self.leds.off("light")
+        elif self.motion_since is not None:
+            self.leds.on("light")
+        self._event("Light System", "button", "ON" if self.light_enabled else "OFF")
+        return self.light_enabled
+
+    # ── Lifecycle ──────────────────────────────────────────────────────
+    async def run(self):
+        loop = self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        hw = self.hw
+        leds = {name: hw.led(pin) for name, pin in LED_PINS.items()}
+        leds["light"] = hw.led(LIGHT_PIN)
+        self.lcd = LcdActor(hw.lcd())
+        self.leds = LedActor(leds)
+        self._light = leds["light"]
+        # pigpio/gpiozero callbacks run on their own threads: hop onto the loop
+        ranger = Ranger(hw.gpio(), TRIG_PIN, ECHO_PIN)
+        ranger.subscribe(lambda m: loop.call_soon_threadsafe(self._measurement, m))
+        self.alarm = IntruderAlarm(ranger, lambda m: loop.call_soon_threadsafe(self._intruder, m),
+                                   INTRUDER_LO, INTRUDER_HI)
+        button = hw.button(LIGHT_BTN)
+        button.when_pressed = lambda: loop.call_soon_threadsafe(self._toggle_light)
+        ranger.start(thread=False)
+        tasks = [asyncio.create_task(c, name=n) for n, c in (
+            ("lcd", self.lcd.run()), ("leds", self.leds.run()),
+            ("rfid", self._rfid(hw.rfid())), ("ranging", self._ranging(ranger)))]
+        self.leds.on("green")
+        stop = asyncio.create_task(self._stop.wait())
+        try:
+            done, _ = await asyncio.wait(tasks + [stop], return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t is not stop and t.exception() is not None:
+                    raise t.exception()
+        finally:
+            button.when_pressed = None
+            ranger.stop()
+            if self.motion_since is not None:
+                self._event("Motion End", "ultrasonic", f"{loop.time() - self.motion_since:.1f} s")
+            for t in tasks + [stop]:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for led in leds.values():
+                led.off()
+            self.lcd._write("")
+            self._loop = None
+
+    # ── From other threads (web app) ───────────────────────────────────
+    def status(self) -> Dict[str, Any]:
+        """Snapshot for /api/status; plain attribute reads, safe from any thread."""
+        b = self.detector.baseline
+        light = self._light
+        return {"running": self._loop is not None, "motion": self.motion_since is not None,
+                "distance_cm": self.distance,
+                "baseline_cm": b.value if b.ready else None,
+                "light_enabled": self.light_enabled,
+                "light_on": bool(light is not None and light.is_lit),
+                "inside": self.presence.count_inside()}
+
+    def toggle_light(self, timeout: float = 1.0) -> bool:
+        """Toggle the light system as the button does; returns the new state."""
+        if self._loop is None:
+            raise RuntimeError("runtime not running")
+
+        async def toggle():
+            return self._toggle_light()
+        return asyncio.run_coroutine_threadsafe(toggle(), self._loop).result(timeout)
+
+    def stop(self):
+        """Thread-safe; run() returns once everything is switched off."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+def main():
+    from homee_hw import get_backend
+    hw = get_backend()
+    rt = Runtime(hw)
+
+    async def demo():
+        # Sim only: a card in and out, someone walking up, a button press.
+        pi, t0 = hw.gpio(), time.monotonic()
+        pi.noise = 0.5
+        pi.distance = lambda: 6.0 if 8.0 < time.monotonic() - t0 < 9.0 else \
+            (60.0 if 10.0 < time.monotonic() - t0 < 12.0 else 150.0)
+        for at, step in ((1.0, lambda: hw.rfid_reader.present("A1B2C3D4")),
+                         (4.0, lambda: hw.rfid_reader.present("A1B2C3D4")),
+                         (7.0, lambda: hw.buttons[LIGHT_BTN].press()),
+                         (7.5, lambda: hw.buttons[LIGHT_BTN].press()),
+                         (20.0, rt.stop)):
+            await asyncio.sleep(t0 + at - time.monotonic())
+            step()
+
+    async def run():
+        if hw.name == "sim":
+            asyncio.get_running_loop().create_task(demo())
+        await rt.run()
+
+    t0 = time.monotonic()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        hw.close()
+    dt = time.monotonic() - t0
+    print(f"rfid {rt.samples['rfid'] / dt:.1f}/s, ranging {rt.samples['ranging'] / dt:.1f}/s "
+          f"over {dt:.1f}s")
+    if hw.name == "sim":
+        for t, text in hw.lcd_screen.history:
+            print(f"  lcd +{t - t0:5.2f}s {text!r}")
+
+if __name__ == "__main__":
+    main()
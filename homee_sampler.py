@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# HOMEe: DHT11 sampling daemon
+# One thread owns the sensor and reads it on a rate-limited schedule (the DHT11
+# manages about one read per second). The latest valid sample is cached with its
+# age; callers either take the cached sample when it is fresh enough or ask for
+# an early read and wait for it. Subscribers (e.g. the LED band logic) are called
+# with every new sample.
+#
+# Other processes don't open the sensor: homee_reader publishes each sample to a
+# small file in /dev/shm (SampleWriter) and e.g. homee_bands runs its Sampler on
+# SharedSample.read, which reads that file instead of the DHT11.
+
+import hashlib, json, os, threading, time
+from typing import Callable, List, NamedTuple, Optional, Tuple
+import homee_metrics as metrics
+
+INTERVAL = 2.0   # seconds between scheduled reads
+MIN_GAP  = 1.1   # never read the sensor more often than this
+
+READ_SECONDS = metrics.histogram("homee_sensor_read_seconds", "Duration of one raw DHT11 read")
+READS = metrics.counter("homee_sensor_reads_total", "DHT11 reads by result", ["result"])
+WAIT_SECONDS = metrics.histogram("homee_sensor_wait_seconds",
+                                 "Time a caller waited for a sample (0 when cached)")
+RETRIES = metrics.counter("homee_sensor_retries_total",
+                          "Failed reads that a waiting caller had to sit through")
+
+class Sample(NamedTuple):
+    temp_c: float
+    humidity: float
+    ts: float      # wall-clock time of the read (epoch seconds)
+    mono: float    # time.monotonic() of the read
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.mono
+
+def parse_dht(r) -> Optional[Tuple[float, float]]:
+    """pigpio_dht returns a dict (or a tuple on some versions); → (temp_c, humidity)."""
+    if isinstance(r, dict):
+        if r.get("valid", True):
+            c = r.get("temp_c") or r.get("temperature")
+            h = r.get("humidity")
+            if c is not None and h is not None:
+                return float(c), float(h)
+    elif isinstance(r, tuple):
+        nums = [v for v in r if isinstance(v, (int, float))]
+        if len(nums) >= 2:
+            a, b = float(nums[-2]), float(nums[-1])
+            if 0 <= a <= 80 and 0 <= b <= 100: return a, b
+            if 0 <= b <= 80 and 0 <= a <= 100: return b, a
+    return None
+
+class Sampler:
+    """`read_once()` does one raw sensor read; its result goes through parse_dht."""
+
+    def __init__(self, read_once: Callable[[], object],
+                 interval: float = INTERVAL, min_gap: float = MIN_GAP):
+        self.read_once = read_once
+        self.interval = interval
+        self.min_gap = min_gap
+        self.reads = 0
+        self.failures = 0
+        self.last_error: Optional[Exception] = None
+        self._cv = threading.Condition()
+        self._latest: Optional[Sample] = None
+        self._demand = False  # a get() is waiting for a read newer than _latest
+        self._stopped = False
+        self._subs: List[Callable[[Sample], None]] = []
+        self._thread = threading.Thread(target=self._run, name="homee-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        with self._cv:
+            self._stopped = True
+            self._cv.notify_all()
+        self._thread.join(timeout)
+
+    def subscribe(self, fn: Callable[[Sample], None]):
+        self._subs.append(fn)
+
+    def latest(self, max_age: Optional[float] = None) -> Optional[Sample]:
+        s = self._latest
+        if s is None or (max_age is not None and s.age > max_age):
+            return None
+        return s
+
+    def get(self, max_age: float, timeout: float) -> Optional[Sample]:
+        """Cached sample if younger than `max_age`, else wait up to `timeout` for a new one."""
+        t0 = time.monotonic()
+        deadline = t0 + timeout
+        with self._cv:
+            s = self.latest(max_age)
+            if s is not None:
+                WAIT_SECONDS.observe(0)
+                return s
+            seen = self._latest
+            failures = self.failures
+            self._demand = True  # pull the next read forward
+            self._cv.notify_all()
+            try:
+                while not self._stopped:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        return None
+                    self._cv.wait(left)
+                    if self._latest is not seen:
+                        return self._latest
+            finally:
+                RETRIES.inc(self.failures - failures)
+                WAIT_SECONDS.observe(time.monotonic() - t0)
+        return None
+
+    # ── Scheduler ──────────────────────────────────────────────────────
+    def _run(self):
+        last = -self.min_gap
+        while True:
+            with self._cv:
+                while not self._stopped:
+                    now = time.monotonic()
+                    due = last + (self.min_gap if self._demand else self.interval)
+                    if now >= due:
+                        break
+                    self._cv.wait(due - now)
+                if self._stopped:
+                    return
+            last = time.monotonic()
+            sample = self._read()
+            if sample is None:
+                continue  # waiters keep the next attempt at min_gap
+            with self._cv:
+                self._latest = sample
+                self._demand = False  # everyone waiting now has a fresh sample
+                self._cv.notify_all()
+            for fn in list(self._subs):
+                try:
+                    fn(sample)
+                except Exception as e:
+                    print(f"[sampler] subscriber failed: {e}")
+
+    def _read(self) -> Optional[Sample]:
+        self.reads += 1
+        t0 = time.perf_counter()
+        result = "ok"
+        try:
+            parsed = parse_dht(self.read_once())
+        except Exception as e:
+            parsed, self.last_error, result = None, e, "error"
+        READ_SECONDS.observe(time.perf_counter() - t0)
+        if parsed is None:
+            self.failures += 1
+            READS.labels("invalid" if result == "ok" else result).inc()
+            return None
+        READS.labels(result).inc()
+        return Sample(parsed[0], parsed[1], time.time(), time.monotonic())
+
+# ── Sharing samples with other processes ───────────────────────────────
+SHARED_MAX_AGE = 10.0  # a published sample older than this counts as a failed read
+
+def sample_path(homee_dir: str) -> str:
+    """Where the sampler of the reader using `homee_dir` publishes (tmpfs when there is one)."""
+    if not os.path.isdir("/dev/shm"):
+        return os.path.join(homee_dir, "homee_sample.json")
+    tag = hashlib.blake2b(os.path.abspath(homee_dir).encode(), digest_size=4).hexdigest()
+    return f"/dev/shm/homee-sample-{tag}.json"
+
+class SampleWriter:
+    """Sampler subscriber: replaces `path` with each new sample."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, s: Sample):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"temp_c": s.temp_c, "humidity": s.humidity, "ts": s.ts}, f)
+        os.replace(tmp, self.path)  # readers see the old sample or the new one
+
+class SharedSample:
+    """A Sampler's read_once() over another process's SampleWriter file."""
+
+    def __init__(self, path: str, max_age: float = SHARED_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+
+    def read(self) -> dict:
+        with open(self.path) as f:
+            d = json.load(f)
+        age = time.time() - d["ts"]
+        if age > self.max_age:
+            raise RuntimeError(f"shared sample is {age:.0f} s old (is homee_reader running?)")
+        return {"valid": True, "temp_c": d["temp_c"], "humidity": d["humidity"]}
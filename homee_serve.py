@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# HOMEe: production server – several web workers over one shared snapshot
+# `python3 homee_app.py` is Flask's single-process development server. This runs
+# the same app in --workers processes (default: one per core), each a threaded
+# WSGI server on one listening socket that the master opened, so /data is not
+# limited to one interpreter's GIL.
+#
+# The workers don't each tail the CSV, decode the ring and run alert engines:
+# the master is the one feeder. It follows this device's ring (the CSV while
+# the ring is short) on file-change events and the DB for other devices' rows,
+# runs the AlertEngine, and publishes the recent readings – JSON-encoded once –
+# with the trends and alerts to a homee_shared snapshot in /dev/shm. Workers
+# (create_app with SHARED_CACHE) answer /data, /alerts and /data/latest from it
+# without locks, and only copy it when a new generation is published; disk
+# reads don't grow with the worker count. Range queries, /data/aggregate and
+# /stream still read their own stores per worker. Dead workers are restarted.
+#
+#   python3 homee_serve.py --port 5000 --workers 4
+#
+# Under another WSGI server, run only the feeder and point the app at its file:
+#   python3 homee_serve.py --feeder-only --shared /dev/shm/homee.shm
+#   gunicorn -w 4 -b 0.0.0.0:5000 'homee_app:create_app({"SHARED_CACHE": "/dev/shm/homee.shm"})'
+# The workers may start first and the feeder may be restarted under them: the
+# feeder leaves its file in place and takes it over again, and workers map
+# whatever file is at the path (an empty snapshot until there is one).
+#
+# The feeder also sets up the DB (schema, migration) before any worker starts.
+# Workers write their /submit rows themselves, one transaction per request,
+# with no writer thread of their own (see homee_db).
+
+import argparse, os, signal, socket, subprocess, sys, threading, time
+from typing import Any, Dict, Optional
+from homee_app import default_config
+from homee_http import dumps
+
+POLL = 1.0        # s: the DB (other devices) is polled; the CSV also wakes the feeder
+RESTART = 1.0     # s between checks for dead workers
+DB_BATCH = 5000   # DB rows read per poll (beyond that, the alerts skip ahead)
+
+def default_path(device: str, port: int) -> str:
+    if os.path.isdir("/dev/shm"):
+        return f"/dev/shm/homee-{device}-{port}.shm"
+    return os.path.join(default_config()["HOMEE_DIR"], f"homee-{port}.shm")
+
+# ── Feeder (the one writer) ────────────────────────────────────────────
+class Feeder:
+    def __init__(self, cfg: Dict[str, Any], path: str):
+        from homee_alerts import AlertEngine
+        from homee_db import ReadingDB
+        from homee_recent import RecentBuffer
+        from homee_shared import SharedRecent
+        from homee_tail import TailReader
+        self.cfg = cfg
+        self.device = cfg["DEVICE_ID"]
+        cap = cfg["MAX_HISTORY"]
+        os.makedirs(cfg["HOMEE_DIR"], exist_ok=True)
+        self.shared = SharedRecent(path, cap, writable=True)
+        self.recent = RecentBuffer(cap)
+        self.alerts = AlertEngine()
+        self.tail = TailReader(cfg["LOG_FILE"], cap)
+        self.db = ReadingDB(cfg["DB_FILE"])  # schema and migration here, once; then reads only
+        self.ring = None
+        self._seen: set = set()             # devices with readings (trends are published for them)
+        self._db_seq: Optional[int] = None  # newest DB arrival number fed to the alerts
+        self._ring_seen = 0                 # ring.count when the ring was last read
+        self.epoch = os.urandom(8).hex()    # qualifies the buffer's arrival numbers in cursors
+        self._encoded: Dict[int, tuple] = {}  # id(row) → (row, its JSON), for kept rows
+        self.publishes = 0
+
+    def close(self):
+        for store in (self.db, self.ring, self.shared):
+            if store is not None:
+                store.close()
+
+    def _open_ring(self):
+        path = self.cfg["RING_FILE"]
+        if self.ring is None and os.path.exists(path):
+            from homee_ring import RingStore
+            try:
+                self.ring = RingStore(path)
+            except (OSError, ValueError) as e:
+                print(f"[Serve] Cannot open {path}: {e}")
+        return self.ring
+
+    def _local(self) -> bool:
+        """New readings of this device, from the ring (or the CSV while the ring is short)."""
+        cap, newest = self.recent.capacity, self.recent.newest_ts()
+        ring = self._open_ring()
+        if ring is not None and ring.count >= cap:
+            n = ring.count
+            if n == self._ring_seen:
+                return False  # the header's record count only: no file I/O
+            rows = ring.tail(min(cap, n - self._ring_seen if n > self._ring_seen else n))
+            self._ring_seen = n
+        else:
+            rows = self.tail.read(cap)  # parses only what was appended
+        # >=: a second reading in the newest second is new too; add() skips repeats
+        rows = [r for r in rows if r["timestamp"] >= newest]
+        for r in rows:
+            self.alerts.update(r, self.device)
+        return self.recent.add(rows) > 0
+
+    def _devices(self) -> bool:
+        """Whether the DB has rows written since the last call (/data/latest reads
+        it), followed by its arrival numbers. Other devices' new rows go to the
+        alerts; this device's, to the recent buffer when the ring missed them
+        (what /submit does for the single-process app)."""
+        cap = self.recent.capacity
+        if self._db_seq is None:  # first call: each device's newest, to warm the alerts
+            seq = self.db.seq()
+            rows = [r for dev in self.db.devices() for r in self.db.tail(dev, cap)]
+        else:
+            rows, seq = self.db.since(None, self._db_seq, DB_BATCH)
+            if seq == self._db_seq:
+                return False
+        self._db_seq = seq
+        newest = self.recent.newest_ts()
+        mine = []
+        for row in sorted(rows, key=lambda r: r["timestamp"]):
+            dev = row["device_id"]
+            self._seen.add(dev)
+            if dev == self.device:
+                if row["timestamp"] < newest:
+                    continue  # older than the buffer's newest: the ring had it
+                mine.append(row)
+            self.alerts.update(row, dev)
+        self.recent.add(mine)
+        return True
+
+    def refresh(self, force: bool = False) -> bool:
+        changed = self._local()
+        changed = self._devices() or changed
+        if changed or force:
+            self.publish()
+        return changed
+
+    def publish(self):
+        seq = self.recent.seq  # before the rows: one added meanwhile is handed out again
+        entries = self.recent.entries(self.recent.capacity)
+        old, enc = self._encoded, {}
+        for _, r in entries:  # only new rows are encoded
+            hit = old.get(id(r))
+            enc[id(r)] = hit if hit is not None and hit[0] is r else (r, dumps(r))
+        self._encoded = enc
+        devices = set(self._seen) | {self.device}
+        events, cursor = self.alerts.events(0)
+        doc = {"epoch": self.epoch, "seq": seq,
+               "trend": {d: self.alerts.trend(d) for d in sorted(devices)},
+               "alerts": {"active": self.alerts.active(), "events": events, "cursor": cursor}}
+        extra = dumps(doc)
+        while len(extra) > self.shared.extra_size and doc["alerts"]["events"]:
+            doc["alerts"]["events"] = events = events[:len(events) // 2]  # keep the newest
+            extra = dumps(doc)
+        self.shared.publish([(r["timestamp"], n, enc[id(r)][1]) for n, r in entries], extra)
+        self.publishes += 1
+
+    def run(self, stop: threading.Event):
+        """Refresh on every CSV change (homee_reader writes the ring with it) and every POLL s."""
+        from homee_watch import FileWatcher
+        wake = threading.Event()
+        watcher = FileWatcher(self.cfg["LOG_FILE"], wake.set).start()
+        stop_wake = lambda: (stop.wait(), wake.set())
+        threading.Thread(target=stop_wake, daemon=True).start()
+        try:
+            while not stop.is_set():
+                wake.wait(POLL)
+                wake.clear()
+                try:
+                    self.refresh()
+                except Exception as e:  # keep publishing; the workers serve the last snapshot
+                    print(f"[Serve] Feeder error: {e}")
+        finally:
+            watcher.stop()
+
+# ── Workers ────────────────────────────────────────────────────────────
+def worker(fd: int, host: str, port: int, path: str):
+    import logging
+    from werkzeug.serving import make_server
+    from homee_app import create_app
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no per-request log lines
+    app = create_app({"SHARED_CACHE": path})
+    server = make_server(host, port, app, threaded=True, fd=fd)
+    parent = os.getppid()
+    def orphaned():  # the master went away without stopping us
+        while os.getppid() == parent:
+            time.sleep(RESTART)
+        os._exit(0)
+    threading.Thread(target=orphaned, daemon=True).start()
+    server.serve_forever()
+
+def _spawn(sock: socket.socket, host: str, port: int, path: str) -> subprocess.Popen:
+    fd = sock.fileno()
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker",
+                             "--fd", str(fd), "--host", host, "--port", str(port),
+                             "--shared", path], pass_fds=(fd,))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="HOMEe production server (workers + shared snapshot)")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=5000)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--shared", metavar="PATH", help="snapshot file (default: in /dev/shm)")
+    ap.add_argument("--feeder-only", action="store_true",
+                    help="only publish the snapshot, for workers of another WSGI server")
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--fd", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.worker:
+        return worker(args.fd, args.host, args.port, args.shared)
+
+    cfg = default_config()
+    path = args.shared or default_path(cfg["DEVICE_ID"], args.port)
+    feeder = Feeder(cfg, path)
+    feeder.refresh(force=True)  # a snapshot exists before any worker reads it
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    feed = threading.Thread(target=feeder.run, args=(stop,), name="homee-feeder", daemon=True)
+    feed.start()
+
+    sock, procs = None, []
+    try:
+        if args.feeder_only:
+            print(f"[Serve] Publishing {path}")
+        else:
+            sock = socket.create_server((args.host, args.port), backlog=128)
+            sock.set_inheritable(True)
+            procs = [_spawn(sock, args.host, args.port, path) for _ in range(max(1, args.workers))]
+            print(f"[Serve] {len(procs)} workers on {args.host}:{args.port}, snapshot {path}")
+        while not stop.wait(RESTART):
+            for i, p in enumerate(procs):
+                if p.poll() is not None:
+                    print(f"[Serve] Worker {p.pid} exited ({p.returncode}), restarting")
+                    procs[i] = _spawn(sock, args.host, args.port, path)
+    finally:
+        stop.set()
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(5)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        if sock is not None:
+            sock.close()
+        feed.join(5)
+        feeder.close()
+        if not args.feeder_only:  # otherwise the other server's workers still read it
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# HOMEe: shared-memory snapshot of the recent readings, for multi-worker serving
+# One process writes (the feeder in homee_serve); every web worker maps the same
+# file read-only and answers /data from it, so N workers don't mean N tail
+# reads, N ring decodes or N alert engines. The snapshot holds the newest
+# readings already JSON-encoded (one byte string per row, oldest first, with
+# their timestamps and the feeder's arrival numbers for ?since=) plus one JSON
+# "extra" document (trends, alerts).
+#
+# Readers take no lock. publish() is a seqlock: the sequence number is odd while
+# the writer is inside, and a reader copies the payload between two reads of it,
+# retrying if it changed or was odd. A CRC of the payload is checked as well, so
+# a copy torn by reordered stores (weakly ordered CPUs, e.g. the Pi's ARM) is
+# retried rather than served. Readers copy once per new generation and keep
+# the decoded snapshot until the next one. They also follow the path (checked
+# every REOPEN_CHECK), so workers outlive a feeder restart or start before it.
+#
+# Layout: header, then `capacity` index entries (timestamp, arrival number, end
+# offset of the row), then the row bytes area, then the extra area.
+
+import json, mmap, os, struct, threading, time, zlib
+from typing import List, Optional, Tuple
+
+MAGIC = b"HOMEESHM"
+VERSION = 2
+HEADER = struct.Struct("<8sIIQIIIIId")  # magic version capacity seq count rows_len
+                                        # extra_len rows_size extra_size changed
+_SEQ = struct.Struct("<Q")
+_SEQ_AT = 16
+INDEX = struct.Struct("<qQI")           # timestamp, arrival number, end offset in the rows area
+ROW_BYTES = 512                         # room per row (a /data row is ~250 bytes)
+EXTRA_SIZE = 256 * 1024
+RETRIES = 1000
+REOPEN_CHECK = 1.0                      # s between a reader's checks for a new file
+
+class Snapshot:
+    """One consistent copy: rows (JSON bytes, oldest first), their timestamps, the extra JSON."""
+    __slots__ = ("generation", "ts", "seqs", "rows", "extra", "changed", "_doc")
+
+    def __init__(self, generation: int, ts: List[int], seqs: List[int], rows: List[bytes],
+                 extra: bytes, changed: float):
+        self.generation = generation
+        self.ts = ts
+        self.seqs = seqs         # arrival number of each row (RecentBuffer.seq)
+        self.rows = rows
+        self.extra = extra
+        self.changed = changed   # wall time of the publish (Last-Modified)
+        self._doc = None
+
+    @property
+    def doc(self) -> dict:
+        """The extra document, decoded on first use."""
+        if self._doc is None:
+            self._doc = json.loads(self.extra)
+        return self._doc
+
+    def tail(self, limit: int) -> List[bytes]:
+        return self.rows[-limit:] if limit > 0 else []
+
+    def since(self, seq: int, limit: int) -> List[bytes]:
+        """Rows that arrived after `seq`, at most the newest `limit`, oldest first
+        (as RecentBuffer.since)."""
+        if limit <= 0:
+            return []
+        return [r for r, n in zip(self.rows, self.seqs) if n > seq][-limit:]
+
+class _Mapping:
+    """One open snapshot file: its mmap, layout and inode."""
+    __slots__ = ("f", "mm", "ino", "capacity", "rows_size", "extra_size",
+                 "rows_at", "extra_at", "crc_at")
+
+    def __init__(self, path: str, writable: bool):
+        self.f = open(path, "r+b" if writable else "rb")
+        try:
+            self.mm = mmap.mmap(self.f.fileno(), 0,
+                                access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        except Exception:
+            self.f.close()
+            raise
+        self.ino = os.fstat(self.f.fileno()).st_ino
+        magic, version, cap, _, _, _, _, rows_size, extra, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path}: not a HOMEe shared snapshot (v{VERSION})")
+        self.capacity, self.rows_size, self.extra_size = cap, rows_size, extra
+        self.rows_at = HEADER.size + cap * INDEX.size
+        self.extra_at = self.rows_at + rows_size
+        self.crc_at = self.extra_at + extra
+
+    def close(self):
+        self.mm.close()
+        self.f.close()
+
+class SharedRecent:
+    """Open the snapshot file at `path`; writable=True creates it (or takes over a
+    compatible one, so readers keep their mapping across feeder restarts).
+
+    A reader follows the file: every REOPEN_CHECK seconds it stats `path` and
+    maps the new file if the inode changed. Until a file appears (workers started
+    before the feeder) it serves an empty snapshot, and while the file is gone
+    (the feeder restarting) the last one it read."""
+
+    def __init__(self, path: str, capacity: int = 500, writable: bool = False,
+                 extra_size: int = EXTRA_SIZE):
+        self.path = path
+        self.writable = writable
+        self._m: Optional[_Mapping] = None
+        self._snap: Optional[Tuple[_Mapping, Snapshot]] = None
+        self._lock = threading.Lock()   # one reopen at a time
+        self._checked = 0.0             # monotonic time of the last stat
+        if writable:
+            _prepare(path, capacity, capacity * ROW_BYTES, extra_size)
+            self._use(_Mapping(path, True))
+        else:
+            self.capacity = capacity
+            self.rows_size, self.extra_size = capacity * ROW_BYTES, extra_size
+            self._follow()
+
+    def _use(self, m: _Mapping):
+        self._m = m
+        self.capacity, self.rows_size, self.extra_size = m.capacity, m.rows_size, m.extra_size
+
+    def _follow(self):
+        """Map the file at `path` if it isn't the one mapped (throttled)."""
+        now = time.monotonic()
+        if now - self._checked < REOPEN_CHECK or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked = now
+            try:
+                ino = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                return  # not (or no longer) there: keep what we have
+            if self._m is not None and ino == self._m.ino:
+                return
+            try:
+                m = _Mapping(self.path, False)
+            except (OSError, ValueError) as e:
+                print(f"[Shared] Cannot open {self.path}: {e}")
+                return
+            # the old mapping is left to the garbage collector: requests that are
+            # copying from it right now still hold a reference
+            self._use(m)
+        finally:
+            self._lock.release()
+
+    def close(self):
+        if self._m is not None:
+            self._m.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def seq(self) -> int:
+        return _SEQ.unpack_from(self._m.mm, _SEQ_AT)[0]
+
+    # ── Writer ─────────────────────────────────────────────────────────
+    def publish(self, rows: List[Tuple[int, int, bytes]], extra: bytes = b"{}"):
+        """Replace the snapshot: (timestamp, arrival number, JSON bytes) rows, oldest first, and
+        the extra document. Rows that don't fit are dropped, oldest first."""
+        m = self._m
+        rows = rows[-m.capacity:]
+        total = sum(len(b) for _, _, b in rows)
+        while rows and total > m.rows_size:
+            total -= len(rows[0][2])
+            rows = rows[1:]
+        if len(extra) > m.extra_size:
+            raise ValueError(f"extra document is {len(extra)} bytes, room for {m.extra_size}")
+        mm, seq = m.mm, self.seq
+        _SEQ.pack_into(mm, _SEQ_AT, seq + 1)  # odd: readers keep out
+        off = 0
+        for i, (ts, n, body) in enumerate(rows):
+            mm[m.rows_at + off:m.rows_at + off + len(body)] = body
+            off += len(body)
+            INDEX.pack_into(mm, HEADER.size + i * INDEX.size, ts, n, off)
+        mm[m.extra_at:m.extra_at + len(extra)] = extra
+        crc = zlib.crc32(mm[HEADER.size:HEADER.size + len(rows) * INDEX.size])
+        crc = zlib.crc32(mm[m.rows_at:m.rows_at + off], crc)
+        crc = zlib.crc32(extra, crc)
+        HEADER.pack_into(mm, 0, MAGIC, VERSION, m.capacity, seq + 1, len(rows), off,
+                         len(extra), m.rows_size, m.extra_size, time.time())
+        struct.pack_into("<I", mm, m.crc_at, crc)
+        _SEQ.pack_into(mm, _SEQ_AT, seq + 2)  # even again: published
+
+    # ── Readers ────────────────────────────────────────────────────────
+    def snapshot(self) -> Snapshot:
+        """The current snapshot; copied only when the writer has published since."""
+        if not self.writable:
+            self._follow()
+        m, cached = self._m, self._snap
+        if m is None:
+            return _EMPTY
+        mm = m.mm
+        if cached is not None and cached[0] is m:
+            snap, seq = cached[1], _SEQ.unpack_from(mm, _SEQ_AT)[0]
+            if snap.generation == seq // 2 and not seq & 1:
+                return snap
+        for _ in range(RETRIES):
+            s1 = _SEQ.unpack_from(mm, _SEQ_AT)[0]
+            if s1 & 1:
+                time.sleep(0)
+                continue
+            _, _, _, _, count, rows_len, extra_len, _, _, changed = HEADER.unpack_from(mm, 0)
+            index = mm[HEADER.size:HEADER.size + count * INDEX.size]
+            body = mm[m.rows_at:m.rows_at + rows_len]
+            extra = mm[m.extra_at:m.extra_at + extra_len]
+            crc = struct.unpack_from("<I", mm, m.crc_at)[0]
+            if (_SEQ.unpack_from(mm, _SEQ_AT)[0] != s1
+                    or zlib.crc32(extra, zlib.crc32(body, zlib.crc32(index))) != crc):
+                continue
+            ts, seqs, rows, start = [], [], [], 0
+            for t, n, end in INDEX.iter_unpack(index):
+                ts.append(t)
+                seqs.append(n)
+                rows.append(body[start:end])
+                start = end
+            snap = Snapshot(s1 // 2, ts, seqs, rows, extra, changed)
+            self._snap = (m, snap)
+            return snap
+        raise RuntimeError(f"{self.path}: no consistent snapshot after {RETRIES} tries")
+
+_EMPTY = Snapshot(0, [], [], [], b"{}", 0.0)  # no file yet
+
+def _prepare(path: str, capacity: int, rows_size: int, extra_size: int):
+    """Keep a snapshot file with this layout in place (a restarted feeder goes on
+    from its generation); otherwise write a fresh, empty one (generation 0),
+    renamed into place."""
+    try:
+        with open(path, "r+b") as f:
+            head = f.read(HEADER.size)
+            magic, version, cap, seq, _, _, _, rsize, esize, _ = HEADER.unpack(head)
+            size = os.fstat(f.fileno()).st_size
+            if (magic, version, cap, rsize, esize) == (MAGIC, VERSION, capacity, rows_size,
+                                                       extra_size) and \
+                    size == HEADER.size + capacity * INDEX.size + rows_size + extra_size + 4:
+                if seq & 1:  # the last feeder died inside publish(); the next one overwrites it
+                    f.seek(_SEQ_AT)
+                    f.write(_SEQ.pack(seq + 1))
+                return
+    except (OSError, struct.error):
+        pass
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, capacity, 0, 0, 0, 2, rows_size, extra_size,
+                            time.time()))
+        f.write(bytes(capacity * INDEX.size + rows_size))
+        f.write(b"{}" + bytes(extra_size - 2))
+        f.write(struct.pack("<I", zlib.crc32(b"{}", zlib.crc32(b"", zlib.crc32(b"")))))
+    os.replace(tmp, path)
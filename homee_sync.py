@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# HOMEe: incremental, debounced cloud sync of the reading log
+# Instead of re-uploading the whole CSV on every press, the bytes appended since
+# the last successful upload are sealed into a standalone segment file
+# (header + new rows) and only that segment is uploaded. Bursts of readings
+# within WINDOW seconds are coalesced into one segment. Progress is kept in a
+# small JSON state file, so a restart resumes exactly where it stopped and an
+# interrupted upload is retried with the same segment.
+
+import json, os, subprocess, threading, time
+from typing import List, Optional
+import homee_metrics as metrics
+
+WINDOW = 30.0       # seconds to wait for more readings before uploading
+RETRY_DELAY = 60.0  # seconds before retrying a failed upload
+UPLOAD_TIMEOUT = 120
+
+UPLOAD_SECONDS = metrics.histogram("homee_upload_seconds", "Uploader subprocess duration")
+UPLOADS = metrics.counter("homee_uploads_total", "Segment uploads by result", ["result"])
+UPLOAD_BYTES = metrics.counter("homee_upload_bytes_total", "Bytes of segments uploaded")
+
+class CloudSync:
+    """`command` is the uploader argv with {src} and {dst} placeholders, e.g.
+    ["/bin/bash", "dropbox_uploader.sh", "upload", "{src}", "{dst}"]."""
+
+    def __init__(self, path: str, command: List[str], state_path: str,
+                 segment_dir: str, remote_dir: str = "/homee_segments",
+                 window: float = WINDOW):
+        self.path = path
+        self.command = command
+        self.state_path = state_path
+        self.segment_dir = segment_dir
+        self.remote_dir = remote_dir.rstrip("/")
+        self.window = window
+        self._lock = threading.Lock()  # one seal/upload at a time
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="homee-sync", daemon=True)
+        self._state = self._load()
+
+    def start(self):
+        self._thread.start()
+        if self._state.get("pending"):
+            self._wake.set()  # finish the upload interrupted by the last shutdown
+        return self
+
+    def stop(self, flush: bool = True, timeout: float = UPLOAD_TIMEOUT):
+        """Stop the worker; with flush=True, upload anything still pending first."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        if flush:
+            self.sync_now()
+
+    def notify(self):
+        """A reading was appended. Cheap; safe to call from any thread."""
+        self._wake.set()
+
+    # ── Worker ─────────────────────────────────────────────────────────
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            if self._stop.is_set():
+                return
+            self._stop.wait(self.window)  # coalesce the burst
+            self._wake.clear()
+            if not self.sync_now() and not self._stop.wait(RETRY_DELAY):
+                self._wake.set()
+
+    def sync_now(self) -> bool:
+        """Seal and upload new bytes. Returns False if an upload failed."""
+        with self._lock:
+            try:
+                if not self._state.get("pending"):
+                    self._seal()
+                if self._state.get("pending"):
+                    self._upload()
+                return True
+            except Exception as e:
+                print(f"[Sync] Upload failed: {e}")
+                return False
+
+    def _seal(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        s = self._state
+        if st.st_ino != s.get("ino") or st.st_size < s.get("offset", 0):
+            s.update(ino=st.st_ino, offset=0)  # new or replaced log: start over
+        with open(self.path, "rb") as f:
+            header = f.readline()
+            if not header.endswith(b"\n"):
+                return
+            start = max(s["offset"], len(header))
+            f.seek(start)
+            data = f.read(st.st_size - start)
+        end = data.rfind(b"\n") + 1  # never seal a half-written row
+        if not end:
+            return
+        os.makedirs(self.segment_dir, exist_ok=True)
+        name = f"homee_readings.{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.{start}.csv"
+        seg = os.path.join(self.segment_dir, name)
+        with open(seg + ".tmp", "wb") as f:
+            f.write(header)
+            f.write(data[:end])
+        os.replace(seg + ".tmp", seg)
+        s.update(pending=name, pending_end=start + end)
+        self._save()
+
+    def _upload(self):
+        s = self._state
+        src = os.path.join(self.segment_dir, s["pending"])
+        dst = f"{self.remote_dir}/{s['pending']}"
+        argv = [a.format(src=src, dst=dst) for a in self.command]
+        t0 = time.monotonic()
+        try:
+            subprocess.run(argv, check=True, timeout=UPLOAD_TIMEOUT,
+                           stdout=subprocess.DEVNULL)
+        except Exception:
+            UPLOADS.labels("failed").inc()
+            raise
+        finally:
+            UPLOAD_SECONDS.observe(time.monotonic() - t0)
+        UPLOADS.labels("ok").inc()
+        UPLOAD_BYTES.inc(os.path.getsize(src))
+        print(f"[Sync] Uploaded {s['pending']} in {time.monotonic() - t0:.1f}s")
+        s.update(offset=s.pop("pending_end"), pending=None)
+        self._save()
+        try:
+            os.remove(src)
+        except FileNotFoundError:
+            pass
+
+    # ── State ──────────────────────────────────────────────────────────
+    def _load(self) -> dict:
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"ino": None, "offset": 0, "pending": None}
+
+    def _save(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.state_path)
+
+    @property
+    def uploaded_offset(self) -> int:
+        return self._state.get("offset", 0)
+
+    @property
+    def pending(self) -> Optional[str]:
+        return self._state.get("pending")
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# HOMEe: synthetic reading history at production scale
+# Writes a HOMEE_DIR that looks like years of homee_reader output – the CSV,
+# the ring of recent readings and optionally the day partitions – so the tail
+# reader, /data, rollups and range queries can be tried on real volumes
+# (10³ … 10⁸ rows) without waiting for a Pi to log them:
+#   temperature – indoor seasonal drift, a daily cycle (warmest mid-afternoon),
+#                 "weather" (a random walk pulled back to normal over ~1.5 days)
+#                 and sensor noise
+#   humidity    – its own seasonal curve and weather, dipping as the room warms
+#   dropouts    – single missed reads (--miss) and outages with the sensor or
+#                 the Pi off (one every --outage-days, --outage-hours long, on
+#                 average); both just leave a gap, as on the Pi
+# Band columns come from the homee_classify table, so every row says what
+# homee_reader would have logged for it. Output is deterministic per --seed and
+# the newest row lands at --end (default: now).
+#
+#   python3 homee_synth.py --rows 1e6 --dir /tmp/homee-big [--interval 60] [--partitions]
+#
+# The CSV is written at ~80k rows/s on a small single-core VM (10⁸ rows ≈ 20 min,
+# ~10 GB); --partitions goes through PartitionedLog row by row and is several
+# times slower.
+
+import argparse, csv, io, math, os, random, shutil, sys, time
+from collections import deque
+from typing import Iterator, List, Optional, Tuple
+from homee_classify import HUMIDITY, TEMP, Band
+from homee_reader import CSV_HEADER
+
+INTERVAL = 60.0       # s between readings
+MISS = 0.01           # share of readings lost to a failed read
+OUTAGE_DAYS = 30.0    # mean days between outages
+OUTAGE_HOURS = 6.0    # mean outage length
+DAY = 86400
+YEAR = 365.2425 * DAY
+
+# Indoor climate (°C, %RH): mean, seasonal and daily amplitude, weather spread
+TEMP_MEAN, TEMP_SEASON, TEMP_DAILY, TEMP_WEATHER, TEMP_NOISE = 21.5, 2.5, 1.8, 1.6, 0.3
+HUM_MEAN, HUM_SEASON, HUM_DAILY, HUM_WEATHER, HUM_NOISE = 47.0, 7.0, 3.0, 7.0, 1.0
+WEATHER_DAYS = 1.5    # how long a warm/humid spell lasts (mean reversion time)
+WEATHER_STEP = 600    # s; the weather moves on at most this often
+
+# ── Model ──────────────────────────────────────────────────────────────
+class Model:
+    """Room climate; step(t) gives (temp_c, humidity) at epoch t. Calls must
+    come in time order: the weather carries over from one reading to the next."""
+
+    def __init__(self, seed: int = 1, utc_offset: float = 0.0):
+        self.rng = random.Random(f"model-{seed}")
+        self.offset = utc_offset * 3600
+        self.t = None  # time of the last weather update
+        self.wt = self.rng.gauss(0, TEMP_WEATHER)
+        self.wh = self.rng.gauss(0, HUM_WEATHER)
+        # sensor noise comes from a table (gauss() per reading was most of the
+        # cost), the daily cycle per minute, the season per day
+        self._normal = [self.rng.gauss(0, 1) for _ in range(4096)]
+        self._daily = [math.sin(2 * math.pi * (m / 1440 - 10 / 24)) for m in range(1440)]  # peaks 16:00
+        self._day, self._season = None, 0.0
+
+    def _weather(self, t: float):
+        # Ornstein–Uhlenbeck, exact for any gap: decay towards 0, keep the spread
+        decay = math.exp(-(t - self.t) / (WEATHER_DAYS * DAY))
+        kick = math.sqrt(1 - decay * decay)
+        self.wt = self.wt * decay + kick * self.rng.gauss(0, TEMP_WEATHER)
+        self.wh = self.wh * decay + kick * self.rng.gauss(0, HUM_WEATHER)
+        self.t = t
+
+    def step(self, t: float) -> Tuple[float, float]:
+        if self.t is None:
+            self.t = t
+        elif t - self.t >= WEATHER_STEP:
+            self._weather(t)
+        local = t + self.offset
+        day, sec = divmod(local, DAY)
+        if day != self._day:
+            self._day = day
+            self._season = math.sin(2 * math.pi * ((local % YEAR) / YEAR - 0.31))  # peaks late July
+        season, daily = self._season, self._daily[int(sec) // 60]
+        noise, bits = self._normal, self.rng.getrandbits
+        temp = TEMP_MEAN + TEMP_SEASON * season + TEMP_DAILY * daily + self.wt \
+               + TEMP_NOISE * noise[bits(12)]
+        hum = HUM_MEAN + HUM_SEASON * season - HUM_DAILY * daily + self.wh \
+              - 1.5 * self.wt + HUM_NOISE * noise[bits(12)]
+        hum = min(max(hum, 5.0), 95.0)
+        return math.floor(temp * 10 + 0.5) / 10, math.floor(hum * 10 + 0.5) / 10  # 0.1 like the reader
+
+def _dropouts(seed: int, rows: int, interval: float, miss: float, outage_days: float,
+              outage_hours: float) -> Iterator[Tuple[int, float]]:
+    """(row index, seconds of gap before that row), in order. Drawn as the
+    distance to the next dropout, so the cost is per dropout, not per row."""
+    rng = random.Random(f"dropouts-{seed}")
+    outage = interval / (outage_days * DAY) if outage_days > 0 else 0.0  # per reading
+    def after(i, p):
+        return i + 1 + int(rng.expovariate(p)) if p > 0 else math.inf
+    next_miss, next_outage = after(-1, miss), after(-1, outage)
+    while min(next_miss, next_outage) < rows:
+        if next_miss <= next_outage:
+            yield next_miss, interval  # one read lost
+            next_miss = after(next_miss, miss)
+        else:
+            yield next_outage, rng.expovariate(1 / (outage_hours * 3600))
+            next_outage = after(next_outage, outage)
+
+def generate(rows: int, end: Optional[float] = None, interval: float = INTERVAL, seed: int = 1,
+             miss: float = MISS, outage_days: float = OUTAGE_DAYS,
+             outage_hours: float = OUTAGE_HOURS,
+             utc_offset: float = 0.0) -> Iterator[Tuple[int, float, float]]:
+    """(timestamp, temp_c, humidity) for `rows` readings, oldest first, the
+    last one at `end`."""
+    end = time.time() if end is None else end
+    args = (seed, rows, interval, miss, outage_days, outage_hours)
+    t = end - (rows - 1) * interval - sum(gap for _, gap in _dropouts(*args))
+    model = Model(seed, utc_offset)
+    drops = _dropouts(*args)
+    drop = next(drops, None)
+    for i in range(rows):
+        while drop is not None and drop[0] == i:
+            t += drop[1]
+            drop = next(drops, None)
+        temp, hum = model.step(t)
+        yield int(t), temp, hum
+        t += interval
+
+# ── Rows ───────────────────────────────────────────────────────────────
+def _band_fields(b: Band) -> str:
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="").writerow([b.color, b.mode, b.message])
+    return buf.getvalue()
+
+def band_row(ts: int, temp: float, hum: float) -> Tuple[List, Band, Band]:
+    """homee_reader's CSV row for one reading, with its two bands."""
+    tb, hb = TEMP.bands[TEMP.index(temp)], HUMIDITY.bands[HUMIDITY.index(hum)]
+    return ([ts, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts)), temp, hum,
+             tb.color, tb.mode, tb.message, hb.color, hb.mode, hb.message], tb, hb)
+
+def csv_lines(readings) -> Iterator[Tuple[str, int, float, float, Band, Band]]:
+    """CSV text per reading, byte for byte what csv.writer gives homee_reader;
+    the datetime is built from a per-day prefix and the band columns are
+    formatted once per band."""
+    tf = [_band_fields(b) for b in TEMP.bands]
+    hf = [_band_fields(b) for b in HUMIDITY.bands]
+    day, prefix = None, ""
+    for ts, temp, hum in readings:
+        d, s = divmod(ts, DAY)
+        if d != day:
+            day, prefix = d, time.strftime("%Y-%m-%dT", time.gmtime(d * DAY))
+        ti, hi = TEMP.index(temp), HUMIDITY.index(hum)
+        yield (f"{ts},{prefix}{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}Z,{temp},{hum},"
+               f"{tf[ti]},{hf[hi]}\r\n", ts, temp, hum, TEMP.bands[ti], HUMIDITY.bands[hi])
+
+# ── Writing a HOMEE_DIR ────────────────────────────────────────────────
+def write_history(homee_dir: str, rows: int, partitions: bool = False, ring: bool = True,
+                  force: bool = False, progress: bool = False, **kw) -> dict:
+    """Fill `homee_dir` with `rows` readings (kw as for generate()). Refuses to
+    touch an existing CSV unless `force`, which also drops the stores derived
+    from it (ring, partitions, rollup snapshot)."""
+    from homee_partition import PartitionedLog
+    from homee_ring import DEFAULT_CAPACITY, RingStore
+    log = os.path.join(homee_dir, "homee_readings.csv")
+    ring_file = os.path.join(homee_dir, "homee_readings.ring")
+    part_dir = os.path.join(homee_dir, "readings")
+    if os.path.exists(log) and not force:
+        raise FileExistsError(f"{log} exists (use --force to replace it)")
+    os.makedirs(homee_dir, exist_ok=True)
+    for path in (ring_file, os.path.join(homee_dir, "homee_rollups.json")):
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.rmtree(part_dir, ignore_errors=True)
+
+    parts = PartitionedLog(part_dir, CSV_HEADER) if partitions else None
+    recent = deque(maxlen=DEFAULT_CAPACITY)
+    t0 = time.perf_counter()
+    n, first, last, buf = 0, None, None, []
+    with open(log, "w", newline="") as f:
+        csv.writer(f).writerow(CSV_HEADER)
+        for line, ts, temp, hum, tb, hb in csv_lines(generate(rows, **kw)):
+            buf.append(line)
+            if len(buf) >= 10000:
+                f.writelines(buf)
+                buf.clear()
+            if parts is not None:
+                parts.append(ts, band_row(ts, temp, hum)[0])
+            if ring:
+                recent.append((ts, temp, hum, tb.color, tb.mode, hb.color, hb.mode))
+            first = ts if first is None else first
+            last = ts
+            n += 1
+            if progress and n % 1000000 == 0:
+                rate = n / (time.perf_counter() - t0)
+                print(f"[synth] {n:,} rows ({rate:,.0f}/s)", file=sys.stderr)
+        f.writelines(buf)
+    if parts is not None:
+        parts.close()
+    if ring:
+        with RingStore(ring_file, writable=True) as store:
+            for r in recent:
+                store.append(*r)
+    return {"dir": homee_dir, "rows": n, "first": first, "last": last,
+            "csv_bytes": os.path.getsize(log), "seconds": time.perf_counter() - t0}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Write a synthetic HOMEe reading history")
+    ap.add_argument("--rows", type=float, default=1e5, help="readings to write (1e3 … 1e8)")
+    ap.add_argument("--dir", required=True, help="HOMEE_DIR to fill")
+    ap.add_argument("--interval", type=float, default=INTERVAL, help="s between readings")
+    ap.add_argument("--end", type=float, help="epoch of the newest reading (default: now)")
+    ap.add_argument("--miss", type=float, default=MISS, help="share of failed reads")
+    ap.add_argument("--outage-days", type=float, default=OUTAGE_DAYS,
+                    help="mean days between outages (0: none)")
+    ap.add_argument("--outage-hours", type=float, default=OUTAGE_HOURS, help="mean outage length")
+    ap.add_argument("--utc-offset", type=float, default=0.0, help="local time zone (h) of the room")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--partitions", action="store_true", help="also write the day partitions")
+    ap.add_argument("--no-ring", action="store_true", help="don't write the ring file")
+    ap.add_argument("--force", action="store_true", help="replace an existing history")
+    args = ap.parse_args(argv)
+    if args.interval < 1:
+        ap.error("--interval must be at least 1 s (timestamps are whole seconds)")
+    out = write_history(args.dir, int(args.rows), partitions=args.partitions,
+                        ring=not args.no_ring, force=args.force, progress=True,
+                        end=args.end, interval=args.interval, seed=args.seed, miss=args.miss,
+                        outage_days=args.outage_days, outage_hours=args.outage_hours,
+                        utc_offset=args.utc_offset)
+    span = (out["last"] - out["first"]) / DAY if out["rows"] else 0
+    print(f"{out['rows']:,} rows over {span:,.1f} days, {out['csv_bytes'] / 1e6:,.1f} MB "
+          f"in {out['seconds']:.1f}s → {out['dir']}")
+    return out
+
+if __name__ == "__main__":
+    main()
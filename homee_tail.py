@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# HOMEe: seek-from-end tail reader for homee_readings.csv
+# Reads backwards in blocks from EOF and caches parsed rows keyed on the file's
+# (inode, size, mtime), so a poll only parses bytes appended since the last one.
+
+import csv, os, threading
+from collections import deque
+from typing import List, Dict, Any, Optional
+
+BLOCK_SIZE = 8192
+
+# ── Row parsing (CSV row → /data reading) ──────────────────────────────
+def parse_row(row: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    try:
+        return {
+            "timestamp": int(row.get("timestamp", 0) or 0),
+            "datetime_utc": row.get("datetime_utc",""),
+            "temp_c": float(row.get("temperature_C","") or "nan"),
+            "humidity": float(row.get("humidity_pct","") or "nan"),
+            "temp_band": {
+                "color": row.get("temp_color",""),
+                "mode":  row.get("temp_mode",""),
+                "message": row.get("temp_message",""),
+            },
+            "hum_band": {
+                "color": row.get("hum_color",""),
+                "mode":  row.get("hum_mode",""),
+                "message": row.get("hum_message",""),
+            },
+        }
+    except Exception:
+        return None
+
+def parse_lines(header: List[str], lines: List[bytes]) -> List[Dict[str, Any]]:
+    out = []
+    for fields in csv.reader(l.decode("utf-8", "replace") for l in lines):
+        if not fields:
+            continue
+        rec = parse_row(dict(zip(header, fields)))
+        if rec is not None:
+            out.append(rec)
+    return out
+
+# ── Backwards block scan ───────────────────────────────────────────────
+def scan_back(f, end: int, floor: int, want: int):
+    """Return (start, lines): up to `want` complete lines in [floor, end).
+
+    `end` must sit on a line boundary. Only ~want lines' worth of blocks are read.
+    """
+    pos, chunks, newlines = end, [], 0
+    while pos > floor and newlines <= want:
+        step = min(BLOCK_SIZE, pos - floor)
+        pos -= step
+        f.seek(pos)
+        block = f.read(step)
+        chunks.append(block)
+        newlines += block.count(b"\n")
+    buf = b"".join(reversed(chunks))
+    if not buf:
+        return end, []
+    lines = buf[:-1].split(b"\n") if buf.endswith(b"\n") else buf.split(b"\n")
+    if pos > floor:
+        lines = lines[1:]  # first piece is the tail of an unread line
+    lines = lines[-want:] if want else []
+    start = end - sum(len(l) + 1 for l in lines)
+    return start, lines
+
+# ── Cached tail ────────────────────────────────────────────────────────
+class TailReader:
+    """Last `capacity` parsed rows of a CSV log, refreshed incrementally."""
+
+    def __init__(self, path: str, capacity: int):
+        self.path = path
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._seq = 0  # rows appended so far; survives resets so cursors stay monotonic
+        self._reset()
+
+    def _reset(self):
+        self._key = None      # (ino, size, mtime_ns) of the last refresh
+        self._ino = None
+        self._header = None   # column names from line 1
+        self._floor = 0       # offset of the first data row
+        self._head = 0        # offset of the oldest cached row
+        self._end = 0         # offset just past the newest parsed line
+        self._rows = deque(maxlen=self.capacity)
+
+    def read(self, limit: int) -> List[Dict[str, Any]]:
+        limit = max(0, min(limit, self.capacity))
+        with self._lock:
+            self._sync(limit)
+            rows = list(self._rows)
+        return rows[-limit:] if limit else []
+
+    def updates(self, after: int):
+        """Return (seq, rows appended since sequence number `after`)."""
+        with self._lock:
+            self._sync(0)
+            n = min(max(self._seq - after, 0), len(self._rows))
+            rows = list(self._rows)[len(self._rows) - n:] if n else []
+            return self._seq, rows
+
+    def _sync(self, limit: int):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset()
+            return
+        key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if key != self._key or len(self._rows) < limit:
+            with open(self.path, "rb") as f:
+                self._refresh(f, st, limit)
+            self._key = key
+
+    def _refresh(self, f, st, limit: int):
+        if st.st_ino != self._ino or st.st_size < self._end:
+            self._reset()  # new or truncated file
+            self._ino = st.st_ino
+        if self._header is None:
+            first = f.readline()
+            if not first.endswith(b"\n"):
+                return  # header still being written
+            self._header = next(csv.reader([first.decode("utf-8", "replace")]))
+            self._floor = self._head = self._end = len(first)
+        end = self._end_of_last_line(f, st.st_size)
+        if end > self._end:
+            # appended bytes only; if more than a full window arrived, skip ahead
+            start, lines = scan_back(f, end, self._end, self.capacity)
+            if start > self._end:
+                self._rows.clear()
+                self._head = start
+            new = parse_lines(self._header, lines)
+            self._rows.extend(new)
+            self._seq += len(new)
+            self._end = end
+        missing = limit - len(self._rows)
+        if missing > 0 and self._head > self._floor:
+            start, lines = scan_back(f, self._head, self._floor, missing)
+            self._rows.extendleft(reversed(parse_lines(self._header, lines)))
+            self._head = start
+
+    def _end_of_last_line(self, f, size: int) -> int:
+        """Offset just past the last newline (a half-written row is left for later)."""
+        pos = size
+        while pos > self._end:
+            step = min(BLOCK_SIZE, pos - self._end)
+            f.seek(pos - step)
+            i = f.read(step).rfind(b"\n")
+            if i >= 0:
+                return pos - step + i + 1
+            pos -= step
+        return self._end
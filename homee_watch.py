@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# HOMEe: file-append watcher (inotify on Linux, stat polling elsewhere)
+# Calls on_change() from a daemon thread whenever the watched file is written,
+# created or replaced.
+
+import ctypes, ctypes.util, os, select, struct, threading
+
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_CLOEXEC     = 0o2000000
+_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len (name follows)
+
+POLL_INTERVAL = 0.25  # seconds, stat fallback
+
+def _inotify_fd(directory: str):
+    """Return an inotify fd watching `directory`, or None if unavailable."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), _MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+class FileWatcher:
+    def __init__(self, path: str, on_change, poll_interval: float = POLL_INTERVAL):
+        self.path = path
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.mode = None  # "inotify" | "stat" once started
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="homee-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # The directory is watched (not the file) so creation and rotation are seen too.
+        fd = _inotify_fd(os.path.dirname(self.path) or ".")
+        try:
+            if fd is not None:
+                self.mode = "inotify"
+                self._run_inotify(fd)
+            else:
+                self.mode = "stat"
+                self._run_stat()
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _fire(self):
+        try:
+            self.on_change()
+        except Exception as e:
+            print(f"[watch] on_change failed: {e}")
+
+    def _run_inotify(self, fd):
+        name = os.fsencode(os.path.basename(self.path))
+        while not self._stop.is_set():
+            ready, _, _ = select.select([fd], [], [], 1.0)
+            if not ready:
+                continue
+            buf, hit = os.read(fd, 4096), False
+            off = 0
+            while off < len(buf):
+                _, _, _, n = _EVENT.unpack_from(buf, off)
+                off += _EVENT.size
+                if buf[off:off + n].rstrip(b"\0") == name:
+                    hit = True
+                off += n
+            if hit:
+                self._fire()
+
+    def _run_stat(self):
+        last = None
+        while not self._stop.wait(self.poll_interval):
+            try:
+                st = os.stat(self.path)
+                key = (st.st_ino, st.st_size, st.st_mtime_ns)
+            except FileNotFoundError:
+                key = None
+            if key != last:
+                last = key
+                self._fire()